@@ -4,22 +4,28 @@
 #
 # (c) VentCU, 2020. All Rights Reserved.
 #
-import RPi.GPIO as GPIO
 import sys
 from time import sleep
 
 class Buzzer:
     
-    def __init__(self, PIN):
+    def __init__(self, PIN, gpio=None):
+        """
+        @param PIN: the buzzer gpio
+        @param gpio: the RPi.GPIO module or a stand-in, defaults to RPi.GPIO
+        """
+        if gpio is None:
+            import RPi.GPIO as gpio
+        self.gpio = gpio
         self.buzzer_pin = PIN
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setup(PIN, GPIO.OUT, initial=0)
+        gpio.setmode(gpio.BCM)
+        gpio.setup(PIN, gpio.OUT, initial=0)
 
     def enable_buzzer(self):
-        GPIO.output(self.buzzer_pin, 1)
+        self.gpio.output(self.buzzer_pin, 1)
 
     def disable_buzzer(self):
-        GPIO.output(self.buzzer_pin, 0)
+        self.gpio.output(self.buzzer_pin, 0)
 
     
     # TODO: this.
@@ -0,0 +1,105 @@
+#
+# motion profile class for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import numpy as np
+from configs.ventilation_configs import ENCODER_ONE_ROTATION, TIC_ONE_ROTATION
+
+# tic velocity units (microsteps/10000s) per encoder count/s
+TIC_VELOCITY_PER_COUNT = TIC_ONE_ROTATION / ENCODER_ONE_ROTATION * 10000
+
+
+def trapezoid(tau, accel_fraction=0.25):
+    """
+    constant acceleration for accel_fraction of the move, constant
+    velocity, then constant deceleration for accel_fraction.
+    @param tau: the normalized times, 0 to 1
+    @return: the normalized positions and velocities (0 to 1 in a time of 1)
+    """
+    a = min(max(accel_fraction, 1e-6), 0.5)
+    peak = 1.0 / (1.0 - a)
+    accel = peak / a
+    rest = 1.0 - tau
+    position = np.where(tau < a, 0.5 * accel * tau ** 2,
+                        np.where(tau <= 1.0 - a, 0.5 * peak * a + peak * (tau - a),
+                                 1.0 - 0.5 * accel * rest ** 2))
+    velocity = np.where(tau < a, accel * tau,
+                        np.where(tau <= 1.0 - a, peak, accel * rest))
+    return position, velocity
+
+
+def s_curve(tau, accel_fraction=None):
+    """
+    minimum jerk move: acceleration and jerk are continuous, no step
+    in force on the bag at the start and end of the stroke.
+    """
+    position = tau ** 3 * (10.0 - 15.0 * tau + 6.0 * tau ** 2)
+    velocity = 30.0 * tau ** 2 * (1.0 - tau) ** 2
+    return position, velocity
+
+
+def decelerating(tau, accel_fraction=None):
+    """
+    decelerating flow: the arm starts at twice the mean velocity and
+    slows linearly to a stop, the flow waveform of pressure controlled
+    breaths.
+    """
+    position = tau * (2.0 - tau)
+    velocity = 2.0 * (1.0 - tau)
+    return position, velocity
+
+
+SHAPES = {
+    "trapezoid": trapezoid,
+    "s_curve": s_curve,
+    "decelerating": decelerating,
+}
+
+
+class MotionProfile:
+    """
+    Position and velocity of one stroke of the arm, tabulated at a
+    fixed rate when the breath is planned so that following it costs
+    a table lookup per control loop tick.
+    """
+
+    def __init__(self, start, end, duration, shape="trapezoid", rate=500, accel_fraction=0.25):
+        """
+        @param start: the encoder position at the start of the stroke
+        @param end: the encoder position at the end of the stroke
+        @param duration: the time the stroke takes (in seconds)
+        @param shape: one of SHAPES
+        @param rate: the samples per second of the table
+        @param accel_fraction: the fraction of a trapezoid spent accelerating and decelerating
+        """
+        if shape not in SHAPES:
+            raise ValueError("Unknown motion profile shape: " + str(shape))
+        self.start = start
+        self.end = end
+        self.duration = max(duration, 0.0)
+        self.rate = rate
+
+        samples = max(int(self.duration * rate), 1) + 1
+        tau = np.linspace(0.0, 1.0, samples)
+        position, velocity = SHAPES[shape](tau, accel_fraction)
+        distance = end - start
+        # python lists: indexing them is cheaper than indexing numpy arrays
+        self.positions = (start + distance * position).tolist()
+        self.velocities = (distance / self.duration * velocity).tolist() if self.duration > 0 \
+            else [0.0] * samples
+        self._samples_per_second = (samples - 1) / self.duration if self.duration > 0 else 0.0
+
+    def sample(self, t):
+        """
+        @param t: the time since the start of the stroke (in seconds)
+        @return: the position (counts) and velocity (counts/s) to be at
+        """
+        if t >= self.duration:
+            return self.end, 0.0
+        i = int(t * self._samples_per_second)
+        if i < 0:
+            i = 0
+        return self.positions[i], self.velocities[i]
@@ -5,49 +5,91 @@
 # (c) VentCU, 2020. All Rights Reserved.
 #
 
-from actuators.tic_usb import *
 from actuators.pid_controller import PID
+from actuators.motion_profile import TIC_VELOCITY_PER_COUNT
+from sensors.velocity_estimator import VelocityEstimator
+from hal.clock import SystemClock
 from configs.motor_configs import *
 
 
+def polyval(coefficients, x):
+    """
+    evaluate a polynomial with Horner's method
+    @param coefficients: the coefficients, highest degree first (np.polyfit order)
+    @return: the value at x
+    """
+    value = 0.0
+    for c in coefficients:
+        value = value * x + c
+    return value
+
+
+def scale_factor_table(coefficients, size):
+    """
+    @return: the polynomial at the whole distances 0 .. size - 1
+    """
+    return [polyval(coefficients, x) for x in range(size)]
+
+
 class Motor:
 
-    def __init__(self, rotary_encoder):
-        # create a motor controller object
-        self.tic_device = TicDevice()
-        self.tic_device.open(vendor=0x1ffb, product_id=0x00CB)
-        self.pid = PID(P=PID_P_GAIN, I=PID_I_GAIN, D=PID_D_GAIN)
+    def __init__(self, rotary_encoder, tic_device=None, async_io=TIC_ASYNC_IO, clock=None):
+        """
+        @param rotary_encoder: the RotaryEncoder on the arm
+        @param tic_device: an open TicDevice or stand-in, defaults to the Tic on USB
+        @param async_io: send commands from the usb worker thread
+        @param clock: the clock of the pid and velocity estimate, defaults to the system clock
+        """
+        # create a motor controller object, usb is only imported for the real Tic
+        if tic_device is None:
+            from actuators.tic_usb import TicDevice
+            tic_device = TicDevice()
+            tic_device.open(vendor=0x1ffb, product_id=0x00CB)
+        self.tic_device = tic_device
+        self.commanded_velocity = 0         # last target velocity sent to the tic (microsteps/10000s)
+        self._motor_position = 0            # last tic position read without the worker (microsteps)
+        self.clock = clock if clock is not None else SystemClock()
+
+        # commands go through a usb worker thread unless disabled
+        self.tic_worker = None
+        self.tic = self.tic_device
+        if async_io:
+            from actuators.tic_usb import TicWorker
+            self.tic_worker = TicWorker(self.tic_device,
+                                        queue_size=TIC_COMMAND_QUEUE_SIZE,
+                                        poll_period=TIC_VARIABLES_POLL_PERIOD,
+                                        fields=TIC_POLLED_VARIABLES)
+            self.tic_worker.start()
+            self.tic = self.tic_worker
+
+        self.pid = PID(P=PID_P_GAIN, I=PID_I_GAIN, D=PID_D_GAIN, current_time=self.clock.time())
+        self._scale_factor_table = scale_factor_table(PID_SCALE_FACTOR_COEFFICIENTS,
+                                                      PID_SCALE_FACTOR_TABLE_SIZE)
         self.encoder = rotary_encoder
+        self.velocity_estimator = VelocityEstimator(rotary_encoder,
+                                                    window=VELOCITY_WINDOW,
+                                                    alpha=VELOCITY_TRACKER_ALPHA,
+                                                    beta=VELOCITY_TRACKER_BETA)
 
     def set_velocity(self, velocity):
         """
 
         @param velocity: the target velocity of the motor.
         """
-        self.tic_device.set_target_velocity(velocity)
+        self.commanded_velocity = velocity
+        self.tic.set_target_velocity(velocity)
 
     def get_scale_factor( self,  tic_count ):
         """
-        allow changing pid time scale factor depending on desired travel distance
-        Should fit fine b.c. at degree 4 the residual was too small to count
-        
+        allow changing pid time scale factor depending on desired travel distance,
+        looked up for whole tick distances within the table.
+
         @param tic_count: the total distance the motor should move
         @return:     the pid time scale factor to allow correct motor movement
         """
-        degree = 4
-        #tic_count = [100,250,300,500,650]
-        #scalefactor = [.01555,.0072,.00615,.00415,.0035]
-        #np.polyfit( tic_count , scalefactor , degree , full = True)
-        
-        # polyfit returns coefficients in x**n + .. + x**0 order
-        coefficients = [ 4.61471861e-13,
-             -8.54025974e-10,  5.93469697e-07, -1.91823377e-04, 2.96055195e-02 ]
-        pid_scale_factor = 0
-        for c in coefficients:
-            raised = pow( tic_count, degree )
-            pid_scale_factor += c*raised
-            degree -= 1
-        return pid_scale_factor 
+        if 0 <= tic_count < len(self._scale_factor_table) and tic_count == int(tic_count):
+            return self._scale_factor_table[int(tic_count)]
+        return polyval(PID_SCALE_FACTOR_COEFFICIENTS, tic_count)
 
     def move_to_encoder_pose_with_dur(self, pose, dist, dur):
         """
@@ -86,29 +128,73 @@ class Motor:
 
         self.pid.setpoint = pose
         encoder_value = self.encoder.value()
-        self.pid.update(encoder_value)
+        self.pid.update(encoder_value, current_time=self.clock.time(),
+                        feedback_rate=self.velocity_estimator.update(self.clock.monotonic()))
         value = self.pid.output * vel_const
-        self.tic_device.set_target_velocity(int(value))
+        self.commanded_velocity = int(value)
+        self.tic.set_target_velocity(int(value))
 
         if self.pid.output == 0:
             return True, int(value)
         else:
             return False, int(value)
 
+    def follow_profile(self, profile, t, gain=MOTION_PROFILE_FEEDBACK_GAIN):
+        """
+        track a precomputed MotionProfile: its velocity at time t, corrected
+        by the position error. Once the stroke's time is up the profile
+        holds the end position and only the correction moves the arm.
+
+        @param profile: the MotionProfile of the stroke
+        @param t: the time since the start of the stroke (in seconds)
+        @param gain: the velocity correction per count of error (in 1/s)
+        @return:     true once the stroke is over and the motor is on its end
+        """
+        position, velocity = profile.sample(t)
+        encoder_value = self.encoder.value()
+        value = int((velocity + gain * (position - encoder_value)) * TIC_VELOCITY_PER_COUNT)
+        self.commanded_velocity = value
+        self.tic.set_target_velocity(value)
+
+        return t >= profile.duration and encoder_value == profile.end, value
+
     def stop(self):
-        self.tic_device.halt_and_hold()
+        self.commanded_velocity = 0
+        self.tic.halt_and_hold()
 
     def stop_set_pose(self, pose):
-        self.tic_device.halt_and_set_position(pose)
+        self.commanded_velocity = 0
+        self.tic.halt_and_set_position(pose)
 
     def motor_position(self):
-        self.tic_device.get_variables()
-        return self.tic_device.variables['current_position']
+        if self.tic_worker is not None:
+            # latest poll of the worker, at most TIC_VARIABLES_POLL_PERIOD old
+            return self.tic_worker.variables['current_position']
+        self._motor_position = self.tic_device.get_current_position()
+        return self._motor_position
+
+    def cached_motor_position(self):
+        """
+        @return: the tic position (microsteps) without a usb transfer, the
+                 latest poll of the worker or, with synchronous commands,
+                 the last motor_position() read
+        """
+        if self.tic_worker is not None:
+            return self.tic_worker.variables['current_position']
+        return self._motor_position
 
     def encoder_position(self):
         return self.encoder.value()
 
+    def encoder_velocity(self):
+        """
+        @return: the latest encoder velocity estimate (counts/s)
+        """
+        return self.velocity_estimator.velocity
+
     def destructor(self):
+        if self.tic_worker is not None:
+            self.tic_worker.stop()
         self.tic_device.halt_and_hold()
         self.tic_device.deenergize()
         self.encoder.cancel()
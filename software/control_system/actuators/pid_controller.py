@@ -29,10 +29,15 @@ class PID:
 
         self.output = 0.0
 
-    def update(self, feedback_value, current_time=None):
+    def update(self, feedback_value, current_time=None, feedback_rate=None):
 
         """Calculates PID value for given reference feedback
             u(t) = K_p e(t) + K_i \int_{0}^{t} e(t)dt + K_d {de}/{dt}
+
+            If the rate of change of the feedback is measured (feedback_rate),
+            the derivative is taken on the measurement, -{d feedback}/{dt},
+            instead of differencing the error. That avoids both quantization
+            noise and the derivative kick when the setpoint changes.
         """
 
         error = self.setpoint - feedback_value
@@ -51,7 +56,9 @@ class PID:
                 self.ITerm = self.windup_guard
 
             self.DTerm = 0.0
-            if delta_time > 0:
+            if feedback_rate is not None:
+                self.DTerm = -feedback_rate
+            elif delta_time > 0:
                 self.DTerm = delta_error / delta_time
 
             # Remember last time and last error for next calculation
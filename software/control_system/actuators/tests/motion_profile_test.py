@@ -0,0 +1,73 @@
+#
+# MotionProfile test, profile shapes and tracking on the simulated plant
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from timeit import timeit
+from actuators.motion_profile import MotionProfile, SHAPES
+from actuators.motor import Motor
+from sensors.rotary_encoder import RotaryEncoder
+from hal.sim import SimBackend
+from hal.plant import VentilatorPlant, ArmModel
+from configs.gpio_map import ENCODER_A_PLUS_PIN, ENCODER_B_PLUS_PIN
+from configs.hal_configs import SIM_CONTACT_POSITION
+from configs.ventilation_configs import CONTROL_LOOP_PERIOD
+
+
+def test_shapes():
+    for shape in SHAPES:
+        profile = MotionProfile(0, -384, 1.5, shape=shape, rate=500)
+        assert profile.sample(0.0)[0] == 0, shape
+        assert profile.sample(1.5) == (-384, 0.0), shape
+        assert profile.sample(10.0) == (-384, 0.0), shape
+
+        # positions only move towards the end, the velocities integrate to the distance
+        positions = profile.positions
+        assert all(b <= a for a, b in zip(positions, positions[1:])), shape
+        dt = 1.5 / (len(positions) - 1)
+        travelled = sum(0.5 * (a + b) * dt for a, b in zip(profile.velocities, profile.velocities[1:]))
+        assert abs(travelled + 384) < 1.0, (shape, travelled)
+
+    # a zero length stroke is over at once
+    assert MotionProfile(5, 10, 0.0).sample(0.0) == (10, 0.0)
+
+
+def test_lookup_cost():
+    profile = MotionProfile(0, -384, 1.5)
+    n = 100000
+    t = timeit(lambda: profile.sample(0.7), number=n) / n
+    print("sample: {:.2f} us".format(t * 1e6))
+
+
+def test_tracking():
+    for shape in SHAPES:
+        hal = SimBackend(plant=VentilatorPlant(arm=ArmModel(position=SIM_CONTACT_POSITION)), realtime=False)
+        encoder = RotaryEncoder(hal.pi, ENCODER_B_PLUS_PIN, ENCODER_A_PLUS_PIN)
+        motor = Motor(encoder, tic_device=hal.tic_device(), async_io=False, clock=hal.clock)
+        profile = MotionProfile(0, -384, 1.5, shape=shape)
+
+        worst = 0.0
+        t = 0.0
+        done = False
+        while t < 3.0 and not done:
+            done, _ = motor.follow_profile(profile, t)
+            worst = max(worst, abs(profile.sample(t)[0] - encoder.value()))
+            hal.clock.sleep(CONTROL_LOOP_PERIOD)
+            t = hal.clock.monotonic()
+
+        print("{}: on target after {:.3f} s of 1.5 s, worst tracking error {:.1f} counts".format(shape, t, worst))
+        assert done, shape
+        assert t < 1.6, (shape, t)
+        assert worst < 10, (shape, worst)
+
+
+if __name__ == '__main__':
+    test_shapes()
+    test_lookup_cost()
+    test_tracking()
+    print("passed")
@@ -0,0 +1,68 @@
+#
+# Benchmark of the Tic variable block decoders, runs without a Tic connected
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import random
+import timeit
+from array import array
+from actuators.tic_usb import *
+
+
+def legacy_parse(buffer):
+    """the slicing parser TicDevice.get_variables used before decode_variables"""
+    variables = {}
+    variables['operation_state'] = int.from_bytes (buffer [TIC_VAR_OPERATION_STATE:TIC_VAR_OPERATION_STATE+1],byteorder='little')
+    variables['energized_position_uncertain'] = int.from_bytes (buffer [0x1:0x2],byteorder='little')
+    variables['error_status'] = int.from_bytes (buffer [0x2:0x4],byteorder='little')
+    variables['planning_mode'] = int.from_bytes (buffer [TIC_VAR_PLANNING_MODE:TIC_VAR_PLANNING_MODE+1],byteorder='little')
+    variables['target_position'] = int.from_bytes ( buffer [TIC_VAR_TARGET_POSITION:TIC_VAR_TARGET_POSITION+4],byteorder='little', signed=True)
+    variables['target_velocity'] = int.from_bytes ( buffer [TIC_VAR_TARGET_VELOCITY:TIC_VAR_TARGET_VELOCITY+4],byteorder='little', signed=True)
+    variables['starting_speed'] = int.from_bytes ( buffer [TIC_VAR_STARTING_SPEED:TIC_VAR_STARTING_SPEED+4],byteorder='little')
+    variables['max_speed'] = int.from_bytes ( buffer [TIC_VAR_MAX_SPEED:TIC_VAR_MAX_SPEED+4],byteorder='little')
+    variables['max_decel'] = int.from_bytes ( buffer [TIC_VAR_MAX_DECEL:TIC_VAR_MAX_DECEL+4],byteorder='little')
+    variables['max_accel'] = int.from_bytes ( buffer [TIC_VAR_MAX_ACCEL:TIC_VAR_MAX_ACCEL+4],byteorder='little')
+    variables['current_position'] = int.from_bytes ( buffer [TIC_VAR_CURRENT_POSITION:TIC_VAR_CURRENT_POSITION +4],byteorder='little', signed=True)
+    variables['current_velocity'] = int.from_bytes ( buffer [TIC_VAR_CURRENT_VELOCITY:TIC_VAR_CURRENT_VELOCITY+4],byteorder='little', signed=True)
+    variables['acting_target_position'] = int.from_bytes ( buffer [TIC_VAR_ACTING_TARGET_POSITION:TIC_VAR_ACTING_TARGET_POSITION +4],byteorder='little', signed=True)
+    variables['time_since_last_step'] = int.from_bytes ( buffer [TIC_VAR_TIME_SINCE_LAST_STEP :TIC_VAR_TIME_SINCE_LAST_STEP +4],byteorder='little')
+    variables['device_reset'] = int.from_bytes (buffer [TIC_VAR_DEVICE_RESET:TIC_VAR_DEVICE_RESET+1],byteorder='little')
+    variables['vin_voltage'] = int.from_bytes (buffer [TIC_VAR_VIN_VOLTAGE:TIC_VAR_VIN_VOLTAGE +2],byteorder='little') / 1000
+    variables['up_time'] = int.from_bytes ( buffer [TIC_VAR_UP_TIME:TIC_VAR_UP_TIME+4],byteorder='little')
+    variables['encoder_position'] = int.from_bytes ( buffer [TIC_VAR_ENCODER_POSITION:TIC_VAR_ENCODER_POSITION+4], byteorder='little', signed=True)
+    variables['rc_pulse_width'] = int.from_bytes (buffer [TIC_VAR_RC_PULSE_WIDTH:TIC_VAR_RC_PULSE_WIDTH+2],byteorder='little')
+    variables['step_mode'] = int.from_bytes ( buffer [TIC_VAR_STEP_MODE:TIC_VAR_STEP_MODE +1], byteorder="little")
+    variables['current_limit'] = int.from_bytes (buffer [TIC_VAR_CURRENT_LIMIT:TIC_VAR_CURRENT_LIMIT+1],byteorder='little')
+    variables['decay_mode'] = int.from_bytes ( buffer [TIC_VAR_DECAY_MODE:TIC_VAR_DECAY_MODE+1],byteorder='little')
+    variables['input_state'] = int.from_bytes ( buffer [TIC_VAR_INPUT_STATE:TIC_VAR_INPUT_STATE+1],byteorder='little')
+    variables['input_after_averaging'] = int.from_bytes (buffer [TIC_VAR_INPUT_AFTER_AVERAGING:TIC_VAR_INPUT_AFTER_AVERAGING+2],byteorder='little')
+    variables['input_after_hysteresis'] = int.from_bytes (buffer [TIC_VAR_INPUT_AFTER_HYSTERESIS:TIC_VAR_INPUT_AFTER_HYSTERESIS+2],byteorder='little')
+    variables['input_after_scaling'] = int.from_bytes ( buffer [TIC_VAR_INPUT_AFTER_SCALING:TIC_VAR_INPUT_AFTER_SCALING+2],byteorder='little', signed=True)
+    return variables
+
+
+if __name__ == '__main__':
+    # pyusb returns the block as an array of unsigned bytes
+    buffer = array('B', [random.randrange(256) for _ in range(TIC_VARIABLES_SIZE)])
+
+    # both decoders must agree on every field
+    expected = legacy_parse(buffer)
+    decoded = decode_variables(buffer)
+    for name, value in expected.items():
+        assert decoded[name] == value, name
+
+    record = TicVariables()
+    runs = 20000
+    tests = [
+        ("legacy parser", lambda: legacy_parse(buffer)),
+        ("struct, all fields", lambda: decode_variables(buffer, record)),
+        ("struct, current_position", lambda: decode_variables(buffer, record, fields=('current_position',))),
+    ]
+    for name, test in tests:
+        t = min(timeit.repeat(test, number=runs, repeat=5)) / runs
+        print("{:<28} {:8.2f} us".format(name, t * 1e6))
@@ -0,0 +1,110 @@
+#
+# TicWorker test, runs without a Tic connected
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import time
+from actuators.tic_usb import *
+
+
+class FakeTicDev:
+    """
+    Stands in for the pyusb device of a TicDevice. Records every
+    command sent and answers variable reads with a block holding
+    the last position set by halt_and_set_position.
+    """
+
+    def __init__(self, latency=0.001):
+        self.latency = latency
+        self.commands = []
+        self.position = 0
+
+    def ctrl_transfer(self, bmRequestType, bRequest, wValue, wIndex, data_or_wLength, timeout):
+        time.sleep(self.latency)
+        if bmRequestType == TIC_REQUEST_VARIABLES:
+            block = bytearray(TIC_VARIABLES_SIZE)
+            block[TIC_VAR_CURRENT_POSITION:TIC_VAR_CURRENT_POSITION + 4] = \
+                self.position.to_bytes(4, byteorder='little', signed=True)
+            return block[wIndex:wIndex + data_or_wLength]
+        data = (wIndex << 16 | wValue) & 0xFFFFFFFF
+        if bRequest == TIC_CMD_HALT_AND_SET_POSITION:
+            self.position = data - (1 << 32) if data >= (1 << 31) else data
+        self.commands.append((bRequest, data))
+        return 0
+
+
+def make_worker(fields=None):
+    tic = TicDevice()
+    tic.dev = FakeTicDev()
+    return TicWorker(tic, queue_size=4, poll_period=0.005, fields=fields), tic.dev
+
+
+def test_velocity_coalescing():
+    worker, dev = make_worker()
+    for velocity in range(100):
+        worker.set_target_velocity(velocity)
+    worker.start()
+    time.sleep(0.05)
+    worker.stop()
+    assert dev.commands == [(TIC_CMD_SET_TARGET_VELOCITY, 99)], dev.commands
+
+
+def test_command_order():
+    worker, dev = make_worker()
+    worker.set_target_velocity(10)
+    worker.halt_and_hold()
+    worker.set_target_velocity(20)
+    worker.set_target_velocity(30)
+    worker.start()
+    time.sleep(0.05)
+    worker.stop()
+    assert [c[0] for c in dev.commands] == [TIC_CMD_SET_TARGET_VELOCITY,
+                                            TIC_CMD_HALT_AND_HOLD,
+                                            TIC_CMD_SET_TARGET_VELOCITY]
+    assert dev.commands[-1][1] == 30
+
+
+def test_variables_double_buffer():
+    for fields in (None, ('current_position',)):
+        worker, dev = make_worker(fields)
+        worker.start()
+        worker.halt_and_set_position(-1234)
+        time.sleep(0.05)
+        assert worker.variables['current_position'] == -1234
+        worker.stop()
+
+
+def test_partial_read():
+    tic = TicDevice()
+    tic.dev = FakeTicDev()
+    tic.halt_and_set_position(-5678)
+    assert tic.get_current_position() == -5678
+    assert variables_span(('current_position',)) == (TIC_VAR_CURRENT_POSITION, 4)
+    assert variables_span(('current_position', 'current_velocity')) == (TIC_VAR_CURRENT_POSITION, 8)
+
+
+def test_non_blocking():
+    worker, dev = make_worker()
+    dev.latency = 0.05
+    worker.start()
+    start = time.time()
+    for velocity in range(1000):
+        worker.set_target_velocity(velocity)
+    elapsed = time.time() - start
+    worker.stop()
+    assert elapsed < dev.latency, elapsed
+    print("1000 set_target_velocity calls: {:.6f} s".format(elapsed))
+
+
+if __name__ == '__main__':
+    test_velocity_coalescing()
+    test_command_order()
+    test_variables_double_buffer()
+    test_partial_read()
+    test_non_blocking()
+    print("passed")
@@ -34,6 +34,9 @@ import usb.control
 import logging
 import decimal
 import time
+import queue
+import struct
+import threading
 
 # logging.basicConfig(level=logging.DEBUG,
 #                    format='%(asctime)s.%(msecs)d-%(name)s-%(threadName)s-%(levelname)s %(message)s',
@@ -416,6 +419,106 @@ TIC01A_RECOMMENDED_CODES = \
     ]
 
 
+# Layout of the variable block decoded by get_variables, in offset order:
+# (name, offset, struct format). Gaps between fields are skipped.
+TIC_VARIABLES_LAYOUT = [
+    ('operation_state', TIC_VAR_OPERATION_STATE, 'B'),
+    ('energized_position_uncertain', TIC_VAR_MISC_FLAGS1, 'B'),
+    ('error_status', TIC_VAR_ERROR_STATUS, 'H'),
+    ('planning_mode', TIC_VAR_PLANNING_MODE, 'B'),
+    ('target_position', TIC_VAR_TARGET_POSITION, 'i'),
+    ('target_velocity', TIC_VAR_TARGET_VELOCITY, 'i'),
+    ('starting_speed', TIC_VAR_STARTING_SPEED, 'I'),
+    ('max_speed', TIC_VAR_MAX_SPEED, 'I'),
+    ('max_decel', TIC_VAR_MAX_DECEL, 'I'),
+    ('max_accel', TIC_VAR_MAX_ACCEL, 'I'),
+    ('current_position', TIC_VAR_CURRENT_POSITION, 'i'),
+    ('current_velocity', TIC_VAR_CURRENT_VELOCITY, 'i'),
+    ('acting_target_position', TIC_VAR_ACTING_TARGET_POSITION, 'i'),
+    ('time_since_last_step', TIC_VAR_TIME_SINCE_LAST_STEP, 'I'),
+    ('device_reset', TIC_VAR_DEVICE_RESET, 'B'),
+    ('vin_voltage', TIC_VAR_VIN_VOLTAGE, 'H'),
+    ('up_time', TIC_VAR_UP_TIME, 'I'),
+    ('encoder_position', TIC_VAR_ENCODER_POSITION, 'i'),
+    ('rc_pulse_width', TIC_VAR_RC_PULSE_WIDTH, 'H'),
+    ('step_mode', TIC_VAR_STEP_MODE, 'B'),
+    ('current_limit', TIC_VAR_CURRENT_LIMIT, 'B'),
+    ('decay_mode', TIC_VAR_DECAY_MODE, 'B'),
+    ('input_state', TIC_VAR_INPUT_STATE, 'B'),
+    ('input_after_averaging', TIC_VAR_INPUT_AFTER_AVERAGING, 'H'),
+    ('input_after_hysteresis', TIC_VAR_INPUT_AFTER_HYSTERESIS, 'H'),
+    ('input_after_scaling', TIC_VAR_INPUT_AFTER_SCALING, 'h'),
+]
+
+TIC_VARIABLE_NAMES = tuple(name for name, _, _ in TIC_VARIABLES_LAYOUT)
+TIC_STATUS_VARIABLES = ('operation_state', 'energized_position_uncertain', 'error_status')
+
+
+def _variables_format(layout):
+    fmt = '<'
+    offset = 0
+    for _, field_offset, field_format in layout:
+        if field_offset > offset:
+            fmt += str(field_offset - offset) + 'x'
+        fmt += field_format
+        offset = field_offset + struct.calcsize('<' + field_format)
+    return fmt
+
+
+# one precompiled struct for the whole block, and one per field
+TIC_VARIABLES_STRUCT = struct.Struct(_variables_format(TIC_VARIABLES_LAYOUT))
+TIC_VARIABLE_FIELDS = {name: (offset, struct.Struct('<' + fmt)) for name, offset, fmt in TIC_VARIABLES_LAYOUT}
+
+assert TIC_VARIABLES_STRUCT.size <= TIC_VARIABLES_SIZE
+
+
+class TicVariables:
+    # Decoded variable block. Fields are attributes; item access is kept so
+    # that code written against the old dict, e.g. variables['current_position'],
+    # keeps working.
+    __slots__ = TIC_VARIABLE_NAMES
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        setattr(self, name, value)
+
+    def __contains__(self, name):
+        return hasattr(self, name)
+
+
+def decode_variables(buffer, variables=None, fields=None, offset=0):
+    # Decodes a variable block (bytes, bytearray, array or memoryview) without
+    # slicing it. Decodes every field in one unpack, or only the named fields.
+    # offset is the position of buffer[0] in the block, for partial reads.
+    if variables is None:
+        variables = TicVariables()
+    if fields is None:
+        for name, value in zip(TIC_VARIABLE_NAMES, TIC_VARIABLES_STRUCT.unpack_from(buffer)):
+            setattr(variables, name, value)
+        variables.vin_voltage /= 1000
+    else:
+        for name in fields:
+            field_offset, field_struct = TIC_VARIABLE_FIELDS[name]
+            value = field_struct.unpack_from(buffer, field_offset - offset)[0]
+            setattr(variables, name, value / 1000 if name == 'vin_voltage' else value)
+    return variables
+
+
+_variables_spans = {}
+
+
+def variables_span(fields):
+    # (offset, length) of the smallest block read that covers the named fields
+    span = _variables_spans.get(fields)
+    if span is None:
+        start = min(TIC_VARIABLE_FIELDS[name][0] for name in fields)
+        end = max(TIC_VARIABLE_FIELDS[name][0] + TIC_VARIABLE_FIELDS[name][1].size for name in fields)
+        span = _variables_spans[fields] = (start, end - start)
+    return span
+
+
 class TicError(Exception):
     pass
 
@@ -433,7 +536,7 @@ class TicDevice:
         self.cfg = None
         self.intf = None
         self.poll_period = .01
-        self.variables={}
+        self.variables=TicVariables()
         self.init_defaults()
 
     def close(self):
@@ -658,47 +761,38 @@ class TicDevice:
         return s
 
 
-    def parse_status_variables (self, buffer):
-        self.variables['operation_state'] = int.from_bytes (buffer [TIC_VAR_OPERATION_STATE:TIC_VAR_OPERATION_STATE+1],byteorder='little')
-        self.variables['energized_position_uncertain'] = int.from_bytes (buffer [0x1:0x2],byteorder='little')
-        self.variables['error_status'] = int.from_bytes (buffer [0x2:0x4],byteorder='little')
+    def parse_status_variables (self, buffer, variables=None):
+        if variables is None:
+            variables = self.variables
+        decode_variables(buffer, variables, fields=TIC_STATUS_VARIABLES)
 
-    def get_variables(self, clear_errors = False):
-        assert(TIC_VARIABLES_SIZE <= TIC_MAX_USB_RESPONSE_SIZE)
+    def read_variables(self, offset, length, clear_errors = False):
+        # reads part of the variable block, like TicI2C.get_variables(offset, length)
+        assert(offset + length <= TIC_VARIABLES_SIZE)
         if clear_errors:
             cmd = TIC_CMD_GET_VARIABLE_AND_CLEAR_ERRORS_OCCURRE
         else:
             cmd = TIC_CMD_GET_VARIABLE
-        buffer = self.transfer(request_type= TIC_REQUEST_VARIABLES,
-                               request= cmd,
-                               data_or_length =  TIC_VARIABLES_SIZE,
-                               msg="getting variables.")
-
-        self.parse_status_variables (buffer)
-        self.variables['planning_mode'] = int.from_bytes (buffer [TIC_VAR_PLANNING_MODE:TIC_VAR_PLANNING_MODE+1],byteorder='little')
-        self.variables['target_position'] = int.from_bytes ( buffer [TIC_VAR_TARGET_POSITION:TIC_VAR_TARGET_POSITION+4],byteorder='little', signed=True)
-        self.variables['target_velocity'] = int.from_bytes ( buffer [TIC_VAR_TARGET_VELOCITY:TIC_VAR_TARGET_VELOCITY+4],byteorder='little', signed=True)
-        self.variables['starting_speed'] = int.from_bytes ( buffer [TIC_VAR_STARTING_SPEED:TIC_VAR_STARTING_SPEED+4],byteorder='little')
-        self.variables['max_speed'] = int.from_bytes ( buffer [TIC_VAR_MAX_SPEED:TIC_VAR_MAX_SPEED+4],byteorder='little')
-        self.variables['max_decel'] = int.from_bytes ( buffer [TIC_VAR_MAX_DECEL:TIC_VAR_MAX_DECEL+4],byteorder='little')
-        self.variables['max_accel'] = int.from_bytes ( buffer [TIC_VAR_MAX_ACCEL:TIC_VAR_MAX_ACCEL+4],byteorder='little')
-        self.variables['current_position'] = int.from_bytes ( buffer [TIC_VAR_CURRENT_POSITION:TIC_VAR_CURRENT_POSITION +4],byteorder='little', signed=True)
-        self.variables['current_velocity'] = int.from_bytes ( buffer [TIC_VAR_CURRENT_VELOCITY:TIC_VAR_CURRENT_VELOCITY+4],byteorder='little', signed=True)
-        self.variables['acting_target_position'] = int.from_bytes ( buffer [TIC_VAR_ACTING_TARGET_POSITION:TIC_VAR_ACTING_TARGET_POSITION +4],byteorder='little', signed=True)
-        self.variables['time_since_last_step'] = int.from_bytes ( buffer [TIC_VAR_TIME_SINCE_LAST_STEP :TIC_VAR_TIME_SINCE_LAST_STEP +4],byteorder='little')
-        self.variables['device_reset'] = int.from_bytes (buffer [TIC_VAR_DEVICE_RESET:TIC_VAR_DEVICE_RESET+1],byteorder='little')
-        self.variables['vin_voltage'] = int.from_bytes (buffer [TIC_VAR_VIN_VOLTAGE:TIC_VAR_VIN_VOLTAGE +2],byteorder='little') / 1000
-        self.variables['up_time'] = int.from_bytes ( buffer [TIC_VAR_UP_TIME:TIC_VAR_UP_TIME+4],byteorder='little')
-        self.variables['encoder_position'] = int.from_bytes ( buffer [TIC_VAR_ENCODER_POSITION:TIC_VAR_ENCODER_POSITION+4], byteorder='little', signed=True)
-        self.variables['rc_pulse_width'] = int.from_bytes (buffer [TIC_VAR_RC_PULSE_WIDTH:TIC_VAR_RC_PULSE_WIDTH+2],byteorder='little')
-        self.variables['step_mode'] = int.from_bytes ( buffer [TIC_VAR_STEP_MODE:TIC_VAR_STEP_MODE +1], byteorder="little")
-        self.variables['current_limit'] = int.from_bytes (buffer [TIC_VAR_CURRENT_LIMIT:TIC_VAR_CURRENT_LIMIT+1],byteorder='little')
-        self.variables['decay_mode'] = int.from_bytes ( buffer [TIC_VAR_DECAY_MODE:TIC_VAR_DECAY_MODE+1],byteorder='little')
-        self.variables['input_state'] = int.from_bytes ( buffer [TIC_VAR_INPUT_STATE:TIC_VAR_INPUT_STATE+1],byteorder='little')
-        self.variables['input_after_averaging'] = int.from_bytes (buffer [TIC_VAR_INPUT_AFTER_AVERAGING:TIC_VAR_INPUT_AFTER_AVERAGING+2],byteorder='little')
-        self.variables['input_after_hysteresis'] = int.from_bytes (buffer [TIC_VAR_INPUT_AFTER_HYSTERESIS:TIC_VAR_INPUT_AFTER_HYSTERESIS+2],byteorder='little')
-        self.variables['input_after_scaling'] = int.from_bytes ( buffer [TIC_VAR_INPUT_AFTER_SCALING:TIC_VAR_INPUT_AFTER_SCALING+2],byteorder='little', signed=True)
+        return self.transfer(request_type= TIC_REQUEST_VARIABLES,
+                             request= cmd,
+                             index= offset,
+                             data_or_length= length,
+                             msg="getting variables.")
+
+    def get_variables(self, clear_errors = False, variables=None, fields=None):
+        # variables: the record to decode into, defaults to self.variables
+        # fields: a tuple of the variables to read, defaults to the whole block.
+        #   Only the span of the block covering the fields is transferred.
+        assert(TIC_VARIABLES_SIZE <= TIC_MAX_USB_RESPONSE_SIZE)
+        if fields is None:
+            offset, length = 0, TIC_VARIABLES_SIZE
+        else:
+            offset, length = variables_span(fields)
+        buffer = self.read_variables(offset, length, clear_errors)
 
+        if variables is None:
+            variables = self.variables
+        decode_variables(buffer, variables, fields, offset)
 
         #log.debug (self.variables['step_mode'])
         #for k, v in sorted(self.variables.items()):
@@ -716,6 +810,10 @@ class TicDevice:
         TIC_VAR_PIN_STATES = 0x48
         '''
 
+    def get_current_position(self):
+        self.get_variables(fields=('current_position',))
+        return self.variables.current_position
+
     def current_defaults_for_product( self):
         if self.product_id ==  TIC_PRODUCT_ID_T500:
             self.product = TIC_PRODUCT_T500
@@ -806,3 +904,112 @@ class TicDevice:
 
 
 
+
+
+class TicWorker:
+    # Runs the USB transfers of a TicDevice on a dedicated thread so that the
+    # caller never blocks on USB latency.
+    #
+    # Commands are sent in order from a bounded queue. A command that repeats
+    # the method of the last queued (not yet sent) command replaces its
+    # arguments instead of being queued again, so a burst of set target
+    # velocity commands only sends the latest velocity. The variable block is
+    # read every poll_period into the back of a double buffer, then the
+    # buffers are swapped; `variables` always returns the latest complete read.
+    # Passing `fields` limits each poll to the span of the block holding them.
+    def __init__(self, tic_device, queue_size=16, poll_period=.01, fields=None):
+        self.tic_device = tic_device
+        self.poll_period = poll_period
+        self.fields = fields            # variables read by each poll, defaults to all of them
+        self.coalesced_commands = 0
+        self.error = None
+        self._commands = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._tail = None               # last queued command, until the worker takes it
+        self._buffers = [TicVariables(), TicVariables()]
+        self._front = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        # fill the front buffer before any reader can see it
+        self.tic_device.get_variables(variables=self._buffers[self._front], fields=self.fields)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="tic_worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._running = False
+        try:
+            self._commands.put_nowait(None)     # wake the worker up
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def variables(self):
+        return self._buffers[self._front]
+
+    def submit(self, method, *args):
+        # queue a call of a TicDevice method, e.g. submit(TicDevice.halt_and_hold)
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        with self._lock:
+            if self._tail is not None and self._tail[0] is method:
+                self._tail[1] = args
+                self.coalesced_commands += 1
+                return
+            command = [method, args]
+            try:
+                self._commands.put_nowait(command)
+            except queue.Full:
+                raise TicError("tic command queue full")
+            self._tail = command
+
+    # non-blocking versions of the TicDevice commands used by the controller
+    def set_target_velocity(self, velocity):
+        self.submit(TicDevice.set_target_velocity, velocity)
+
+    def set_target_position(self, position):
+        self.submit(TicDevice.set_target_position, position)
+
+    def halt_and_hold(self):
+        self.submit(TicDevice.halt_and_hold)
+
+    def halt_and_set_position(self, position):
+        self.submit(TicDevice.halt_and_set_position, position)
+
+    def _run(self):
+        next_poll = time.monotonic() + self.poll_period
+        while self._running:
+            try:
+                command = self._commands.get(timeout=max(next_poll - time.monotonic(), 0))
+            except queue.Empty:
+                command = None
+
+            if command is not None:
+                with self._lock:
+                    if command is self._tail:
+                        self._tail = None
+                    method, args = command
+                self._transfer(method, *args)
+
+            if time.monotonic() >= next_poll:
+                back = 1 - self._front
+                if self._transfer(TicDevice.get_variables, variables=self._buffers[back], fields=self.fields):
+                    self._front = back
+                next_poll += self.poll_period
+                if next_poll < time.monotonic():
+                    next_poll = time.monotonic() + self.poll_period
+
+    def _transfer(self, method, *args, **kwargs):
+        try:
+            method(self.tic_device, *args, **kwargs)
+        except TicError as e:
+            log.error("tic worker: %s failed", method.__name__)
+            self.error = e
+            return False
+        return True
@@ -18,7 +18,8 @@ class AlarmHandler:
     def __init__(self, ventilator_ui, ventilator_controller):
         self.ui = ventilator_ui
         self.controller = ventilator_controller
-        self.buzzer = buzzer.Buzzer(gpio_map.BUZZER_PIN_1)
+        # BUZZER_PIN_1 is already set up by the controller, on its gpio backend
+        self.buzzer = ventilator_controller.buzzer_1
         
     def handle_alarms(self, alarm):
 
@@ -0,0 +1,55 @@
+#
+# log and trace analysis for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+# e.g. python3 analysis/analyze_logs.py                       everything in logs/
+#      python3 analysis/analyze_logs.py logs/20200815213959.log --breaths
+#      python3 analysis/analyze_logs.py logs --save day.npz
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+from time import perf_counter
+import numpy as np
+from analysis.breath_log import BreathLog, PHASES
+
+LOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'logs'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="per breath timing from the ventilator logs and traces")
+    parser.add_argument("paths", nargs="*", default=[LOG_DIR],
+                        help="log, trace or saved .npz files, or directories of logs and traces")
+    parser.add_argument("--breaths", action="store_true", help="print a row per breath")
+    parser.add_argument("--save", default=None, help="write the columns to this .npz file")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    log = BreathLog.load(args.paths)
+    elapsed = perf_counter() - start
+
+    if args.breaths:
+        starts, durations = log.breaths()
+        periods = durations.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ie = (durations[:, 2] + durations[:, 3]) / (durations[:, 0] + durations[:, 1])
+        print("{:>18} {:>8} ".format("start", "period") +
+              " ".join("{:>16}".format(name) for name in PHASES) + " {:>6}".format("ie"))
+        for t, period, row, ratio in zip(starts, periods, durations, ie):
+            print("{:>18.3f} {:>8.3f} ".format(t, period) +
+                  " ".join("{:>16.3f}".format(d) for d in row) + " {:>6.2f}".format(ratio))
+
+    for name, value in log.summary().items():
+        print("{:<34} {}".format(name, "{:.4g}".format(value) if isinstance(value, float) else value))
+    print("read {} files in {:.2f} s".format(len(log.sources), elapsed))
+
+    if args.save is not None:
+        log.save(args.save)
+
+
+if __name__ == "__main__":
+    main()
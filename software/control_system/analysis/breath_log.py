@@ -0,0 +1,388 @@
+#
+# columnar log and trace analysis for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+# Turns the logs of ventilator.py (logs/*.log) and the binary traces of
+# telemetry.py (logs/*.trace) into numpy columns of three tables:
+#
+#   states   one row per state change: time, state, run
+#   targets  one row per "encoder: X, motor controller: Y" line: time, kind, encoder, motor, run
+#   plans    one row per planned breath: start, insp end, insp pause end, exp end, exp pause end
+#
+# Times are in seconds, wall clock for logs and monotonic for traces. Each
+# file is a run, breaths never span two runs. A trace is named after the log
+# of its run and is skipped when that log is loaded too: the log has the
+# plans, and the two clocks cannot be mixed in one run. The queries over the tables
+# are vectorized, a day of logs is read line by line and analyzed in seconds.
+#
+
+import glob
+import os
+import re
+from datetime import datetime
+import numpy as np
+from telemetry import read_telemetry
+
+# states of a breath, in order, as named by VentilatorController
+PHASES = ("INSP_STATE", "INSP_PAUSE", "EXP_STATE", "EXP_PAUSE_STATE")
+
+# target kinds
+LOWER_TARGET = 0        # end of insp
+UPPER_TARGET = 1        # end of exp
+OTHER_TARGET = 2        # homing and bag contact
+
+PLAN_COLUMNS = ("start", "insp_end", "insp_pause_end", "exp_end", "exp_pause_end")
+PLAN_PREFIXES = {"start:": 0, "insp end:": 1, "insp pause end:": 2, "exp end:": 3, "exp pause end:": 4}
+
+POSITION = re.compile(r"(.*?)\s*encoder: (-?\d+), motor controller: (-?\d+)")
+ACTUAL = re.compile(r"actual: ([\d\- :.]+)\)")
+
+
+class BreathLog:
+    """
+    The state changes, targets reached and breath plans of one or more
+    runs of the ventilator, as numpy columns.
+    """
+
+    def __init__(self):
+        self.state_names = []
+        self.state_time = np.empty(0)
+        self.state = np.empty(0, dtype=np.int16)
+        self.state_run = np.empty(0, dtype=np.int32)
+        self.target_time = np.empty(0)
+        self.target_kind = np.empty(0, dtype=np.int8)
+        self.target_encoder = np.empty(0, dtype=np.int64)
+        self.target_motor = np.empty(0, dtype=np.int64)
+        self.target_run = np.empty(0, dtype=np.int32)
+        self.plans = np.empty((0, len(PLAN_COLUMNS)))
+        self.sources = []
+
+    #############
+    ## Loading ##
+    #############
+
+    @classmethod
+    def load(cls, paths):
+        """
+        @param paths: log (.log), trace (.trace) or saved (.npz) files, or
+                      directories of logs and traces
+        @return: a BreathLog of all of them, one run per log or trace
+                 without its log
+        """
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files += sorted(glob.glob(os.path.join(path, "*.log")) +
+                                glob.glob(os.path.join(path, "*.trace")))
+            else:
+                files.append(path)
+
+        # the run of a trace is already counted from its log
+        logged = {os.path.splitext(os.path.basename(path))[0] for path in files if path.endswith(".log")}
+        files = [path for path in files
+                 if not (path.endswith(".trace") and os.path.splitext(os.path.basename(path))[0] in logged)]
+
+        parts = []
+        for path in files:
+            if path.endswith(".trace"):
+                parts.append(cls.from_trace(path))
+            elif path.endswith(".npz"):
+                parts.append(cls.from_npz(path))
+            else:
+                parts.append(cls.from_log(path))
+        return cls.concatenate(parts)
+
+    @classmethod
+    def from_log(cls, path):
+        """
+        @param path: a log file of LoggerInit's format
+        @return: its BreathLog
+        """
+        with open(path, errors="replace") as f:
+            log = cls.from_lines(f)
+        log.sources = [path]
+        return log
+
+    @classmethod
+    def from_lines(cls, lines):
+        """
+        parse log lines as they are read
+        @param lines: an iterable of the lines of one run
+        @return: their BreathLog
+        """
+        names = {}
+        state_time, state = [], []
+        target_time, target_kind, target_encoder, target_motor = [], [], [], []
+        plans = []
+        seconds = {}        # epoch of each "YYYY-mm-dd HH:MM:SS", asctime changes once a second
+
+        for line in lines:
+            parts = line.split(" - ", 3)
+            if len(parts) < 4:
+                continue
+            asctime = parts[0]
+            message = parts[3].strip()
+
+            if message.startswith("-->"):
+                kind = 0
+            elif "encoder: " in message and "motor controller: " in message:
+                kind = 1
+            elif message.startswith(("start:", "insp ", "exp ")):
+                kind = 2
+            else:
+                continue
+
+            second = seconds.get(asctime[:19])
+            if second is None:
+                try:
+                    second = seconds[asctime[:19]] = \
+                        datetime.strptime(asctime[:19], "%Y-%m-%d %H:%M:%S").timestamp()
+                except ValueError:
+                    continue
+            t = second + int(asctime[20:23] or 0) / 1000
+
+            if kind == 0:
+                state_time.append(t)
+                state.append(names.setdefault(message[3:].strip(), len(names)))
+            elif kind == 1:
+                match = POSITION.match(message)
+                if match is None:
+                    continue
+                label, encoder, motor = match.groups()
+                actual = ACTUAL.search(label)
+                if actual is not None:
+                    t = datetime.fromisoformat(actual.group(1).strip()).timestamp()
+                target_time.append(t)
+                target_kind.append(LOWER_TARGET if label.startswith("Lower target reached") else
+                                   UPPER_TARGET if label.startswith("Upper target reached") else
+                                   OTHER_TARGET)
+                target_encoder.append(int(encoder))
+                target_motor.append(int(motor))
+            else:
+                prefix, _, value = message.partition(":")
+                column = PLAN_PREFIXES.get(prefix + ":")
+                if column is None:
+                    continue
+                try:
+                    planned = datetime.fromisoformat(value.strip()).timestamp()
+                except ValueError:
+                    continue
+                if column == 0:
+                    plans.append([planned] + [np.nan] * (len(PLAN_COLUMNS) - 1))
+                elif plans:
+                    plans[-1][column] = planned
+
+        log = cls()
+        log.state_names = sorted(names, key=names.get)
+        log.state_time = np.array(state_time)
+        log.state = np.array(state, dtype=np.int16)
+        log.state_run = np.zeros(len(state), dtype=np.int32)
+        log.target_time = np.array(target_time)
+        log.target_kind = np.array(target_kind, dtype=np.int8)
+        log.target_encoder = np.array(target_encoder, dtype=np.int64)
+        log.target_motor = np.array(target_motor, dtype=np.int64)
+        log.target_run = np.zeros(len(target_time), dtype=np.int32)
+        log.plans = np.array(plans, dtype=float).reshape(-1, len(PLAN_COLUMNS))
+        return log
+
+    @classmethod
+    def from_trace(cls, path):
+        """
+        @param path: a trace file of TelemetryRecorder
+        @return: its BreathLog, the state changes and the targets reached
+                 at the ends of the strokes, without plans
+        """
+        records, info = read_telemetry(path)
+        log = cls()
+        log.sources = [path]
+        log.state_names = list(info['state_names'])
+        if len(records) == 0:
+            return log
+
+        state = records['state']
+        changes = np.concatenate(([0], np.flatnonzero(state[1:] != state[:-1]) + 1))
+        log.state_time = records['time'][changes] / 1e9
+        log.state = state[changes].astype(np.int16)
+        log.state_run = np.zeros(len(changes), dtype=np.int32)
+
+        # the tick that reaches a target is the first one recorded in the pause after the stroke
+        previous = np.concatenate(([-1], log.state[:-1]))
+        ends = []
+        for stroke, pause, kind in ((PHASES[0], PHASES[1], LOWER_TARGET), (PHASES[2], PHASES[3], UPPER_TARGET)):
+            if stroke in log.state_names and pause in log.state_names:
+                mask = (previous == log.state_names.index(stroke)) & (log.state == log.state_names.index(pause))
+                ends.append((changes[mask], kind))
+        if ends:
+            index = np.concatenate([i for i, _ in ends])
+            kind = np.concatenate([np.full(len(i), k, dtype=np.int8) for i, k in ends])
+            order = np.argsort(index, kind='stable')
+            index, kind = index[order], kind[order]
+            log.target_time = records['time'][index] / 1e9
+            log.target_kind = kind
+            log.target_encoder = records['encoder'][index].astype(np.int64)
+            log.target_motor = records['tic_position'][index].astype(np.int64)
+            log.target_run = np.zeros(len(index), dtype=np.int32)
+        return log
+
+    @classmethod
+    def from_npz(cls, path):
+        """
+        @param path: a file written by save
+        """
+        log = cls()
+        with np.load(path) as data:
+            for name in data.files:
+                value = data[name]
+                setattr(log, name, value.tolist() if name in ("state_names", "sources") else value)
+        return log
+
+    def save(self, path):
+        """
+        write the columns to a compressed numpy archive
+        """
+        np.savez_compressed(path, **{name: np.asarray(value) for name, value in vars(self).items()})
+
+    @classmethod
+    def concatenate(cls, logs):
+        """
+        @param logs: BreathLogs, their runs are renumbered in order
+        @return: one BreathLog with the state names merged
+        """
+        merged = cls()
+        states, runs = [], 0
+        for log in logs:
+            # map the state numbers of the log to the merged names
+            mapping = np.array([merged._state_id(name) for name in log.state_names] or [0], dtype=np.int16)
+            merged.state_time = np.concatenate((merged.state_time, log.state_time))
+            states.append(mapping[log.state] if len(log.state) else log.state)
+            merged.state_run = np.concatenate((merged.state_run, log.state_run + runs))
+            merged.target_time = np.concatenate((merged.target_time, log.target_time))
+            merged.target_kind = np.concatenate((merged.target_kind, log.target_kind))
+            merged.target_encoder = np.concatenate((merged.target_encoder, log.target_encoder))
+            merged.target_motor = np.concatenate((merged.target_motor, log.target_motor))
+            merged.target_run = np.concatenate((merged.target_run, log.target_run + runs))
+            merged.plans = np.concatenate((merged.plans, log.plans))
+            merged.sources += log.sources
+            runs += int(max(log.state_run.max(initial=-1), log.target_run.max(initial=-1))) + 1
+        merged.state = np.concatenate(states).astype(np.int16) if states else merged.state
+        return merged
+
+    def _state_id(self, name):
+        if name not in self.state_names:
+            self.state_names.append(name)
+        return self.state_names.index(name)
+
+    #############
+    ## Queries ##
+    #############
+
+    def breaths(self):
+        """
+        @return: (start times, phase durations) of the complete breaths:
+                 started by INSP_STATE, followed by the next one in the same
+                 run, and only the PHASES in between. The durations are an
+                 array of a column per phase (in seconds).
+        """
+        t, state, run = self.state_time, self.state, self.state_run
+        if PHASES[0] not in self.state_names or len(t) < 2:
+            return np.empty(0), np.empty((0, len(PHASES)))
+
+        # phase column of each state, -1 for the other states
+        column = np.full(max(len(self.state_names), 1), -1)
+        for i, name in enumerate(PHASES):
+            if name in self.state_names:
+                column[self.state_names.index(name)] = i
+        phase = column[state]
+
+        is_start = phase == 0
+        breath = np.cumsum(is_start) - 1            # breath of each state change
+        starts = np.flatnonzero(is_start)
+        n = len(starts)
+
+        # each state lasts until the next change of the same run
+        duration = np.full(len(t), np.nan)
+        same_run = run[1:] == run[:-1]
+        duration[:-1][same_run] = np.diff(t)[same_run]
+
+        inside = breath >= 0
+        durations = np.zeros((n, len(PHASES)))
+        in_phase = inside & (phase >= 0)
+        np.add.at(durations, (breath[in_phase], phase[in_phase]), duration[in_phase])
+        others = np.bincount(breath[inside & (phase < 0)], minlength=n)[:n]
+
+        # complete: the next breath starts in the same run with nothing else in between
+        complete = np.zeros(n, dtype=bool)
+        complete[:-1] = (run[starts[1:]] == run[starts[:-1]]) & (others[:-1] == 0)
+        return t[starts[complete]], durations[complete]
+
+    def breath_periods(self):
+        """
+        @return: the duration (s) of each complete breath
+        """
+        _, durations = self.breaths()
+        return durations.sum(axis=1)
+
+    def phase_durations(self):
+        """
+        @return: a dict of the PHASES to the duration (s) of that phase in each complete breath
+        """
+        _, durations = self.breaths()
+        return {name: durations[:, i] for i, name in enumerate(PHASES)}
+
+    def ie_ratios(self):
+        """
+        @return: the measured exp : insp ratio of each complete breath, insp
+                 including its pause and exp including its pause
+        """
+        _, durations = self.breaths()
+        insp = durations[:, 0] + durations[:, 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (durations[:, 2] + durations[:, 3]) / insp
+
+    def target_latencies(self, kind=LOWER_TARGET):
+        """
+        the time from the planned end of a stroke to the target being
+        reached, positive when late. The plans are only in the logs, the
+        log of a traced run has them, a trace alone gives empty results.
+        @param kind: LOWER_TARGET for insp, UPPER_TARGET for exp
+        @return: the latency (s) of each planned breath whose target was reached
+        """
+        planned_end = self.plans[:, 1 if kind == LOWER_TARGET else 3]
+        start = self.plans[:, 0]
+        reached = np.sort(self.target_time[self.target_kind == kind])
+        if len(start) == 0 or len(reached) == 0:
+            return np.empty(0)
+
+        # first target after the start of the breath, before the start of the next one
+        index = np.searchsorted(reached, start)
+        next_start = np.append(start[1:], np.inf)
+        found = index < len(reached)
+        index = np.minimum(index, len(reached) - 1)
+        found &= reached[index] < next_start
+        return (reached[index] - planned_end)[found & ~np.isnan(planned_end)]
+
+    def summary(self):
+        """
+        @return: a dict of means and spreads of the queries
+        """
+        periods = self.breath_periods()
+        phases = self.phase_durations()
+        ie = self.ie_ratios()
+        result = {
+            'runs': len(self.sources),
+            'state changes': len(self.state_time),
+            'breaths': len(periods),
+            'period mean (s)': np.mean(periods) if len(periods) else np.nan,
+            'period std (s)': np.std(periods) if len(periods) else np.nan,
+            'bpm': 60 / np.mean(periods) if len(periods) else np.nan,
+            'ie mean': np.mean(ie) if len(ie) else np.nan,
+        }
+        for name, durations in phases.items():
+            result[name + ' mean (s)'] = np.mean(durations) if len(durations) else np.nan
+        for label, kind in (('insp', LOWER_TARGET), ('exp', UPPER_TARGET)):
+            latencies = self.target_latencies(kind)
+            result[label + ' target latency mean (s)'] = np.mean(latencies) if len(latencies) else np.nan
+            result[label + ' target latency p95 (s)'] = np.percentile(latencies, 95) if len(latencies) else np.nan
+        return result
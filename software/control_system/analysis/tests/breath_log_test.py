@@ -0,0 +1,167 @@
+#
+# Log and trace analysis test, on the log and trace of the simulated
+# ventilator and on a generated day of logs
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+import numpy as np
+from hal.sim import SimBackend
+from hal.tests.sim_ventilator_test import build, home
+from analysis.breath_log import BreathLog, PHASES, LOWER_TARGET, UPPER_TARGET
+from configs.ventilation_configs import CONTROL_LOOP_PERIOD
+from telemetry import TelemetryRecorder
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'     # as LoggerInit
+
+
+def ventilate(path, seconds=15.0, bpm=20, trace_path=None):
+    """
+    run the simulated ventilator logged to path, and traced to
+    trace_path if given
+    """
+    hal = SimBackend(realtime=False)
+    telemetry = TelemetryRecorder(trace_path) if trace_path is not None else None
+    controller = build(hal, telemetry)
+
+    # log times from the simulated clock, it runs faster than the wall clock
+    def sim_time(record):
+        record.created = hal.clock.time()
+        record.msecs = (record.created - int(record.created)) * 1000
+        return True
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(sim_time)
+    logger = logging.getLogger('ventilator_controller')
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        if telemetry is not None:
+            telemetry.start()
+        home(controller)
+        controller.update_bpm(bpm)
+        controller.update_tidal_volume(400)
+        controller.set_state(controller.START_STATE)
+        controller.run_fixed_rate(CONTROL_LOOP_PERIOD, duration=seconds)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+        controller.pressure_sensor.stop_streaming()
+        if telemetry is not None:
+            telemetry.stop()
+
+
+def check(log, bpm, planned):
+    periods = log.breath_periods()
+    assert len(periods) >= 3, periods
+    assert np.all(np.abs(periods - 60 / bpm) < 0.05), periods
+    phases = log.phase_durations()
+    assert set(phases) == set(PHASES)
+    assert np.all(phases["INSP_STATE"] > 0) and np.all(phases["EXP_STATE"] > 0)
+    ie = log.ie_ratios()
+    assert np.all((ie > 0.7) & (ie < 1.4)), ie
+    assert np.count_nonzero(log.target_kind == LOWER_TARGET) >= len(periods)
+    if planned:
+        latency = log.target_latencies(LOWER_TARGET)
+        assert len(latency) >= len(periods)
+        assert np.all(np.abs(latency) < 0.5), latency
+        assert len(log.target_latencies(UPPER_TARGET)) >= len(periods) - 1
+    return periods
+
+
+def test_sim(bpm=20):
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = os.path.join(directory, "sim.log")
+        traced_log_path = os.path.join(directory, "traced.log")
+        trace_path = os.path.join(directory, "traced.trace")
+        ventilate(log_path, bpm=bpm)
+        ventilate(traced_log_path, bpm=bpm, trace_path=trace_path)
+        from_log = check(BreathLog.from_log(log_path), bpm, planned=True)
+        from_trace = check(BreathLog.from_trace(trace_path), bpm, planned=False)
+
+        # the plans are logged with a recorder attached too
+        traced = BreathLog.from_log(traced_log_path)
+        check(traced, bpm, planned=True)
+        assert len(traced.plans) >= len(traced.breath_periods()), len(traced.plans)
+
+        # log and trace describe the same breaths
+        n = min(len(from_log), len(from_trace))
+        assert np.allclose(from_log[:n], from_trace[:n], atol=0.01), (from_log, from_trace)
+
+        # a trace is the same run as its log, the directory is two runs
+        runs = BreathLog.load([directory])
+        assert runs.sources == [log_path, traced_log_path], runs.sources
+        assert len(runs.breath_periods()) == len(from_log) + len(traced.breath_periods())
+        assert runs.summary()['runs'] == 2
+        paired = BreathLog.load([traced_log_path, trace_path])
+        assert paired.sources == [traced_log_path]
+        assert np.array_equal(paired.breath_periods(), traced.breath_periods())
+
+        # a trace alone and another log are two runs, saved and loaded as columns
+        both = BreathLog.load([log_path, trace_path])
+        assert len(both.breath_periods()) == len(from_log) + len(from_trace)
+        saved = os.path.join(directory, "both.npz")
+        both.save(saved)
+        loaded = BreathLog.load([saved])
+        assert loaded.state_names == both.state_names
+        assert np.array_equal(loaded.breath_periods(), both.breath_periods())
+
+
+def write_day(path, breaths=28800, bpm=20):
+    """
+    write a log of a day of breaths, in the format the controller logs,
+    insp and its pause take a quarter of the breath
+    """
+    t = datetime(2020, 8, 15)
+    period = timedelta(seconds=60 / bpm)
+    phase = period / 4
+    line = "{} - ventilator_controller - INFO - {}\n"
+    with open(path, "w") as f:
+        for i in range(breaths):
+            start = t + i * period
+            stamp = lambda dt: (start + dt).strftime("%Y-%m-%d %H:%M:%S,%f")[:23]
+            lines = [(timedelta(0), "State change: EXP_PAUSE_STATE"), (timedelta(0), " --> INSP_STATE")]
+            for name, at in (("start:         ", 0), ("insp end:      ", 0.9), ("insp pause end:", 1),
+                             ("exp end:       ", 1.9), ("exp pause end: ", 4)):
+                lines.append((timedelta(0), "{} {}".format(name, start + at * phase)))
+            lines += [(timedelta(0), "freq: 0.3333"), (timedelta(0), "cur tar-300"),
+                      (0.95 * phase, "Lower target reached (insp end actual: {}) encoder: -300, "
+                                     "motor controller: -7200".format(start + 0.95 * phase)),
+                      (0.95 * phase, "State change: INSP_STATE"), (0.95 * phase, " --> INSP_PAUSE"),
+                      (phase, "State change: INSP_PAUSE"), (phase, " --> EXP_STATE"),
+                      (1.95 * phase, "Upper target reached (exp end actual: {}) encoder: -120, "
+                                     "motor controller: -2880".format(start + 1.95 * phase)),
+                      (1.95 * phase, "State change: EXP_STATE"), (1.95 * phase, " --> EXP_PAUSE_STATE")]
+            f.writelines(line.format(stamp(dt), message) for dt, message in lines)
+
+
+def test_day(breaths=28800):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "day.log")
+        write_day(path, breaths)
+        t = perf_counter()
+        log = BreathLog.load([path])
+        summary = log.summary()
+        t = perf_counter() - t
+        print("{} breaths ({:.1f} MB of log) analyzed in {:.2f} s".format(
+            breaths, os.path.getsize(path) / 1e6, t))
+
+    assert summary['breaths'] == breaths - 1, summary['breaths']
+    assert abs(summary['period mean (s)'] - 3.0) < 1e-3
+    assert abs(summary['ie mean'] - 3.0) < 1e-3
+    assert abs(summary['insp target latency mean (s)'] - 0.0375) < 1e-3
+    return t
+
+
+if __name__ == "__main__":
+    test_sim()
+    test_day()
+    print("all tests passed")
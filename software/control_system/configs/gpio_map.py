@@ -9,6 +9,7 @@ CONTACT_SWITCH_PIN = 24  # Todo: define this
 ENCODER_A_PLUS_PIN = 16
 ENCODER_B_PLUS_PIN = 18
 PRESSURE_SENSOR_PIN = 0 # Todo: define this
+PRESSURE_ALERT_PIN = 27  # ADS1115 ALERT/RDY
 BUZZER_PIN_1 = 25
 BUZZER_PIN_2 = 8
 POWER_SWITCH_PIN = 17
@@ -0,0 +1,29 @@
+#
+# hardware abstraction layer constants
+#
+
+HAL_BACKEND = "real"                # "real" for the Raspberry Pi, "sim" for the simulated ventilator
+
+# simulation timing
+SIM_PLANT_DT = 0.00025              # (s) integration step of the plant
+SIM_REALTIME = True                 # pace the simulated clock to the wall clock, for the gui
+SIM_TIC_COMMAND_LATENCY = 0.0002    # (s) simulated time taken by each tic usb command
+
+# tic step generator, in tic units
+SIM_TIC_MAX_SPEED = 300000000       # (microsteps/10000s) 30000 pulses/s
+SIM_TIC_MAX_ACCEL = 100000000       # (microsteps/100s^2) 1000000 pulses/s^2
+
+# arm, in encoder counts from the upper limit switch
+SIM_ARM_START_POSITION = -40        # arm position at power up
+SIM_UPPER_SWITCH_POSITION = 0       # the absolute switch closes at and above this position
+SIM_CONTACT_POSITION = -120         # the contact switch closes on the bag at and below this position
+SIM_ARM_STIFFNESS = 35500.0         # (1/s^2) belt stiffness between the motor and the arm, ~30 Hz
+SIM_ARM_DAMPING = 260.0             # (1/s) belt damping, ~0.7 of critical
+
+# bag and patient lung
+SIM_BAG_STIFFNESS = 20.0            # (1/s^2) elastic push back of the bag per count of compression
+SIM_PRESSURE_LOAD = 1500.0          # (counts/s^2 per cmH2O) push back of the airway pressure on the arm
+SIM_LUNG_COMPLIANCE = 50.0          # (ml/cmH2O)
+SIM_AIRWAY_RESISTANCE = 20.0        # (cmH2O/(L/s))
+SIM_PEEP = 0.0                      # (cmH2O) pressure the lung exhales down to
+SIM_PRESSURE_NOISE = 0.0            # (counts) standard deviation of the simulated adc noise
@@ -0,0 +1,11 @@
+#
+# logging constants
+#
+
+LOG_DIR = "logs"                    # log files are named <start time>.log in this directory
+LOG_LEVEL = "DEBUG"
+LOG_ASYNC = True                    # log calls enqueue, a listener thread formats and writes
+LOG_ROTATION = None                 # None for one file, "size" or "time" to roll over
+LOG_MAX_BYTES = 10 * 1024 * 1024    # size of a file before it rolls over, for "size"
+LOG_ROTATE_WHEN = "midnight"        # TimedRotatingFileHandler interval, for "time"
+LOG_BACKUP_COUNT = 10               # rolled over files kept
@@ -27,6 +27,29 @@ PID_TIME_SCALE_FACTOR = 0.00725 # for 250 ticks
 # PID_TIME_SCALE_FACTOR = 0.00415 # for 500 ticks
 # PID_TIME_SCALE_FACTOR = 0.0035 # for 650 ticks
 
+# pid time scale factor as a polynomial of the move distance (ticks), highest degree first,
+# fit by tuning/scale_factor_calibration.py from (distance, duration, achieved time) samples,
+# initially np.polyfit([100, 250, 300, 500, 650], [.01555, .0072, .00615, .00415, .0035], 4)
+PID_SCALE_FACTOR_COEFFICIENTS = [4.61471861e-13, -8.54025974e-10, 5.93469697e-07, -1.91823377e-04, 2.96055195e-02]
+PID_SCALE_FACTOR_TABLE_SIZE = 1024      # distances (ticks) looked up instead of evaluated
+
 # PID_P_GAIN = 5200000
 # PID_I_GAIN = 0
 # PID_D_GAIN = 0 # 100000
+
+# encoder velocity estimation, used for the derivative term
+VELOCITY_WINDOW = 4             # counts spanned by the edge timing estimate
+VELOCITY_TRACKER_ALPHA = None   # alpha-beta tracker gains, None for the edge timing estimate only
+VELOCITY_TRACKER_BETA = None
+
+# tic usb i/o
+TIC_ASYNC_IO = True                 # send tic commands from a dedicated usb worker thread
+TIC_COMMAND_QUEUE_SIZE = 16
+TIC_VARIABLES_POLL_PERIOD = 0.01    # (s) period of the worker's variable reads
+TIC_POLLED_VARIABLES = ('current_position',)    # variables read by the worker, None for all
+
+# motion profiles, precomputed per breath and followed with feedback on the encoder
+MOTION_PROFILE = None               # "trapezoid", "s_curve", "decelerating", None for the pid scale factor moves (only tried on the sim)
+MOTION_PROFILE_RATE = 500           # (samples/s) of the precomputed profile
+MOTION_PROFILE_ACCEL_FRACTION = 0.25    # fraction of a trapezoid stroke spent accelerating and decelerating
+MOTION_PROFILE_FEEDBACK_GAIN = 25.0     # (1/s) velocity correction per count of tracking error
@@ -0,0 +1,39 @@
+#
+# sensor constants
+#
+
+# pressure sensor adc (ADS1115)
+PRESSURE_ADC_ADDRESS = 0x48
+PRESSURE_ADC_DIFFERENTIAL = 0       # channel 0 minus channel 1
+PRESSURE_ADC_GAIN = 1               # +/-4.096V
+PRESSURE_DATA_RATE = 860            # (samples/s)
+PRESSURE_STREAMING = True           # convert continuously and read from a background thread
+PRESSURE_HISTORY_SIZE = 4096        # samples kept by the stream, ~4.8 s at 860 samples/s
+PRESSURE_CONVERSION_READY = True    # take samples on the ALERT/RDY edge when a pigpio pi is given
+
+# pressure calibration, pressure (cmH2O) = (raw - offset) * gain
+# the default is the transfer function of raw2data: +/-1 psi over 1638 - 14745 counts
+PRESSURE_CALIBRATIONS = {
+    # sensor id: (offset (counts), gain (cmH2O/count))
+    "default": (8191.5, 2 / 13107 * 70.307),
+}
+PRESSURE_SENSOR_ID = "default"
+PRESSURE_AUTO_TARE = True           # zero the offset from the first samples at startup
+PRESSURE_TARE_SAMPLES = 256         # ~0.3 s at 860 samples/s
+
+# overpressure trip, ALERT/RDY either clocks the samples or is driven by the adc comparator:
+#   "ready"       samples are read on the conversion ready edge and each one is checked
+#                 against the thresholds (needs PRESSURE_CONVERSION_READY)
+#   "comparator"  the adc comparator trips on ALERT, the samples are polled from a thread
+OVERPRESSURE_TRIP_MODE = "ready"
+OVERPRESSURE_HYSTERESIS = 5.0       # (cmH2O) below MAX_PRESSURE before the trip clears
+
+# flow and volume waveforms, sampled from the encoder by the sensor service
+WAVEFORM_SAMPLE_RATE = 100          # (samples/s)
+WAVEFORM_HISTORY_SIZE = 2048        # samples kept, ~20 s at 100 samples/s
+
+# breath analysis, from the delivered volume and the pressure
+BREATH_START_VOLUME = 20.0          # (mL) rise above the minimum that starts a breath
+BREATH_END_VOLUME = 20.0            # (mL) fall below the peak that ends insp
+BREATH_STATS_WINDOW = 8             # breaths of the rolling mean and variance
+BREATH_PUBLISH_PERIOD = 1.0         # (s) shortest time between measured parameter updates
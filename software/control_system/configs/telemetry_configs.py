@@ -0,0 +1,9 @@
+#
+# telemetry constants
+#
+
+TELEMETRY_ENABLED = True            # record a binary trace of every control loop tick
+TELEMETRY_DIR = "logs"              # traces are written next to the logs, <log name>.trace
+TELEMETRY_BUFFER_RECORDS = 8192     # records kept in memory, ~16 s at 500 ticks/s
+TELEMETRY_FILE_RECORDS = 900000     # records kept in the file, 30 min at 500 ticks/s (~29 MB)
+TELEMETRY_FLUSH_PERIOD = 0.1        # (s) time between copies of the new records to the file
@@ -13,6 +13,10 @@ MIN_EXP_PAUSE = 0.025   # TODO
 INSP_HOLD_DUR = 0.025   # TODO
 MAX_EXP_DUR = 4     # TODO
 
+# control loop constants
+CONTROL_LOOP_PERIOD = 0.002     # (s) 500 Hz, set to 0 to free-run the control loop
+CONTROL_LOOP_MAX_CATCH_UP = 5   # late ticks run back to back up to this many periods, then skipped
+
 # safety constants
 MAX_PRESSURE = 40.0         # TODO
 MIN_PLATEAU_PRESSURE = 5.0  # TODO
@@ -0,0 +1,182 @@
+#
+# Plot buffer class for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import numpy as np
+
+
+class SweepBuffer:
+    """
+    Preallocated buffer for a sweep style waveform, like a patient
+    monitor: the trace is drawn left to right over sweep_time and
+    wraps, overwriting the previous sweep behind a short gap.
+
+    Samples are decimated into one (min, max) pair per column as
+    they arrive, so a column per pixel keeps every peak on screen
+    and the cost of drawing does not depend on the sample rate.
+    """
+
+    def __init__(self, columns, sweep_time, gap=0.02):
+        """
+        @param columns: the number of columns, the plot width in pixels
+        @param sweep_time: the time (s) across the plot
+        @param gap: the fraction of the plot blanked ahead of the trace
+        """
+        self.sweep_time = sweep_time
+        self.gap_fraction = gap
+        self.resize(columns)
+
+    def resize(self, columns):
+        """
+        change the number of columns, clears the buffer
+        @param columns: the number of columns, the plot width in pixels
+        """
+        self.columns = max(int(columns), 1)
+        self.column_time = self.sweep_time / self.columns
+        self.gap = min(max(int(round(self.columns * self.gap_fraction)), 1), self.columns - 1)
+
+        self.mins = np.full(self.columns, np.nan)
+        self.maxs = np.full(self.columns, np.nan)
+
+        # each column is drawn as a vertical line from its min to its max
+        self.x = np.repeat(np.arange(self.columns) * self.column_time, 2)
+        self.y = np.full(2 * self.columns, np.nan)
+        self._head = None       # absolute column number of the newest sample
+
+    def clear(self):
+        self.resize(self.columns)
+
+    def extend(self, times, values):
+        """
+        add a block of samples
+        @param times: ascending sample times (s), any monotonic timebase
+        @param values: the sample values
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if times.size == 0:
+            return
+        values = np.asarray(values, dtype=np.float64)
+        cols = (times // self.column_time).astype(np.int64)
+        last = int(cols[-1])
+
+        # blank the columns the trace moves into and the gap ahead of it
+        first_new = int(cols[0]) if self._head is None else self._head + 1
+        if last >= first_new:
+            new = min(last - first_new + 1, self.columns)
+            blank = np.arange(last - new + 1, last + 1 + self.gap) % self.columns
+            self.mins[blank] = np.nan
+            self.maxs[blank] = np.nan
+
+        # samples from before the head or more than a sweep old are not shown
+        oldest = last - self.columns + 1
+        if self._head is not None:
+            oldest = max(oldest, self._head)
+        keep = cols >= oldest
+        if not keep.all():
+            cols, values = cols[keep], values[keep]
+
+        # min and max of each column, the columns are sorted by time
+        starts = np.flatnonzero(np.concatenate(([True], cols[1:] != cols[:-1])))
+        idx = cols[starts] % self.columns
+        self.mins[idx] = np.fmin(self.mins[idx], np.minimum.reduceat(values, starts))
+        self.maxs[idx] = np.fmax(self.maxs[idx], np.maximum.reduceat(values, starts))
+
+        self._head = last if self._head is None else max(self._head, last)
+
+    def data(self):
+        """
+        @return: x (s) and y arrays for PlotDataItem.setData, with
+                 connect='finite' to break the line at the gap
+        """
+        self.y[0::2] = self.mins
+        self.y[1::2] = self.maxs
+        return self.x, self.y
+
+
+class ChunkedTrace:
+    """
+    Scrolling waveform drawn as a series of fixed size curves, the
+    chunked technique of update3 in gui/scroll_graph_example.py.
+    Only the newest chunk gets new data; full chunks are never
+    touched again and are dropped once they scroll out of the
+    window, so a redraw costs the same however long the trace has
+    been running.
+
+    x values are seconds from start_time; scroll() shifts every
+    chunk so the newest sample sits at x = 0. The chunk arrays are
+    preallocated and reused once their curve is dropped.
+    """
+
+    def __init__(self, plot, pen, chunk_size, max_chunks, start_time=0.0):
+        """
+        @param plot: the PlotWidget to draw on
+        @param pen: the pen of the trace
+        @param chunk_size: the number of samples in each curve
+        @param max_chunks: the number of curves kept
+        @param start_time: the time (s) of x = 0 in the curve data
+        """
+        self.plot = plot
+        self.pen = pen
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.start_time = start_time
+
+        self.curves = []
+        # one more array than curves, the new chunk's while the oldest is still shown
+        self._arrays = np.empty((max_chunks + 1, chunk_size + 1, 2))
+        self.data = self._arrays[0]
+        self.ptr = 0                    # samples added
+        self._first = 1                 # first row of data to draw, 0 once chunks join up
+        self._offset = 0.0              # x shift of the curves from the last scroll
+
+    def extend(self, times, values):
+        """
+        add a block of samples
+        @param times: ascending sample times (s)
+        @param values: the sample values
+        """
+        n = len(times)
+        k = 0
+        while k < n:
+            i = self.ptr % self.chunk_size
+            if i == 0:
+                # start a new chunk from the last point of the previous one
+                curve = self.plot.plot(pen=self.pen)
+                if self.curves:
+                    last = self.data[-1]
+                    self.data = self._arrays[(self.ptr // self.chunk_size) % len(self._arrays)]
+                    self.data[0] = last
+                    self._first = 0
+                curve.setPos(self._offset, 0)
+                self.curves.append(curve)
+                while len(self.curves) > self.max_chunks:
+                    self.plot.removeItem(self.curves.pop(0))
+            else:
+                curve = self.curves[-1]
+
+            m = min(self.chunk_size - i, n - k)
+            self.data[i + 1:i + 1 + m, 0] = times[k:k + m]
+            self.data[i + 1:i + 1 + m, 0] -= self.start_time
+            self.data[i + 1:i + 1 + m, 1] = values[k:k + m]
+            curve.setData(x=self.data[self._first:i + 1 + m, 0],
+                          y=self.data[self._first:i + 1 + m, 1])
+            self.ptr += m
+            k += m
+
+    def scroll(self, now):
+        """
+        @param now: the time (s) shown at the right edge, x = 0
+        """
+        self._offset = self.start_time - now
+        for curve in self.curves:
+            curve.setPos(self._offset, 0)
+
+    def clear(self):
+        for curve in self.curves:
+            self.plot.removeItem(curve)
+        self.curves = []
+        self.ptr = 0
+        self._first = 1
@@ -0,0 +1,163 @@
+#
+# SweepBuffer and ChunkedTrace tests and benchmarks, run without a display
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import timeit
+import numpy as np
+from gui.plot_buffer import SweepBuffer, ChunkedTrace
+
+RATE = 860      # (samples/s)
+
+
+class FakeCurve:
+
+    def __init__(self):
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.position = (0, 0)
+        self.set_count = 0
+
+    def setData(self, x, y):
+        self.x = np.array(x)
+        self.y = np.array(y)
+        self.set_count += 1
+
+    def setPos(self, x, y):
+        self.position = (x, y)
+
+    def pos(self):
+        return self.position
+
+
+class FakePlot:
+    """the PlotWidget calls ChunkedTrace makes"""
+
+    def __init__(self):
+        self.items = []
+
+    def plot(self, pen=None):
+        curve = FakeCurve()
+        self.items.append(curve)
+        return curve
+
+    def removeItem(self, curve):
+        self.items.remove(curve)
+
+
+def test_peaks_preserved():
+    sweep = SweepBuffer(100, sweep_time=1.0)
+    t = np.arange(RATE) / RATE
+    values = np.zeros(RATE)
+    values[431] = 50.0          # a single sample spike
+    sweep.extend(t[:500], values[:500])
+    sweep.extend(t[500:], values[500:])
+    x, y = sweep.data()
+    assert len(x) == len(y) == 200
+    assert np.nanmax(y) == 50.0
+    assert sweep.maxs[int(t[431] / 0.01)] == 50.0
+
+
+def test_sweep_wraps_with_gap():
+    sweep = SweepBuffer(100, sweep_time=1.0, gap=0.05)
+    t = np.arange(RATE) / RATE
+    sweep.extend(t, np.ones(RATE))
+    assert not np.isnan(sweep.mins).any()
+
+    # the second sweep overwrites the first and blanks ahead of itself
+    t2 = 1.0005 + t[:RATE // 2]
+    sweep.extend(t2, np.full(RATE // 2, 2.0))
+    head = int(t2[-1] // 0.01) - 100
+    assert (sweep.maxs[:head + 1] == 2.0).all()
+    assert np.isnan(sweep.maxs[head + 1:head + 6]).all()
+    assert (sweep.maxs[head + 6:] == 1.0).all()
+
+    # a long pause drops everything older than a sweep
+    sweep.extend([10.0], [3.0])
+    assert np.nansum(sweep.maxs) == 3.0
+
+
+def test_chunks():
+    plot = FakePlot()
+    trace = ChunkedTrace(plot, None, chunk_size=RATE, max_chunks=3, start_time=100.0)
+    t = 100.0 + np.arange(5 * RATE) / RATE
+    trace.extend(t[:1000], t[:1000] - 100.0)
+    assert len(trace.curves) == 2
+
+    # each chunk joins the last point of the one before
+    first, second = trace.curves
+    assert len(first.x) == RATE and len(second.x) == 1000 - RATE + 1
+    assert second.x[0] == first.x[-1]
+    assert np.array_equal(np.concatenate((first.y, second.y[1:])), t[:1000] - 100.0)
+
+    # old chunks are dropped, full chunks are not set again
+    sets = first.set_count
+    trace.extend(t[1000:], t[1000:] - 100.0)
+    assert len(trace.curves) == 3 and plot.items == trace.curves
+    assert first not in plot.items and first.set_count == sets
+
+    trace.scroll(t[-1])
+    assert all(c.pos() == (100.0 - t[-1], 0) for c in trace.curves)
+    assert trace.curves[-1].x[-1] + trace.curves[-1].pos()[0] == 0
+
+
+def test_chunk_arrays_reused():
+    plot = FakePlot()
+    trace = ChunkedTrace(plot, None, chunk_size=100, max_chunks=3)
+    arrays = trace._arrays
+    t = np.arange(2000) / 100
+    for k in range(0, 2000, 37):
+        trace.extend(t[k:k + 37], np.sin(t[k:k + 37]))
+        # the data of every curve shown is in the preallocated arrays
+        assert trace._arrays is arrays and np.shares_memory(trace.data, arrays)
+    assert len(trace.curves) == 3
+    for previous, curve in zip(trace.curves, trace.curves[1:]):
+        assert curve.x[0] == previous.x[-1]
+    assert np.array_equal(trace.curves[-1].y, np.sin(t[1899:]))
+
+
+if __name__ == "__main__":
+    test_peaks_preserved()
+    test_sweep_wraps_with_gap()
+    test_chunks()
+    test_chunk_arrays_reused()
+    print("plot buffer tests passed")
+
+    # one 50 ms frame of samples at a time, as MainWindow feeds the pressure sweep
+    sweep = SweepBuffer(800, sweep_time=10.0)
+    block = RATE // 20
+    t0 = [0.0]
+
+    def frame():
+        t = t0[0] + np.arange(block) / RATE
+        sweep.extend(t, np.sin(t))
+        sweep.data()
+        t0[0] += block / RATE
+
+    runs = 1000
+    t = min(timeit.repeat(frame, number=runs, repeat=5)) / runs
+    print("{} samples into 800 columns: {:.1f} us/frame".format(block, t * 1e6))
+
+    # one 50 ms frame of samples at a time, after an hour of history
+    plot = FakePlot()
+    trace = ChunkedTrace(plot, None, chunk_size=RATE, max_chunks=11)
+    block = RATE // 20
+    t0 = [0.0]
+
+    def frame():
+        t = t0[0] + np.arange(block) / RATE
+        trace.extend(t, np.sin(t))
+        trace.scroll(t[-1])
+        t0[0] += block / RATE
+
+    for hours in (0, 1):
+        for _ in range(int(hours * 3600 * 20)):
+            frame()
+        runs = 1000
+        t = min(timeit.repeat(frame, number=runs, repeat=3)) / runs
+        print("after {} h: {:.1f} us/frame, {} curves".format(hours, t * 1e6, len(trace.curves)))
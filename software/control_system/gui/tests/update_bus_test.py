@@ -0,0 +1,115 @@
+#
+# UpdateBus test, bursts of signals from other threads, runs without a display
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import threading
+from time import perf_counter
+from PyQt5 import QtCore, QtWidgets
+from gui.update_bus import UpdateBus
+
+
+# kept for the whole run, deleting it deletes the controller's class level senders
+app = None
+
+
+class Sender(QtCore.QObject):
+    value_signal = QtCore.pyqtSignal(int)
+    changed_signal = QtCore.pyqtSignal()
+
+
+class FakeLabel:
+
+    def __init__(self):
+        self.text = ""
+        self.set_count = 0
+
+    def setText(self, text):
+        self.text = text
+        self.set_count += 1
+
+
+def run_events(app, seconds):
+    end = perf_counter() + seconds
+    while perf_counter() < end:
+        app.processEvents(QtCore.QEventLoop.AllEvents, 10)
+
+
+def test_coalescing():
+    bus = UpdateBus(rate=0)
+    delivered = []
+    bus.subscribe('measured', delivered.append)
+    for i in range(1000):
+        bus.post('measured', i)
+    bus.post('other', 1)
+    bus.flush()
+    bus.flush()
+    assert delivered == [999], delivered
+    assert bus.post_count == 1001 and bus.delivery_count == 2
+
+
+def test_signal_burst(emits=20000, rate=20):
+    """
+    a thread emitting as fast as it can, the gui thread gets the
+    latest value at most rate times a second
+    """
+    global app
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    bus = UpdateBus(rate=rate)
+    sender = Sender()
+    sender.value_signal.connect(bus.poster('value'), QtCore.Qt.DirectConnection)
+    sender.changed_signal.connect(bus.poster('changed'), QtCore.Qt.DirectConnection)
+    values, changes = [], []
+    bus.subscribe('value', values.append)
+    bus.subscribe('changed', changes.append)
+    gui_thread = threading.get_ident()
+    threads = []
+    bus.subscribe('value', lambda value: threads.append(threading.get_ident()))
+
+    def burst():
+        for i in range(emits):
+            sender.value_signal.emit(i)
+            sender.changed_signal.emit()
+    worker = threading.Thread(target=burst)
+    t = perf_counter()
+    worker.start()
+    while worker.is_alive():
+        run_events(app, 0.01)
+    run_events(app, 2.5 / rate)
+    t = perf_counter() - t
+
+    print("{} emits of 2 signals in {:.2f} s, {} value and {} change deliveries".format(
+        emits, t, len(values), len(changes)))
+    assert values[-1] == emits - 1
+    assert changes and all(change is None for change in changes)
+    assert len(values) <= t * rate + 2, (len(values), t)
+    assert set(threads) == {gui_thread}
+    bus.timer.stop()
+
+
+def test_unchanged_labels():
+    from ui_controller_interface import UIControllerInterface
+
+    class Interface:
+        update_label = UIControllerInterface.update_label
+        _label_text = {}
+
+    interface = Interface()
+    label = FakeLabel()
+    for value in (20, 20, 20.0, 21, 21):
+        interface.update_label(label, value)
+    assert label.text == "21"
+    assert label.set_count == 3, label.set_count
+
+
+if __name__ == "__main__":
+    test_coalescing()
+    test_signal_burst()
+    test_unchanged_labels()
+    print("update bus tests passed")
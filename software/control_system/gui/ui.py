@@ -1,22 +1,27 @@
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtWidgets
 from pyqtgraph import PlotWidget
 import pyqtgraph as pg
 import sys
-from random import uniform
 import logging
 
 sys.path.append('/home/pi/Workspace/bbwtb/software/control_system/gui')
 from slider import DebbugingSlider
-
-sys.path.append('/home/pi/Workspace/bbwtb/software/control_system/sensors')
-from pressure_sensor import PressureSensor
+from plot_buffer import SweepBuffer, ChunkedTrace
+from ui_cache import load_ui
+from configs.sensor_configs import WAVEFORM_SAMPLE_RATE
+from hal.clock import SystemClock
 
 pyqt_logger = logging.getLogger('PyQt5')
 pyqt_logger.setLevel(logging.CRITICAL)
 
+PLOT_WINDOW = 10.0              # time (s) across the graphs
+PLOT_SWEEP_TIME = PLOT_WINDOW   # time (s) of a sweep of the pressure graph
+PLOT_CHUNK_TIME = 1.0           # time (s) of data in each curve of a trace
+PLOT_UPDATE_INTERVAL = 50       # time (ms) between graph redraws
+
 class WindowStack(QtWidgets.QMainWindow):
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, sensor_service=None, *args, **kwargs):
         super(WindowStack, self).__init__(*args, **kwargs)
 
         self.QtStack = QtWidgets.QStackedLayout()
@@ -24,22 +29,20 @@ class WindowStack(QtWidgets.QMainWindow):
         # Instantiate windows
         self.start = Start()
         self.start_homing = StartHoming()
-        self.homing = Homing()
-        self.confirm_homing = ConfirmHoming()
         self.edit_parameters = EditParameters()
         self.confirm_parameters = ConfirmParameters()
-        self.main_window = MainWindow()
-        self.alarm_condition = AlarmCondition()
+        self.main_window = MainWindow(sensor_service)
+
+        # rarely shown windows are built on first use, see lazy_window
+        self._lazy_windows = {}
+        self._build_hooks = {}
 
         # Add windows to stack
         self.QtStack.addWidget(self.start)
         self.QtStack.addWidget(self.start_homing)
-        self.QtStack.addWidget(self.homing)
-        self.QtStack.addWidget(self.confirm_homing)
         self.QtStack.addWidget(self.edit_parameters)
         self.QtStack.addWidget(self.confirm_parameters)
         self.QtStack.addWidget(self.main_window)
-        self.QtStack.addWidget(self.alarm_condition)
 
         self.setup_window_navigation()
 
@@ -54,6 +57,53 @@ class WindowStack(QtWidgets.QMainWindow):
         self.QtStack.currentWidget().showFullScreen()
 
 
+    LAZY_WINDOWS = {
+        'homing': lambda: Homing(),
+        'confirm_homing': lambda: ConfirmHoming(),
+        'alarm_condition': lambda: AlarmCondition(),
+    }
+
+    @property
+    def homing(self):
+        return self.lazy_window('homing')
+
+    @property
+    def confirm_homing(self):
+        return self.lazy_window('confirm_homing')
+
+    @property
+    def alarm_condition(self):
+        return self.lazy_window('alarm_condition')
+
+    def lazy_window(self, name):
+        """
+        build a window of LAZY_WINDOWS the first time it is used,
+        add it to the stack and run its build hooks
+        @param name: the window name
+        @return: the window
+        """
+        window = self._lazy_windows.get(name)
+        if window is None:
+            window = self.LAZY_WINDOWS[name]()
+            self._lazy_windows[name] = window
+            self.QtStack.addWidget(window)
+            for hook in self._build_hooks.pop(name, []):
+                hook(window)
+        return window
+
+    def on_build(self, name, hook):
+        """
+        call hook with the window once it is built, right away if it
+        already is. Connect signals of lazy windows through this so
+        connecting them does not build them.
+        @param name: the window name, a key of LAZY_WINDOWS
+        @param hook: function taking the window
+        """
+        if name in self._lazy_windows:
+            hook(self._lazy_windows[name])
+        else:
+            self._build_hooks.setdefault(name, []).append(hook)
+
     def setup_window_navigation(self):
 
         # start window buttons
@@ -70,12 +120,14 @@ class WindowStack(QtWidgets.QMainWindow):
         )
 
         # confirm_homing window buttons
-        self.confirm_homing.rehome_button.clicked.connect(
-            lambda: self.QtStack.setCurrentWidget(self.homing)
-        )
-        self.confirm_homing.confirm_button.clicked.connect(
-            lambda: self.QtStack.setCurrentWidget(self.edit_parameters)
-        )
+        def confirm_homing_navigation(confirm_homing):
+            confirm_homing.rehome_button.clicked.connect(
+                lambda: self.QtStack.setCurrentWidget(self.homing)
+            )
+            confirm_homing.confirm_button.clicked.connect(
+                lambda: self.QtStack.setCurrentWidget(self.edit_parameters)
+            )
+        self.on_build('confirm_homing', confirm_homing_navigation)
 
         # edit_parameters window buttons
         self.edit_parameters.back_button.clicked.connect(
@@ -103,101 +155,104 @@ class WindowStack(QtWidgets.QMainWindow):
 
 class MainWindow(QtWidgets.QMainWindow):
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, sensor_service=None, *args, **kwargs):
         super(MainWindow, self).__init__(*args, **kwargs)
 
+        # samples are read from the service, the GUI thread never does sensor I/O
+        self.sensor_service = sensor_service
+        # the plots follow the clock of the sample times
+        self.clock = sensor_service.clock if sensor_service is not None else SystemClock()
+
         # Set default plot colors
         pg.setConfigOption('background', 'w')
         pg.setConfigOption('foreground', 'k')
 
         # Load the UI Page
-        uic.loadUi('gui/main_window.ui', self)
+        load_ui('main_window', self)
 
         self.initialize_plots()
 
         self.timer = pg.QtCore.QTimer()
-        self.timer.setInterval(100)
+        self.timer.setInterval(PLOT_UPDATE_INTERVAL)
         self.timer.timeout.connect(self.update_plots)
         self.timer.start()
 
     def initialize_plots(self):
-        global chunk_size, x_axis, pressure_data, flow_data, volume_data, plot_ptr
 
-        chunk_size = 100
-
-        x_axis = []
-        plot_ptr = 0 # last updated x value
-
-        self.pressure_sensor = PressureSensor()
-
-        pressure_data = []
-        # flow_data = []
-        # volume_data = []
+        # x = 0 of the curve data, keeps the plotted values small
+        self._t_start = self.clock.monotonic_ns() / 1e9
 
         pen_red = pg.mkPen(color=(255, 0, 0), width=3)
-        # pen_blue = pg.mkPen(color=(0, 0, 255), width=3)
-        # pen_green = pg.mkPen(color=(100, 160, 100), width=3)
-        self.pressure_curve = self.pressure_graph.plot(x_axis, pressure_data, pen=pen_red)
-        # self.flow_curve = self.flow_graph.plot(x_axis, flow_data, pen=pen_blue)
-        # self.volume_curve = self.volume_graph.plot(x_axis, volume_data,pen=pen_green)
-
-        self.pressure_graph.setMouseEnabled(x=False, y=False)
-        # self.flow_graph.setMouseEnabled(x=False, y=False)
-        # self.volume_graph.setMouseEnabled(x=False, y=False)
-
-        self.pressure_graph.setMenuEnabled(False)
-        # self.flow_graph.setMenuEnabled(False)
-        # self.volume_graph.setMenuEnabled(False)
-
-        # Labeling the x-axis takes up too much space
-        # self.pressure_graph.setLabel('bottom', 'Time', 's')
-        # self.flow_graph.setLabel('bottom', 'Time', 's')
-        # self.volume_graph.setLabel('bottom', 'Time', 's')
+        pen_blue = pg.mkPen(color=(0, 0, 255), width=3)
+        pen_green = pg.mkPen(color=(100, 160, 100), width=3)
+
+        # pressure at the adc rate is swept, decimated to one column per pixel
+        self.pressure_sweep = SweepBuffer(self.pressure_graph.width(), PLOT_SWEEP_TIME)
+        self.pressure_curve = self.pressure_graph.plot(*self.pressure_sweep.data(),
+                                                       pen=pen_red, connect='finite')
+        self._cursors = {'pressure': 0}
+
+        # (waveform, graph, pen, sample rate (samples/s))
+        traces = [
+            ('flow', self.flow_graph, pen_blue, WAVEFORM_SAMPLE_RATE),
+            ('volume', self.volume_graph, pen_green, WAVEFORM_SAMPLE_RATE),
+        ]
+        self.traces = {}
+        for name, graph, pen, rate in traces:
+            chunk_size = int(rate * PLOT_CHUNK_TIME)
+            max_chunks = int(PLOT_WINDOW / PLOT_CHUNK_TIME) + 1
+            self.traces[name] = ChunkedTrace(graph, pen, chunk_size, max_chunks, self._t_start)
+            self._cursors[name] = 0     # samples already plotted
+
+            # only draw what is in view, decimated to the pixels keeping peaks
+            graph.setClipToView(True)
+            graph.setDownsampling(auto=True, mode='peak')
+            graph.setXRange(-PLOT_WINDOW, 0, padding=0)
+
+        for graph in (self.pressure_graph, self.flow_graph, self.volume_graph):
+            graph.setMouseEnabled(x=False, y=False)
+            graph.setMenuEnabled(False)
+
+            # Labeling the x-axis takes up too much space
+            # graph.setLabel('bottom', 'Time', 's')
+
+            # hide the little A buttons
+            graph.hideButtons()
+        self.pressure_graph.setXRange(0, PLOT_SWEEP_TIME, padding=0)
 
         # set graph labels
         self.pressure_graph.setLabel('left', 'Pressure', 'cmH2O')
-        # self.flow_graph.setLabel('left', 'Flow', 'L/m')
-        # self.volume_graph.setLabel('left', 'Volume', 'L')
+        self.flow_graph.setLabel('left', 'Flow', 'L/m')
+        self.volume_graph.setLabel('left', 'Volume', 'mL')
 
         # set the y axis range
         self.pressure_graph.setYRange(0, 100)
-        # self.flow_graph.setYRange(-60, 60)
-        # self.volume_graph.setYRange(0, 1)
-
-        self.pressure_graph.setXRange(0, chunk_size)
-        # self.flow_graph.setXRange(0, chunk_size)
-        # self.volume_graph.setXRange(0, chunk_size)
-
-        # hide the little A buttons
-        self.pressure_graph.hideButtons()
-        # self.flow_graph.hideButtons()
-        # self.volume_graph.hideButtons()
+        self.flow_graph.setYRange(-60, 60)
+        self.volume_graph.setYRange(0, 1000)
 
     def update_plots(self):
-        global chunk_size, x_axis, pressure_data, plot_ptr #, flow_data, volume_data
-
-        self.pressure_sensor.update_data()
-        # Clear plot if chunk size reached
-        if plot_ptr == chunk_size:
-            x_axis = []
-
-            pressure_data = []
-            # flow_data = []
-            # volume_data = []
 
-            plot_ptr = 0
+        if self.sensor_service is None:
+            return
 
-        x_axis.append(plot_ptr)
+        width = int(self.pressure_graph.getPlotItem().getViewBox().width())
+        if width > 0 and width != self.pressure_sweep.columns:
+            self.pressure_sweep.resize(width)
 
-        pressure_data.append(self.pressure_sensor.get_raw_pressure())
-        # flow_data.append( uniform(-60, 60) )
-        # volume_data.append( uniform(0, 1) )
+        # every sample recorded since the last redraw, on the shared monotonic timebase
+        times, pressures, self._cursors['pressure'] = \
+            self.sensor_service.waveform_since('pressure', self._cursors['pressure'])
+        self.pressure_sweep.extend(times / 1e9, pressures)
+        self.pressure_curve.setData(*self.pressure_sweep.data(), connect='finite')
 
-        self.pressure_curve.setData(x_axis, pressure_data)
-        # self.flow_curve.setData(x_axis, flow_data)
-        # self.volume_curve.setData(x_axis, volume_data)
+        for name, trace in self.traces.items():
+            times, values, self._cursors[name] = \
+                self.sensor_service.waveform_since(name, self._cursors[name])
+            trace.extend(times / 1e9, values)
 
-        plot_ptr += 1
+        now = self.clock.monotonic_ns() / 1e9
+        for trace in self.traces.values():
+            trace.scroll(now)
 
 
 
@@ -207,7 +262,7 @@ class EditParameters(QtWidgets.QMainWindow):
         super(EditParameters, self).__init__(*args, **kwargs)
 
         # Load the UI Page
-        uic.loadUi('gui/edit_parameters.ui', self)
+        load_ui('edit_parameters', self)
 
 class ConfirmParameters(QtWidgets.QMainWindow):
 
@@ -215,7 +270,7 @@ class ConfirmParameters(QtWidgets.QMainWindow):
         super(ConfirmParameters, self).__init__(*args, **kwargs)
 
         # Load the UI Page
-        uic.loadUi('gui/confirm_parameters.ui', self)
+        load_ui('confirm_parameters', self)
 
 
 class Start(QtWidgets.QMainWindow):
@@ -224,7 +279,7 @@ class Start(QtWidgets.QMainWindow):
         super(Start, self).__init__(*args, **kwargs)
 
         # Load the UI Page
-        uic.loadUi('gui/start.ui', self)
+        load_ui('start', self)
 
 
 class StartHoming(QtWidgets.QMainWindow):
@@ -233,7 +288,7 @@ class StartHoming(QtWidgets.QMainWindow):
         super(StartHoming, self).__init__(*args, **kwargs)
 
         # Load the UI Page
-        uic.loadUi('gui/start_homing.ui', self)
+        load_ui('start_homing', self)
 
 
 class Homing(QtWidgets.QMainWindow):
@@ -242,7 +297,7 @@ class Homing(QtWidgets.QMainWindow):
         super(Homing, self).__init__(*args, **kwargs)
 
         # Load the UI Page
-        uic.loadUi('gui/homing.ui', self)
+        load_ui('homing', self)
 
 
 class ConfirmHoming(QtWidgets.QMainWindow):
@@ -251,7 +306,7 @@ class ConfirmHoming(QtWidgets.QMainWindow):
         super(ConfirmHoming, self).__init__(*args, **kwargs)
 
         # Load the UI Page
-        uic.loadUi('gui/confirm_homing.ui', self)
+        load_ui('confirm_homing', self)
 
 
 class AlarmCondition(QtWidgets.QMainWindow):
@@ -260,14 +315,14 @@ class AlarmCondition(QtWidgets.QMainWindow):
         super(AlarmCondition, self).__init__(*args, **kwargs)
 
         # Load the UI Page
-        uic.loadUi('gui/alarm_condition.ui', self)
+        load_ui('alarm_condition', self)
 
 
 class UI():
 
-    def __init__(self):
+    def __init__(self, sensor_service=None):
         self.app = QtWidgets.QApplication(sys.argv)
-        self.stack = WindowStack()
+        self.stack = WindowStack(sensor_service)
         self.debug_slider = DebbugingSlider()
 
 
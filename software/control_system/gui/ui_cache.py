@@ -0,0 +1,104 @@
+#
+# Compiled .ui cache for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+# Qt Designer files are compiled to python modules once and the
+# modules imported after, instead of parsing the XML with
+# uic.loadUi every start. A module is compiled again when its
+# .ui file is newer. Run this file to compile every .ui up front.
+#
+
+import os
+import re
+import sys
+import importlib.util
+from io import StringIO
+from PyQt5 import uic
+
+UI_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(UI_DIR, 'compiled')
+
+# loadUi resolves images relative to the .ui file, compiled code to the cwd
+_PIXMAP = re.compile(r'QtGui\.QPixmap\("([^"]*)"\)')
+
+_modules = {}
+
+
+def ui_path(name):
+    return os.path.join(UI_DIR, name + '.ui')
+
+
+def compiled_path(name):
+    return os.path.join(CACHE_DIR, 'ui_' + name + '.py')
+
+
+def compile_ui(name, force=False):
+    """
+    compile gui/<name>.ui to gui/compiled/ui_<name>.py if it is
+    missing or older than the .ui file
+    @param name: the .ui file name, without extension
+    @param force: compile even if the module is up to date
+    @return: the path of the compiled module
+    """
+    source = ui_path(name)
+    target = compiled_path(name)
+    if not force and os.path.exists(target) and \
+            os.path.getmtime(target) >= os.path.getmtime(source):
+        return target
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(source) as ui_file:
+        code = StringIO()
+        uic.compileUi(ui_file, code)
+    code = _PIXMAP.sub(r'QtGui.QPixmap(os.path.join(UI_DIR, "\1"))', code.getvalue())
+    header = "import os\nUI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))\n"
+
+    # write then rename, a partly written module is never imported
+    tmp = target + '.tmp'
+    with open(tmp, 'w') as py_file:
+        py_file.write(header + code)
+    os.replace(tmp, target)
+    _modules.pop(name, None)
+    return target
+
+
+def compile_all(force=False):
+    """
+    compile every .ui file in gui/
+    @return: the names compiled
+    """
+    names = sorted(f[:-3] for f in os.listdir(UI_DIR) if f.endswith('.ui'))
+    for name in names:
+        compile_ui(name, force)
+    return names
+
+
+def load_ui(name, widget):
+    """
+    drop-in for uic.loadUi('gui/<name>.ui', widget): builds the
+    compiled form into the widget and sets every named child as
+    an attribute of it
+    @param name: the .ui file name, without extension
+    @param widget: the QWidget to build the form into
+    """
+    path = compile_ui(name)
+    module = _modules.get(name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location('gui.compiled.ui_' + name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[name] = module
+
+    form_class = next(getattr(module, attr) for attr in dir(module) if attr.startswith('Ui_'))
+    form = form_class()
+    form.setupUi(widget)
+    for attr, value in vars(form).items():
+        setattr(widget, attr, value)
+    return widget
+
+
+if __name__ == '__main__':
+    for name in compile_all(force='--force' in sys.argv):
+        print("compiled", os.path.relpath(compiled_path(name)))
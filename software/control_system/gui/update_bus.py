@@ -0,0 +1,75 @@
+#
+# UI update bus class for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import threading
+from PyQt5 import QtCore
+
+UI_UPDATE_RATE = 20             # (Hz) most deliveries per second of each key
+
+
+class UpdateBus(QtCore.QObject):
+    """
+    Coalesces updates posted from any thread and delivers them on
+    the GUI thread from a timer. Only the latest value of a key is
+    kept, so a burst of posts between two ticks is one delivery and
+    the Qt event queue never holds more than the timer's event.
+    Alarms and other updates that must each be delivered at once do
+    not go through the bus.
+    """
+
+    def __init__(self, rate=UI_UPDATE_RATE, parent=None):
+        """
+        @param rate: the deliveries per second (Hz), 0 to only deliver on flush
+        """
+        super(UpdateBus, self).__init__(parent)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._subscribers = {}
+        self.post_count = 0             # updates posted
+        self.delivery_count = 0         # updates delivered, at most one per key per tick
+
+        self.timer = QtCore.QTimer(self)
+        if rate > 0:
+            self.timer.setInterval(int(1000 / rate))
+            self.timer.timeout.connect(self.flush)
+            self.timer.start()
+
+    def subscribe(self, key, callback):
+        """
+        @param key: the update to deliver
+        @param callback: called on the GUI thread with the latest value of the key
+        """
+        self._subscribers.setdefault(key, []).append(callback)
+
+    def post(self, key, value=None):
+        """
+        store the latest value of a key, from any thread
+        """
+        with self._lock:
+            self._pending[key] = value
+            self.post_count += 1
+
+    def poster(self, key):
+        """
+        @return: a slot posting its argument, if any, to the key. Connect
+                 it with QtCore.Qt.DirectConnection so that it runs on the
+                 emitting thread instead of queueing an event per emit.
+        """
+        return lambda value=None: self.post(key, value)
+
+    def flush(self):
+        """
+        deliver the latest value of each key posted since the last flush
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+        for key, value in pending.items():
+            for callback in self._subscribers.get(key, ()):
+                callback(value)
+            self.delivery_count += 1
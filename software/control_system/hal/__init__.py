@@ -0,0 +1,33 @@
+#
+# hardware abstraction layer for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+# A backend provides what the device classes are built on:
+#   clock           monotonic_ns, monotonic, time_ns, time and sleep; a simulated
+#                   one also has add_listener and remove_listener, the sampling
+#                   services then run from a listener instead of their own thread
+#   pi              a pigpio.pi (encoder, adc ALERT/RDY)
+#   gpio            the RPi.GPIO module (switches, buzzers)
+#   i2c             the I2C bus of the adc, None for the default
+#   tic_device()    an open TicDevice
+#   tic_async_io    whether the motor may use the usb worker thread
+#
+
+from configs.hal_configs import HAL_BACKEND
+
+
+def get_backend(name=HAL_BACKEND, **kwargs):
+    """
+    @param name: "real" or "sim"
+    @param kwargs: passed to the backend
+    @return: the backend, its hardware modules are only imported here
+    """
+    if name == "real":
+        from hal.real import RealBackend
+        return RealBackend(**kwargs)
+    if name == "sim":
+        from hal.sim import SimBackend
+        return SimBackend(**kwargs)
+    raise ValueError("Unknown hal backend: " + str(name))
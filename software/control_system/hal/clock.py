@@ -0,0 +1,110 @@
+#
+# clock classes for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import time
+from threading import RLock
+
+NS_PER_SEC = 1000000000
+
+
+class SystemClock:
+    """
+    The clock of the machine, what the controller and motor use
+    unless they are handed a simulated one.
+    """
+
+    def monotonic_ns(self):
+        return time.monotonic_ns()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def time_ns(self):
+        return time.time_ns()
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class SimClock:
+    """
+    Virtual clock of a simulation. Time only moves when somebody
+    sleeps on it: the sleep steps every listener (the plant and the
+    simulated devices) through the slept time in increments of at
+    most `step` seconds, and returns as soon as that is done. Code
+    that does not sleep takes no simulated time, so the controller
+    runs as fast as the machine allows unless `realtime` is set.
+    """
+
+    def __init__(self, step=0.00025, realtime=False):
+        """
+        @param step: the longest increment the listeners are stepped by (in seconds)
+        @param realtime: also sleep on the system clock, to pace the simulation
+        """
+        self.step_ns = max(int(step * NS_PER_SEC), 1)
+        self.realtime = realtime
+        self._ns = 0
+        self._wall_ref_ns = time.time_ns()
+        self._listeners = []
+        self._lock = RLock()
+        self._advancing = False
+
+    def add_listener(self, func):
+        """
+        @param func: called with the increment (in seconds) every time
+                     the clock moves, after the clock has moved
+        """
+        with self._lock:
+            self._listeners.append(func)
+
+    def remove_listener(self, func):
+        """
+        @param func: a function given to add_listener
+        """
+        with self._lock:
+            self._listeners.remove(func)
+
+    def monotonic_ns(self):
+        return self._ns
+
+    def monotonic(self):
+        return self._ns / NS_PER_SEC
+
+    def time_ns(self):
+        return self._wall_ref_ns + self._ns
+
+    def time(self):
+        return self.time_ns() / NS_PER_SEC
+
+    def sleep(self, seconds):
+        if self.realtime:
+            time.sleep(seconds)
+        self.advance_ns(int(seconds * NS_PER_SEC))
+
+    def advance_ns(self, ns):
+        """
+        move the clock forward, stepping the listeners.
+        @param ns: the time to move by (in nanoseconds)
+        """
+        with self._lock:
+            # a listener sleeping from inside a step (a device callback)
+            # would step the listeners from the middle of their own step
+            if self._advancing:
+                return
+            self._advancing = True
+            try:
+                target = self._ns + ns
+                while self._ns < target:
+                    step = min(self.step_ns, target - self._ns)
+                    self._ns += step
+                    for func in self._listeners:
+                        func(step / NS_PER_SEC)
+            finally:
+                self._advancing = False
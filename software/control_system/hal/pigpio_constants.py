@@ -0,0 +1,15 @@
+#
+# pigpio constants, so the sensor classes can be driven by a
+# simulated pi without the pigpio module installed
+#
+
+INPUT = 0
+OUTPUT = 1
+
+PUD_OFF = 0
+PUD_DOWN = 1
+PUD_UP = 2
+
+RISING_EDGE = 0
+FALLING_EDGE = 1
+EITHER_EDGE = 2
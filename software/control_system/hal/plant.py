@@ -0,0 +1,233 @@
+#
+# simulated ventilator mechanics for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import math
+from configs.ventilation_configs import ENCODER_ONE_ROTATION, TIC_ONE_ROTATION, TV_PULLEY_CONVERT_FACTOR
+from configs.hal_configs import *
+
+# tic units
+TIC_SPEED_UNITS_PER_HZ = 10000      # speeds are in microsteps per 10000 s
+TIC_ACCEL_UNITS_PER_HZ_S = 100      # accelerations are in microsteps per 100 s^2
+
+COUNTS_PER_STEP = ENCODER_ONE_ROTATION / TIC_ONE_ROTATION
+COUNTS_PER_ML = ENCODER_ONE_ROTATION * TV_PULLEY_CONVERT_FACTOR
+
+
+class TicStepGenerator:
+    """
+    Step generation of the Tic: the step rate ramps towards the
+    target velocity, or towards the target position decelerating
+    to stop on it, limited by the max speed and acceleration.
+
+    `position` is what the Tic reports and can be redefined by
+    halt_and_set_position; `shaft` is where the motor physically is.
+    """
+
+    HALT = 0
+    VELOCITY = 1
+    POSITION = 2
+
+    def __init__(self, max_speed=SIM_TIC_MAX_SPEED, max_accel=SIM_TIC_MAX_ACCEL):
+        """
+        @param max_speed: the max speed (in microsteps/10000s)
+        @param max_accel: the max acceleration and deceleration (in microsteps/100s^2)
+        """
+        self.max_speed = max_speed / TIC_SPEED_UNITS_PER_HZ     # (steps/s)
+        self.max_accel = max_accel / TIC_ACCEL_UNITS_PER_HZ_S   # (steps/s^2)
+        self.mode = self.HALT
+        self.target = 0.0
+        self.velocity = 0.0     # (steps/s)
+        self.position = 0.0     # (steps)
+        self.shaft = 0.0        # (steps)
+        self.energized = True
+
+    def set_target_velocity(self, velocity):
+        """
+        @param velocity: the target velocity (in microsteps/10000s)
+        """
+        velocity = velocity / TIC_SPEED_UNITS_PER_HZ
+        self.target = max(-self.max_speed, min(self.max_speed, velocity))
+        self.mode = self.VELOCITY
+
+    def set_target_position(self, position):
+        self.target = position
+        self.mode = self.POSITION
+
+    def halt_and_hold(self):
+        self.velocity = 0.0
+        self.mode = self.HALT
+
+    def halt_and_set_position(self, position):
+        self.halt_and_hold()
+        self.position = float(position)
+
+    def step(self, dt):
+        """
+        @param dt: the time step (in seconds)
+        """
+        if not self.energized or self.mode == self.HALT:
+            self.velocity = 0.0
+            return
+
+        if self.mode == self.VELOCITY:
+            goal = self.target
+        else:
+            error = self.target - self.position
+            goal = math.copysign(min(self.max_speed, math.sqrt(2 * self.max_accel * abs(error))), error)
+
+        dv = self.max_accel * dt
+        velocity = max(self.velocity - dv, min(self.velocity + dv, goal))
+        move = 0.5 * (self.velocity + velocity) * dt
+        self.velocity = velocity
+
+        # stop on the target instead of oscillating around it
+        if self.mode == self.POSITION and abs(self.target - self.position) <= abs(move):
+            move = self.target - self.position
+            self.velocity = 0.0
+
+        self.position += move
+        self.shaft += move
+
+
+class ArmModel:
+    """
+    The arm as a mass driven by the motor through a belt modeled
+    as a spring-damper, pushed back by the bag once it is on it.
+    Positions are in encoder counts, decreasing into the bag.
+    """
+
+    def __init__(self, position=SIM_ARM_START_POSITION,
+                 stiffness=SIM_ARM_STIFFNESS, damping=SIM_ARM_DAMPING):
+        """
+        @param position: the starting position (in counts)
+        @param stiffness: the belt stiffness (in 1/s^2)
+        @param damping: the belt damping (in 1/s)
+        """
+        self.position = float(position)
+        self.velocity = 0.0         # (counts/s)
+        self.stiffness = stiffness
+        self.damping = damping
+        self._offset = float(position)
+
+    def step(self, dt, motor_shaft, load, driven=True):
+        """
+        semi-implicit euler step
+        @param motor_shaft: the motor shaft position (in steps)
+        @param load: the acceleration the bag pushes back with (in counts/s^2)
+        @param driven: False when the motor is deenergized and turns freely
+        """
+        if driven:
+            drive = self.stiffness * (self._offset + motor_shaft * COUNTS_PER_STEP - self.position)
+        else:
+            drive = 0.0
+            self._offset = self.position - motor_shaft * COUNTS_PER_STEP
+        self.velocity += (drive - self.damping * self.velocity + load) * dt
+        self.position += self.velocity * dt
+
+
+class LungModel:
+    """
+    Single compartment patient lung behind the bag. Compressing
+    the bag pushes its displaced volume into the lung through the
+    airway resistance; when the bag is released it refills from
+    ambient through its intake valve and the lung exhales passively
+    to the PEEP.
+    """
+
+    def __init__(self, compliance=SIM_LUNG_COMPLIANCE, resistance=SIM_AIRWAY_RESISTANCE, peep=SIM_PEEP):
+        """
+        @param compliance: the lung compliance (in ml/cmH2O)
+        @param resistance: the airway resistance (in cmH2O/(L/s))
+        @param peep: the end expiratory pressure (in cmH2O)
+        """
+        self.compliance = compliance
+        self.resistance = resistance
+        self.peep = peep
+        self.volume = 0.0       # volume above the PEEP volume (ml)
+        self.flow = 0.0         # flow into the lung (L/s)
+        self.pressure = peep    # airway pressure (cmH2O)
+        self._bag_volume = 0.0
+
+    def step(self, dt, bag_volume):
+        """
+        @param bag_volume: the volume displaced from the bag (in ml)
+        """
+        pushed = bag_volume - self._bag_volume
+        self._bag_volume = bag_volume
+
+        if pushed > 0:
+            self.volume += pushed
+            self.flow = pushed / dt / 1000
+            self.pressure = self.peep + self.volume / self.compliance + self.resistance * self.flow
+        else:
+            # exact decay of the exhalation, time constant R*C
+            exhaled = self.volume * (1 - math.exp(-dt * 1000 / (self.resistance * self.compliance)))
+            self.volume -= exhaled
+            self.flow = -exhaled / dt / 1000
+            self.pressure = self.peep
+
+
+class VentilatorPlant:
+    """
+    The mechanics the controller closes its loops around: the Tic
+    step generator turning the motor, the arm on its belt, the bag
+    under the arm and the lung the bag inflates. Sensor values are
+    read from here by the simulated devices.
+    """
+
+    def __init__(self, tic=None, arm=None, lung=None,
+                 upper_switch_position=SIM_UPPER_SWITCH_POSITION,
+                 contact_position=SIM_CONTACT_POSITION,
+                 bag_stiffness=SIM_BAG_STIFFNESS, pressure_load=SIM_PRESSURE_LOAD):
+        """
+        @param upper_switch_position: the arm position closing the absolute switch (in counts)
+        @param contact_position: the arm position where it touches the bag (in counts)
+        @param bag_stiffness: the bag push back per count of compression (in 1/s^2)
+        @param pressure_load: the push back per cmH2O of airway pressure (in counts/s^2)
+        """
+        self.tic = tic if tic is not None else TicStepGenerator()
+        self.arm = arm if arm is not None else ArmModel()
+        self.lung = lung if lung is not None else LungModel()
+        self.upper_switch_position = upper_switch_position
+        self.contact_position = contact_position
+        self.bag_stiffness = bag_stiffness
+        self.pressure_load = pressure_load
+        self.time = 0.0
+
+    def step(self, dt):
+        """
+        @param dt: the time step (in seconds)
+        """
+        self.tic.step(dt)
+        compression = self.compression()
+        load = 0.0
+        if compression > 0:
+            load = self.bag_stiffness * compression + self.pressure_load * self.lung.pressure
+        self.arm.step(dt, self.tic.shaft, load, driven=self.tic.energized)
+        self.lung.step(dt, self.compression() / COUNTS_PER_ML)
+        self.time += dt
+
+    def compression(self):
+        """
+        @return: how far the arm is into the bag (in counts)
+        """
+        return max(self.contact_position - self.arm.position, 0.0)
+
+    def encoder_count(self):
+        return math.floor(self.arm.position)
+
+    def upper_switch(self):
+        return 1 if self.arm.position >= self.upper_switch_position else 0
+
+    def contact_switch(self):
+        return 1 if self.arm.position <= self.contact_position else 0
+
+    def pressure(self):
+        """
+        @return: the airway pressure (in cmH2O)
+        """
+        return self.lung.pressure
@@ -0,0 +1,40 @@
+#
+# Raspberry Pi hardware backend for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+from hal.clock import SystemClock
+from configs.motor_configs import TIC_ASYNC_IO
+
+
+class RealBackend:
+    """
+    The ventilator's hardware: pigpio for the encoder and the adc
+    ALERT/RDY pin, RPi.GPIO for the switches and buzzers, the I2C
+    bus of the Pi for the adc and the Tic over USB. The hardware
+    libraries are imported here so that nothing else needs them.
+    """
+
+    name = "real"
+    tic_async_io = TIC_ASYNC_IO
+
+    def __init__(self):
+        import pigpio
+        import RPi.GPIO
+
+        self.clock = SystemClock()
+        self.pi = pigpio.pi()
+        self.gpio = RPi.GPIO
+        self.i2c = None         # ADS1115 default, Adafruit_GPIO.I2C
+
+    def tic_device(self):
+        from actuators.tic_usb import TicDevice
+
+        tic_device = TicDevice()
+        tic_device.open(vendor=0x1ffb, product_id=0x00CB)
+        return tic_device
+
+    def close(self):
+        self.pi.stop()
@@ -0,0 +1,412 @@
+#
+# simulated hardware backend for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import random
+from hal import pigpio_constants as pigpio
+from hal.clock import SimClock
+from hal.plant import VentilatorPlant
+from sensors.ads_1x15 import ADS1x15_POINTER_CONVERSION, ADS1x15_POINTER_CONFIG, \
+    ADS1x15_POINTER_LOW_THRESHOLD, ADS1x15_POINTER_HIGH_THRESHOLD, ADS1x15_CONFIG_OS_SINGLE, \
+    ADS1x15_CONFIG_MODE_SINGLE, ADS1x15_CONFIG_COMP_QUE_DISABLE, ADS1115_CONFIG_DR
+from sensors.pressure_calibration import load_calibration
+from sensors.rotary_encoder import TICK_WRAP
+from configs.gpio_map import *
+from configs.hal_configs import *
+
+
+class SimCallback:
+
+    def __init__(self, pi, gpio, edge, func):
+        self.pi = pi
+        self.gpio = gpio
+        self.edge = edge
+        self.func = func
+
+    def cancel(self):
+        if self in self.pi.callbacks:
+            self.pi.callbacks.remove(self)
+
+
+class SimPi:
+    """
+    pigpio.pi stand-in. Levels are set by the simulated devices,
+    which runs the registered callbacks on the simulation thread
+    with ticks of the simulated clock.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.connected = True
+        self.callbacks = []
+        self.levels = {}
+        self.modes = {}
+
+    def set_mode(self, gpio, mode):
+        self.modes[gpio] = mode
+
+    def set_pull_up_down(self, gpio, pud):
+        if gpio not in self.levels:
+            self.levels[gpio] = 1 if pud == pigpio.PUD_UP else 0
+
+    def read(self, gpio):
+        return self.levels.get(gpio, 0)
+
+    def write(self, gpio, level):
+        self.set_level(gpio, level)
+
+    def get_current_tick(self):
+        return (self.clock.monotonic_ns() // 1000) % TICK_WRAP
+
+    def callback(self, gpio, edge=pigpio.RISING_EDGE, func=None):
+        cb = SimCallback(self, gpio, edge, func)
+        self.callbacks.append(cb)
+        return cb
+
+    def set_level(self, gpio, level, tick=None):
+        """
+        drive a gpio, running the callbacks if the level changed
+        @param tick: the tick of the edge, defaults to now
+        """
+        if self.levels.get(gpio) == level:
+            return
+        self.levels[gpio] = level
+        if tick is None:
+            tick = self.get_current_tick()
+        for cb in list(self.callbacks):
+            if cb.gpio != gpio:
+                continue
+            if cb.edge == pigpio.EITHER_EDGE or \
+                    (cb.edge == pigpio.RISING_EDGE and level == 1) or \
+                    (cb.edge == pigpio.FALLING_EDGE and level == 0):
+                cb.func(gpio, level, tick)
+
+    def quadrature(self, gpioA, gpioB, counts, start_tick, end_tick):
+        """
+        drive a quadrature encoder through a number of counts, spread
+        evenly over the ticks, in the order RotaryEncoder decodes them.
+        @param counts: the counts to move, negative to move backwards
+        """
+        first, second = (gpioB, gpioA) if counts >= 0 else (gpioA, gpioB)
+        edges = 4 * abs(counts)
+        span = (end_tick - start_tick) % TICK_WRAP
+        i = 0
+        for _ in range(abs(counts)):
+            for gpio, level in ((first, 1), (second, 1), (first, 0), (second, 0)):
+                i += 1
+                self.set_level(gpio, level, (start_tick + span * i // edges) % TICK_WRAP)
+
+    def stop(self):
+        self.callbacks = []
+
+
+class SimGPIO:
+    """
+    RPi.GPIO module stand-in, for the switches and buzzers.
+    """
+
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.mode = None
+        self.levels = {}
+        self.directions = {}
+        self._events = {}       # pin: (edge, callback, bouncetime (ns), last event (ns))
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None, initial=None):
+        self.directions[pin] = direction
+        if initial is not None:
+            self.levels[pin] = initial
+        elif pin not in self.levels:
+            self.levels[pin] = 1 if pull_up_down == self.PUD_UP else 0
+
+    def input(self, pin):
+        return self.levels.get(pin, 0)
+
+    def output(self, pin, level):
+        self.levels[pin] = 1 if level else 0
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        bounce = (bouncetime or 0) * 1000000
+        self._events[pin] = [edge, callback, bounce, None]
+
+    def remove_event_detect(self, pin):
+        self._events.pop(pin, None)
+
+    def cleanup(self):
+        self._events = {}
+
+    def set_input(self, pin, level):
+        """
+        drive an input pin, running its event callback on a
+        detected edge outside the bounce time
+        """
+        if self.levels.get(pin) == level:
+            return
+        self.levels[pin] = level
+        event = self._events.get(pin)
+        if event is None:
+            return
+        edge, callback, bounce, last = event
+        if edge == self.RISING and level != 1 or edge == self.FALLING and level != 0:
+            return
+        now = self.clock.monotonic_ns()
+        if last is not None and now - last < bounce:
+            return
+        event[3] = now
+        if callback is not None:
+            callback(pin)
+
+
+class SimADS1115:
+    """
+    Register level ADS1115 on a simulated I2C bus, converting the
+    plant's airway pressure at the data rate set in its config. With
+    the comparator set up for conversion ready each conversion pulses
+    ALERT/RDY low, otherwise an enabled comparator drives the pin as
+    a traditional, active low, non-latching comparator.
+    """
+
+    def __init__(self, pressure, pi=None, alert_pin=None, calibration=None, noise=SIM_PRESSURE_NOISE):
+        """
+        @param pressure: callable returning the pressure (in cmH2O)
+        @param pi: the SimPi the ALERT/RDY pin is on
+        @param noise: standard deviation of the conversions (in counts)
+        """
+        self.pressure = pressure
+        self.pi = pi
+        self.alert_pin = alert_pin
+        self.calibration = calibration if calibration is not None else load_calibration()
+        self.noise = noise
+        self.registers = {
+            ADS1x15_POINTER_CONVERSION: 0x0000,
+            ADS1x15_POINTER_CONFIG: 0x8583,
+            ADS1x15_POINTER_LOW_THRESHOLD: 0x8000,
+            ADS1x15_POINTER_HIGH_THRESHOLD: 0x7FFF
+        }
+        self.alert = False
+        self._rates = {bits: rate for rate, bits in ADS1115_CONFIG_DR.items()}
+        self._elapsed = 0.0
+
+    def get_i2c_device(self, address, **kwargs):
+        return self
+
+    def writeList(self, register, data):
+        value = (data[0] << 8) | data[1]
+        self.registers[register] = value
+        # a single shot conversion is done by the time it is read
+        if register == ADS1x15_POINTER_CONFIG and value & ADS1x15_CONFIG_MODE_SINGLE \
+                and value & ADS1x15_CONFIG_OS_SINGLE:
+            self.convert()
+
+    def readList(self, register, length):
+        value = self.registers[register]
+        return bytearray([(value >> 8) & 0xFF, value & 0xFF])
+
+    @property
+    def continuous(self):
+        return not self.registers[ADS1x15_POINTER_CONFIG] & ADS1x15_CONFIG_MODE_SINGLE
+
+    @property
+    def data_rate(self):
+        return self._rates[self.registers[ADS1x15_POINTER_CONFIG] & 0x00E0]
+
+    @property
+    def comparator_enabled(self):
+        return (self.registers[ADS1x15_POINTER_CONFIG] & 0x0003) != ADS1x15_CONFIG_COMP_QUE_DISABLE
+
+    @property
+    def conversion_ready(self):
+        return self.comparator_enabled and \
+            self.registers[ADS1x15_POINTER_HIGH_THRESHOLD] & 0x8000 and \
+            not self.registers[ADS1x15_POINTER_LOW_THRESHOLD] & 0x8000
+
+    def _threshold(self, register):
+        value = self.registers[register]
+        return value - (1 << 16) if value & 0x8000 else value
+
+    def step(self, dt):
+        """
+        run the continuous conversions due in dt
+        @param dt: the time step (in seconds)
+        """
+        if not self.continuous:
+            self._elapsed = 0.0
+            return
+        self._elapsed += dt
+        period = 1.0 / self.data_rate
+        while self._elapsed >= period:
+            self._elapsed -= period
+            self.convert()
+
+    def convert(self):
+        raw = self.calibration.to_raw(self.pressure())
+        if self.noise:
+            raw += random.gauss(0.0, self.noise)
+        value = max(-0x8000, min(0x7FFF, int(round(raw))))
+        self.registers[ADS1x15_POINTER_CONVERSION] = value & 0xFFFF
+
+        if self.pi is None or not self.comparator_enabled:
+            return
+        if self.conversion_ready:
+            self.pi.set_level(self.alert_pin, 0)
+            self.pi.set_level(self.alert_pin, 1)
+            return
+        alert = self.alert
+        if value > self._threshold(ADS1x15_POINTER_HIGH_THRESHOLD):
+            alert = True
+        elif value < self._threshold(ADS1x15_POINTER_LOW_THRESHOLD):
+            alert = False
+        if alert != self.alert:
+            self.alert = alert
+            self.pi.set_level(self.alert_pin, 0 if alert else 1)
+
+
+class SimTicDevice:
+    """
+    TicDevice stand-in commanding the plant's step generator. Every
+    command takes `latency` of simulated time, like a usb transfer,
+    so polling loops on the controller move the simulation along.
+    """
+
+    def __init__(self, step_generator, clock, latency=SIM_TIC_COMMAND_LATENCY):
+        self.tic = step_generator
+        self.clock = clock
+        self.latency = latency
+
+    def _command(self):
+        if self.latency > 0:
+            self.clock.sleep(self.latency)
+
+    def open(self, product_id=None, serial=None, vendor=0xffb):
+        pass
+
+    def close(self):
+        pass
+
+    def energize(self):
+        self.tic.energized = True
+        self._command()
+
+    def deenergize(self):
+        self.tic.energized = False
+        self._command()
+
+    def exit_safe_start(self):
+        self._command()
+
+    def reset_command_timeout(self):
+        self._command()
+
+    def halt_and_hold(self):
+        self.tic.halt_and_hold()
+        self._command()
+
+    def set_target_velocity(self, velocity):
+        self.tic.set_target_velocity(velocity)
+        self._command()
+
+    def set_target_position(self, position):
+        self.tic.set_target_position(position)
+        self._command()
+
+    def halt_and_set_position(self, position):
+        self.tic.halt_and_set_position(position)
+        self._command()
+
+    def get_current_position(self):
+        self._command()
+        return int(self.tic.position)
+
+    def get_variables(self, clear_errors=False, variables=None, fields=None):
+        self._command()
+        return {
+            'current_position': int(self.tic.position),
+            'current_velocity': int(self.tic.velocity * 10000),
+            'target_position': int(self.tic.target) if self.tic.mode == self.tic.POSITION else 0,
+            'target_velocity': int(self.tic.target * 10000) if self.tic.mode == self.tic.VELOCITY else 0,
+            'energized': self.tic.energized,
+        }
+
+
+class SimBackend:
+    """
+    The ventilator's hardware simulated around a VentilatorPlant,
+    wired to the pins of gpio_map like the real machine. The devices
+    are stepped by the clock: anything sleeping on it, the control
+    loop or a tic command, runs the plant forward.
+    """
+
+    name = "sim"
+    tic_async_io = False    # the usb worker thread would run on the system clock
+
+    def __init__(self, plant=None, clock=None, realtime=SIM_REALTIME):
+        self.clock = clock if clock is not None else SimClock(step=SIM_PLANT_DT, realtime=realtime)
+        self.plant = plant if plant is not None else VentilatorPlant()
+        self.pi = SimPi(self.clock)
+        self.gpio = SimGPIO(self.clock)
+        self.i2c = SimADS1115(self.plant.pressure, self.pi, PRESSURE_ALERT_PIN)
+        self.tic = SimTicDevice(self.plant.tic, self.clock)
+
+        # encoder wired as in ventilator.py: counts up when the arm goes up
+        self.encoder_pins = (ENCODER_B_PLUS_PIN, ENCODER_A_PLUS_PIN)
+        self._count = self.plant.encoder_count()
+        self._tick = self.pi.get_current_tick()
+
+        self.gpio.levels[POWER_SWITCH_PIN] = 1
+        self.gpio.levels[ABSOLUTE_SWITCH_PIN] = self.plant.upper_switch()
+        self.gpio.levels[CONTACT_SWITCH_PIN] = self.plant.contact_switch()
+
+        self.clock.add_listener(self.step)
+
+    def tic_device(self):
+        return self.tic
+
+    def step(self, dt):
+        """
+        step the plant and update the devices from it
+        @param dt: the time step (in seconds)
+        """
+        self.plant.step(dt)
+
+        tick = self.pi.get_current_tick()
+        count = self.plant.encoder_count()
+        if count != self._count:
+            self.pi.quadrature(self.encoder_pins[0], self.encoder_pins[1],
+                               count - self._count, self._tick, tick)
+            self._count = count
+        self._tick = tick
+
+        self.gpio.set_input(ABSOLUTE_SWITCH_PIN, self.plant.upper_switch())
+        self.gpio.set_input(CONTACT_SWITCH_PIN, self.plant.contact_switch())
+        self.i2c.step(dt)
+
+    def set_power(self, on):
+        """
+        flip the simulated power switch
+        """
+        self.gpio.set_input(POWER_SWITCH_PIN, 1 if on else 0)
+
+    def close(self):
+        self.pi.stop()
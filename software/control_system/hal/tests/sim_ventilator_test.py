@@ -0,0 +1,233 @@
+#
+# Simulated ventilator test, homes and ventilates the full controller
+# FSM on the sim backend faster than real time
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import argparse
+import tempfile
+from time import perf_counter
+from hal.sim import SimBackend
+from actuators.motor import Motor
+from actuators.buzzer import Buzzer
+from sensors.rotary_encoder import RotaryEncoder
+from sensors.limit_switch import LimitSwitch
+from sensors.power_switch import PowerSwitch
+from sensors.pressure_sensor import PressureSensor
+from sensors.overpressure_trip import OverpressureTrip
+from sensors.sensor_service import SensorService
+from configs.gpio_map import *
+from configs.hal_configs import SIM_CONTACT_POSITION, SIM_ARM_START_POSITION
+from configs.ventilation_configs import CONTROL_LOOP_PERIOD
+from ventilator_controller import VentilatorController
+from telemetry import TelemetryRecorder, read_telemetry
+
+
+def build(hal, telemetry=None):
+    """
+    @param telemetry: TelemetryRecorder of the controller, or None
+    @return: the controller on the devices of the backend, wired as in ventilator.py
+    """
+    encoder = RotaryEncoder(hal.pi, ENCODER_B_PLUS_PIN, ENCODER_A_PLUS_PIN)
+    contact_switch = LimitSwitch(CONTACT_SWITCH_PIN, gpio=hal.gpio)
+    absolute_switch = LimitSwitch(ABSOLUTE_SWITCH_PIN, gpio=hal.gpio)
+    power_switch = PowerSwitch(POWER_SWITCH_PIN, gpio=hal.gpio)
+    overpressure_trip = OverpressureTrip(hal.pi, PRESSURE_ALERT_PIN)
+    pressure_sensor = PressureSensor(pi=hal.pi, overpressure_trip=overpressure_trip, i2c=hal.i2c,
+                                     clock=hal.clock)
+    motor = Motor(encoder, tic_device=hal.tic_device(), async_io=hal.tic_async_io, clock=hal.clock)
+    buzzers = (Buzzer(BUZZER_PIN_1, gpio=hal.gpio), Buzzer(BUZZER_PIN_2, gpio=hal.gpio))
+    return VentilatorController(motor, pressure_sensor,
+                                absolute_switch, contact_switch, power_switch,
+                                overpressure_trip=overpressure_trip,
+                                buzzers=buzzers, clock=hal.clock, telemetry=telemetry)
+
+
+def home(controller):
+    controller.set_state(controller.HOMING_STATE)
+    controller.start_homing()
+    assert controller.current_state is controller.HOMING_VERIF_STATE
+
+
+def test_homing():
+    hal = SimBackend(realtime=False)
+    controller = build(hal)
+    home(controller)
+
+    # the encoder is zeroed on the upper switch, the contact is found below it
+    expected = SIM_CONTACT_POSITION - hal.plant.upper_switch_position
+    assert abs(controller.bag_contact_position() - expected) <= 2, controller.bag_contact_position()
+    controller.pressure_sensor.stop_streaming()
+
+
+def test_ventilation(seconds=12.0, volume=400, bpm=20):
+    hal = SimBackend(realtime=False)
+    trace = tempfile.NamedTemporaryFile(suffix=".trace", delete=False)
+    trace.close()
+    telemetry = TelemetryRecorder(trace.name)
+    controller = build(hal, telemetry)
+    telemetry.start()
+    home(controller)
+    controller.update_bpm(bpm)
+    controller.update_tidal_volume(volume)
+
+    peak = 0.0
+    def sample(dt):
+        nonlocal peak
+        peak = max(peak, hal.plant.pressure())
+    hal.clock.add_listener(sample)
+
+    # the ticks trace the cached tic position, it is only read over usb
+    # for the log at the end of each stroke
+    reads = [0]
+    get_current_position = hal.tic.get_current_position
+    def read_position():
+        reads[0] += 1
+        return get_current_position()
+    hal.tic.get_current_position = read_position
+
+    controller.set_state(controller.START_STATE)
+    t_sim = hal.clock.monotonic()
+    t_wall = perf_counter()
+    controller.run_fixed_rate(CONTROL_LOOP_PERIOD, duration=seconds)
+    t_wall = perf_counter() - t_wall
+    t_sim = hal.clock.monotonic() - t_sim
+
+    breaths = controller.cycle_count
+    assert reads[0] <= 2 * (breaths + 1), (reads[0], breaths)
+    print("{:.1f} s simulated in {:.2f} s ({:.1f}x real time), {} breaths, {} ticks, "
+          "peak pressure {:.1f} cmH2O".format(t_sim, t_wall, t_sim / t_wall, breaths,
+                                              controller.loop_tick_count, peak))
+
+    assert breaths >= int(seconds * bpm / 60) - 1, breaths
+    assert peak > 0.5 * volume / hal.plant.lung.compliance, peak
+    assert controller.pressure_sensor.get_pressure_history(1)[1][0] > -1.0
+    controller.pressure_sensor.stop_streaming()
+
+    # one record per tick, every phase of the breath traced
+    telemetry.stop()
+    records, info = read_telemetry(trace.name)
+    os.remove(trace.name)
+    assert len(records) == controller.loop_tick_count, (len(records), controller.loop_tick_count)
+    traced = {info['state_names'][state] for state in set(records['state'].tolist())}
+    assert {"INSP_STATE", "INSP_PAUSE", "EXP_STATE", "EXP_PAUSE_STATE"} <= traced, traced
+    assert records['encoder'].min() < SIM_CONTACT_POSITION - SIM_ARM_START_POSITION
+    assert records['tic_position'][-1] == controller.motor.cached_motor_position()
+    return t_sim / t_wall
+
+
+def test_tidal_volume_change(shape=None, bpm=20):
+    """
+    confirm a new tidal volume in the middle of insp, the breath
+    finishes and the following ones reach the new lower target
+    """
+    hal = SimBackend(realtime=False)
+    controller = build(hal)
+    controller.motion_profile = shape
+    home(controller)
+    controller.update_bpm(bpm)
+    controller.update_tidal_volume(400)
+    controller.set_state(controller.START_STATE)
+
+    # into the second breath's insp stroke
+    while not (controller.cycle_count >= 2 and controller.current_state is controller.INSP_STATE and
+               hal.clock.monotonic_ns() - controller._t_cycle_start > 0.3e9):
+        controller.run_fixed_rate(CONTROL_LOOP_PERIOD, duration=0.02)
+    cycles = controller.cycle_count
+    controller.update_tidal_volume(600)
+
+    lowest = [0]
+    def sample(dt):
+        lowest[0] = min(lowest[0], controller.motor.encoder_position())
+    controller.run_fixed_rate(CONTROL_LOOP_PERIOD, duration=2 * 60 / bpm)
+    hal.clock.add_listener(sample)
+    controller.run_fixed_rate(CONTROL_LOOP_PERIOD, duration=60 / bpm)
+    controller.pressure_sensor.stop_streaming()
+
+    print("{}: {} breaths after the change, lowest {} for a target of {}".format(
+        shape, controller.cycle_count - cycles, lowest[0], controller.motor_lower_target))
+    assert controller.cycle_count - cycles >= 2, controller.cycle_count - cycles
+    assert abs(lowest[0] - controller.motor_lower_target) <= 10, (lowest[0], controller.motor_lower_target)
+
+
+def test_tidal_volume_change_profile():
+    test_tidal_volume_change("trapezoid")
+
+
+def test_overpressure_pause(max_pressure=15.0, bpm=20):
+    """
+    the controller itself stops the arm when the pressure trips
+    """
+    hal = SimBackend(realtime=False)
+    controller = build(hal)
+    controller.overpressure_trip.max_pressure = max_pressure
+    controller.pressure_sensor.stop_streaming()
+    controller.pressure_sensor.start_streaming()
+    home(controller)
+    controller.update_bpm(bpm)
+    controller.update_tidal_volume(400)
+    controller.set_state(controller.START_STATE)
+
+    peak = [0.0]
+    def sample(dt):
+        peak[0] = max(peak[0], hal.plant.pressure())
+    hal.clock.add_listener(sample)
+    controller.run_fixed_rate(CONTROL_LOOP_PERIOD, duration=2 * 60 / bpm)
+    position = controller.motor.encoder_position()
+    controller.run_fixed_rate(CONTROL_LOOP_PERIOD, duration=1.0)
+    controller.pressure_sensor.stop_streaming()
+
+    print("over pressure trip at {} cmH2O, peak {:.1f} cmH2O".format(max_pressure, peak[0]))
+    assert controller.overpressure_trip.trip_count >= 1
+    assert controller.current_state is controller.PAUSE_STATE, controller.current_state.name
+    assert abs(controller.motor.encoder_position() - position) <= 2
+    assert peak[0] < max_pressure + 5, peak[0]
+
+
+def test_sensor_service(seconds=3.0, bpm=20):
+    """
+    the waveforms are sampled on the simulated clock, every run the same
+    """
+    hal = SimBackend(realtime=False)
+    controller = build(hal)
+    home(controller)
+    service = SensorService(controller.pressure_sensor, controller.motor.encoder,
+                            volume_zero=controller.bag_contact_position, clock=hal.clock)
+    service.start()
+    start = hal.clock.monotonic_ns()
+    controller.update_bpm(bpm)
+    controller.update_tidal_volume(400)
+    controller.set_state(controller.START_STATE)
+    controller.run_fixed_rate(CONTROL_LOOP_PERIOD, duration=seconds)
+    end = hal.clock.monotonic_ns()
+    pressure_times, _, _ = service.waveform_since('pressure', 0)
+    service.stop()
+
+    times, volume, _ = service.waveform_since('volume', 0)
+    period = 1000000000 // service.sample_rate
+    assert len(times) == (end - start) // period, (len(times), (end - start) // period)
+    assert (times[1:] - times[:-1] == period).all()
+    assert volume.max() > 200, volume.max()
+    assert start <= pressure_times[-1] <= end
+    # stopped, the clock no longer runs the sampler
+    hal.clock.sleep(0.1)
+    assert len(service.waveform_since('volume', 0)[0]) == (end - start) // period
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=12.0, help="simulated ventilation time")
+    args = parser.parse_args()
+
+    test_homing()
+    test_ventilation(args.seconds)
+    test_tidal_volume_change()
+    test_tidal_volume_change_profile()
+    test_overpressure_pause()
+    test_sensor_service()
+    print("all tests passed")
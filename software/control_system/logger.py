@@ -5,23 +5,102 @@ test program for python native logging
 author: William Xie
 '''
 from datetime import datetime
+import atexit
 import logging
+import logging.handlers
+import queue
+from configs.logging_configs import *
+
+
+# arguments that cannot change between the log call and the listener formatting them
+IMMUTABLE_ARGS = (str, bytes, int, float, type(None), datetime)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves the formatting to the listener thread. The
+    stock prepare merges the %-style arguments into the message on the
+    logging thread; here a record whose arguments are all immutable
+    (IMMUTABLE_ARGS) is enqueued as it is. Any other argument could
+    change before the listener formats it, so those records are merged
+    on the logging thread as the stock prepare does.
+    """
+
+    def prepare(self, record):
+        args = record.args
+        if args:
+            if isinstance(args, dict):
+                args = args.values()
+            if not all(isinstance(arg, IMMUTABLE_ARGS) for arg in args):
+                record.msg = record.getMessage()
+                record.args = None
+        return record
+
 
 class LoggerInit:
 
-    def __init__(self, name):
+    def __init__(self, name, directory=LOG_DIR, async_logging=LOG_ASYNC, rotation=LOG_ROTATION,
+                 level=LOG_LEVEL, stream=None):
+        """
+        @param name: the name of the program logging
+        @param directory: the directory of the log file
+        @param async_logging: put the handlers behind a QueueListener, a log
+                              call on any thread is then only an enqueue
+        @param rotation: None for one file, "size" or "time" to roll the file over
+        @param level: the level of the root logger
+        @param stream: the console stream, defaults to stderr
+        """
         self.filename = datetime.now().strftime("%Y%m%d%H%M%S")
         self.format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         self.header_date = datetime.now().strftime("%Y/%m/%d, %H:%M:%S")
         self.header = f"VentCU Log for {self.header_date}\n"
+        self.path = f'{directory}/{self.filename}.log'
+
+        formatter = logging.Formatter(self.format)
+        self.handlers = [logging.StreamHandler(stream), self.file_handler(self.path, rotation)]
+        for handler in self.handlers:
+            handler.setFormatter(formatter)
+
+        self.listener = None
+        if async_logging:
+            log_queue = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(log_queue, *self.handlers,
+                                                           respect_handler_level=True)
+            self.listener.start()
+            atexit.register(self.stop)
+            handlers = [DeferredQueueHandler(log_queue)]
+        else:
+            handlers = self.handlers
 
-        logging.basicConfig(level=logging.DEBUG, format=self.format,
-                            handlers=[
-                                logging.StreamHandler(),
-                                logging.FileHandler(f'logs/{self.filename}.log')
-                            ])
+        logging.basicConfig(level=level, format=self.format, handlers=handlers)
         logger = logging.getLogger('ventilator.py')
         logger.info(f'{self.header}')
 
+    @staticmethod
+    def file_handler(path, rotation):
+        """
+        @param path: the log file
+        @param rotation: None, "size" or "time"
+        @return: the file handler for the rotation
+        """
+        if rotation is None:
+            return logging.FileHandler(path)
+        if rotation == "size":
+            return logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES,
+                                                        backupCount=LOG_BACKUP_COUNT)
+        if rotation == "time":
+            return logging.handlers.TimedRotatingFileHandler(path, when=LOG_ROTATE_WHEN,
+                                                             backupCount=LOG_BACKUP_COUNT)
+        raise ValueError("Unknown log rotation: " + str(rotation))
+
+    def stop(self):
+        """
+        write out the queued records and stop the listener thread
+        """
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            atexit.unregister(self.stop)
+
 if __name__ == "__main__":
-    logger = LoggerInit("test")
\ No newline at end of file
+    logger = LoggerInit("test")
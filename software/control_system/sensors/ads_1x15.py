@@ -19,6 +19,9 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 import time
+import threading
+
+from hal import pigpio_constants as pigpio
 
 
 # Register and other configuration values:
@@ -70,16 +73,75 @@ ADS1x15_CONFIG_COMP_QUE = {
     4: 0x0002
 }
 ADS1x15_CONFIG_COMP_QUE_DISABLE = 0x0003
+# Threshold register values that turn the ALERT/RDY pin into a conversion
+# ready signal (high threshold MSB set, low threshold MSB clear).
+ADS1x15_READY_HIGH_THRESHOLD    = 0x8000
+ADS1x15_READY_LOW_THRESHOLD     = 0x0000
+# Time to wait for the ALERT/RDY edge past the conversion period before the
+# conversion register is read anyway (in seconds).
+ADS1x15_READY_TIMEOUT           = 0.005
 
 
 class ADS1x15(object):
     """Base functionality for ADS1x15 analog to digital converters."""
 
-    def __init__(self, address=ADS1x15_DEFAULT_ADDRESS, i2c=None, **kwargs):
+    def __init__(self, address=ADS1x15_DEFAULT_ADDRESS, i2c=None, pi=None,
+                 alert_pin=None, **kwargs):
+        """Given a pigpio pi and the gpio wired to the ALERT/RDY pin, the reads
+        wait for the pin to signal the end of the conversion instead of
+        sleeping for a conversion period.
+        """
         if i2c is None:
             import Adafruit_GPIO.I2C as I2C
             i2c = I2C
         self._device = i2c.get_i2c_device(address, **kwargs)
+        self._pi = pi
+        self._alert_pin = alert_pin
+        # Reads where the ALERT/RDY edge never came and the result was read
+        # after the timeout.
+        self.ready_timeouts = 0
+        if self._waits_on_ready:
+            pi.set_mode(alert_pin, pigpio.INPUT)
+            pi.set_pull_up_down(alert_pin, pigpio.PUD_UP)
+
+    @property
+    def _waits_on_ready(self):
+        return self._pi is not None and self._alert_pin is not None
+
+    def _write_ready_thresholds(self):
+        """Set the threshold registers to the conversion ready values."""
+        self._device.writeList(ADS1x15_POINTER_HIGH_THRESHOLD,
+                               [(ADS1x15_READY_HIGH_THRESHOLD >> 8) & 0xFF, ADS1x15_READY_HIGH_THRESHOLD & 0xFF])
+        self._device.writeList(ADS1x15_POINTER_LOW_THRESHOLD,
+                               [(ADS1x15_READY_LOW_THRESHOLD >> 8) & 0xFF, ADS1x15_READY_LOW_THRESHOLD & 0xFF])
+
+    def _convert(self, config, data_rate, active_low=True):
+        """Write the config value to start a conversion and return the result
+        once it is done.  With an ALERT/RDY pin the caller has set the
+        comparator up for conversion ready and the result is read on the
+        pin's edge, or after ADS1x15_READY_TIMEOUT past the conversion period
+        if it never comes.  Otherwise wait for the conversion period.
+        """
+        if not self._waits_on_ready:
+            self._device.writeList(ADS1x15_POINTER_CONFIG, [(config >> 8) & 0xFF, config & 0xFF])
+            # Wait for the ADC sample to finish based on the sample rate plus a
+            # small offset to be sure (0.1 millisecond).
+            time.sleep(1.0/data_rate+0.0001)
+        else:
+            # Listen before starting the conversion, it may finish before the
+            # write returns.
+            ready = threading.Event()
+            edge = pigpio.FALLING_EDGE if active_low else pigpio.RISING_EDGE
+            cb = self._pi.callback(self._alert_pin, edge, lambda gpio, level, tick: ready.set())
+            try:
+                self._device.writeList(ADS1x15_POINTER_CONFIG, [(config >> 8) & 0xFF, config & 0xFF])
+                if not ready.wait(1.0/data_rate + ADS1x15_READY_TIMEOUT):
+                    self.ready_timeouts += 1
+            finally:
+                cb.cancel()
+        # Retrieve the result.
+        result = self._device.readList(ADS1x15_POINTER_CONVERSION, 2)
+        return self._conversion_value(result[1], result[0])
 
     def _data_rate_default(self):
         """Retrieve the default data rate for this ADC (in samples per second).
@@ -122,16 +184,17 @@ class ADS1x15(object):
         # Set the data rate (this is controlled by the subclass as it differs
         # between ADS1015 and ADS1115).
         config |= self._data_rate_config(data_rate)
-        config |= ADS1x15_CONFIG_COMP_QUE_DISABLE  # Disble comparator mode.
-        # Send the config value to start the ADC conversion.
-        # Explicitly break the 16-bit value down to a big endian pair of bytes.
-        self._device.writeList(ADS1x15_POINTER_CONFIG, [(config >> 8) & 0xFF, config & 0xFF])
-        # Wait for the ADC sample to finish based on the sample rate plus a
-        # small offset to be sure (0.1 millisecond).
-        time.sleep(1.0/data_rate+0.0001)
-        # Retrieve the result.
-        result = self._device.readList(ADS1x15_POINTER_CONVERSION, 2)
-        return self._conversion_value(result[1], result[0])
+        if not self._waits_on_ready:
+            config |= ADS1x15_CONFIG_COMP_QUE_DISABLE  # Disble comparator mode.
+            return self._convert(config, data_rate)
+        # Signal conversion ready on ALERT/RDY for the conversion.
+        self._write_ready_thresholds()
+        value = self._convert(config | ADS1x15_CONFIG_COMP_QUE[1], data_rate)
+        if mode == ADS1x15_CONFIG_MODE_CONTINUOUS:
+            # Disable the comparator again for the following conversions.
+            config |= ADS1x15_CONFIG_COMP_QUE_DISABLE
+            self._device.writeList(ADS1x15_POINTER_CONFIG, [(config >> 8) & 0xFF, config & 0xFF])
+        return value
 
     def _read_comparator(self, mux, gain, data_rate, mode, high_threshold,
                          low_threshold, active_low, traditional, latching,
@@ -141,9 +204,14 @@ class ADS1x15(object):
         integer result of the read.
         """
         assert num_readings == 1 or num_readings == 2 or num_readings == 4, 'Num readings must be 1, 2, or 4!'
-        # Set high and low threshold register values.
-        self._device.writeList(ADS1x15_POINTER_HIGH_THRESHOLD, [(high_threshold >> 8) & 0xFF, high_threshold & 0xFF])
-        self._device.writeList(ADS1x15_POINTER_LOW_THRESHOLD, [(low_threshold >> 8) & 0xFF, low_threshold & 0xFF])
+        if not self._waits_on_ready:
+            # Set high and low threshold register values.
+            self._device.writeList(ADS1x15_POINTER_HIGH_THRESHOLD, [(high_threshold >> 8) & 0xFF, high_threshold & 0xFF])
+            self._device.writeList(ADS1x15_POINTER_LOW_THRESHOLD, [(low_threshold >> 8) & 0xFF, low_threshold & 0xFF])
+        else:
+            # ALERT/RDY signals the first conversion, the thresholds are set
+            # once it is read.
+            self._write_ready_thresholds()
         # Now build up the appropriate config register value.
         config = ADS1x15_CONFIG_OS_SINGLE  # Go out of power-down mode for conversion.
         # Specify mux value.
@@ -173,14 +241,34 @@ class ADS1x15(object):
         # Set number of comparator hits before alerting.
         config |= ADS1x15_CONFIG_COMP_QUE[num_readings]
         # Send the config value to start the ADC conversion.
-        # Explicitly break the 16-bit value down to a big endian pair of bytes.
+        value = self._convert(config, data_rate, active_low)
+        if self._waits_on_ready:
+            # Hand ALERT/RDY over to the comparator.
+            self._device.writeList(ADS1x15_POINTER_HIGH_THRESHOLD, [(high_threshold >> 8) & 0xFF, high_threshold & 0xFF])
+            self._device.writeList(ADS1x15_POINTER_LOW_THRESHOLD, [(low_threshold >> 8) & 0xFF, low_threshold & 0xFF])
+        return value
+
+    def _start_conversion_ready(self, mux, gain, data_rate):
+        """Start continuous conversions with the ALERT/RDY pin pulsing low at
+        the end of every conversion.  Unlike _read this does not wait for or
+        read a result, the caller reads the conversion register on the edge.
+        """
+        self._write_ready_thresholds()
+        config = ADS1x15_CONFIG_OS_SINGLE  # Go out of power-down mode for conversion.
+        # Specify mux value.
+        config |= (mux & 0x07) << ADS1x15_CONFIG_MUX_OFFSET
+        # Validate the passed in gain and then set it in the config.
+        if gain not in ADS1x15_CONFIG_GAIN:
+            raise ValueError('Gain must be one of: 2/3, 1, 2, 4, 8, 16')
+        config |= ADS1x15_CONFIG_GAIN[gain]
+        config |= ADS1x15_CONFIG_MODE_CONTINUOUS
+        if data_rate is None:
+            data_rate = self._data_rate_default()
+        config |= self._data_rate_config(data_rate)
+        # The comparator must be enabled (any queue value) for the pin to
+        # signal conversion ready; traditional, active low, non-latching.
+        config |= ADS1x15_CONFIG_COMP_QUE[1]
         self._device.writeList(ADS1x15_POINTER_CONFIG, [(config >> 8) & 0xFF, config & 0xFF])
-        # Wait for the ADC sample to finish based on the sample rate plus a
-        # small offset to be sure (0.1 millisecond).
-        time.sleep(1.0/data_rate+0.0001)
-        # Retrieve the result.
-        result = self._device.readList(ADS1x15_POINTER_CONVERSION, 2)
-        return self._conversion_value(result[1], result[0])
 
     def read_adc(self, channel, gain=1, data_rate=None):
         """Read a single ADC channel and return the ADC value as a signed integer
@@ -294,6 +382,24 @@ class ADS1x15(object):
                                      high_threshold, low_threshold, active_low,
                                      traditional, latching, num_readings)
 
+    def start_adc_ready(self, channel, gain=1, data_rate=None):
+        """Start continuous ADC conversions on the specified channel (0-3) with
+        the ALERT/RDY pin used as a conversion ready signal.  The pin pulses low
+        when each conversion completes, call get_last_result() on that edge to
+        read it.  Call stop_adc() to stop conversions.
+        """
+        assert 0 <= channel <= 3, 'Channel must be a value within 0-3!'
+        self._start_conversion_ready(channel + 0x04, gain, data_rate)
+
+    def start_adc_difference_ready(self, differential, gain=1, data_rate=None):
+        """Start continuous ADC conversions between two channels with the
+        ALERT/RDY pin used as a conversion ready signal.  See
+        start_adc_difference for valid differential parameter values and
+        start_adc_ready for how the pin behaves.
+        """
+        assert 0 <= differential <= 3, 'Differential must be a value within 0-3!'
+        self._start_conversion_ready(differential, gain, data_rate)
+
     def stop_adc(self):
         """Stop all continuous ADC conversions (either normal or difference mode).
         """
@@ -0,0 +1,219 @@
+#
+# Breath analyzer class for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+from array import array
+from math import sqrt
+from configs.sensor_configs import BREATH_START_VOLUME, BREATH_END_VOLUME, \
+    BREATH_STATS_WINDOW, BREATH_PUBLISH_PERIOD
+
+NS_PER_SEC = 1000000000
+
+# the measured parameters, in the order of BreathAnalyzer.snapshot
+METRICS = ('volume', 'bpm', 'ie', 'pip', 'peep')
+
+
+class RollingStats:
+    """
+    Mean and variance of the last `window` values, updated in
+    constant time per value from running sums.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = array('d', [0.0]) * window
+        self.count = 0      # total number of values added
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def add(self, value):
+        value = float(value)
+        i = self.count % self.window
+        if self.count >= self.window:
+            old = self.values[i]
+            self._sum -= old
+            self._sum_sq -= old * old
+        self.values[i] = value
+        self._sum += value
+        self._sum_sq += value * value
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.window)
+
+    @property
+    def latest(self):
+        return self.values[(self.count - 1) % self.window] if self.count else None
+
+    @property
+    def mean(self):
+        n = len(self)
+        return self._sum / n if n else None
+
+    @property
+    def variance(self):
+        n = len(self)
+        if n == 0:
+            return None
+        mean = self._sum / n
+        return max(self._sum_sq / n - mean * mean, 0.0)
+
+    @property
+    def std(self):
+        variance = self.variance
+        return sqrt(variance) if variance is not None else None
+
+
+class BreathAnalyzer:
+    """
+    Segments breaths from the delivered volume and measures each
+    one: tidal volume, rate, I:E, peak inspiratory pressure and
+    positive end expiratory pressure. Every sample updates a few
+    running values, a breath's metrics are complete when the next
+    breath starts.
+
+    A breath starts when the volume rises BREATH_START_VOLUME above
+    its minimum, at the time of that minimum. Insp ends at the peak
+    volume, once the volume has fallen BREATH_END_VOLUME below it.
+    PEEP is the mean pressure while the bag rests at the end of exp.
+
+    The means over the last BREATH_STATS_WINDOW breaths are published
+    with the sender's signal, at most once per publish period.
+    """
+
+    INSP = 0
+    EXP = 1
+
+    def __init__(self, sender=None, window=BREATH_STATS_WINDOW, publish_period=BREATH_PUBLISH_PERIOD,
+                 start_volume=BREATH_START_VOLUME, end_volume=BREATH_END_VOLUME):
+        """
+        @param sender: UpdateMeasuredParametersSender to emit, None to only keep the metrics
+        @param window: the number of breaths of the rolling statistics
+        @param publish_period: the shortest time between emits (in seconds)
+        @param start_volume: the rise (mL) above the minimum that starts a breath
+        @param end_volume: the fall (mL) below the peak that ends insp
+        """
+        self.sender = sender
+        self.publish_period_ns = int(publish_period * NS_PER_SEC)
+        self.start_volume = start_volume
+        self.end_volume = end_volume
+
+        self.stats = {name: RollingStats(window) for name in METRICS}
+        self.breath_count = 0
+        self.publish_count = 0
+
+        self._phase = self.EXP
+        self._t_start = None            # time (ns) the current breath started, None before the first
+        self._v_start = 0.0
+        self._t_peak = 0                # time (ns) and volume (mL) of the peak of insp
+        self._v_peak = 0.0
+        self._t_min = None              # time (ns) and volume (mL) of the minimum of exp
+        self._v_min = 0.0
+        self._pip = None                # highest pressure (cmH2O) of the current breath
+        self._v_rest = 0.0              # volume (mL) the rest at the end of exp started at
+        self._rest_sum = 0.0            # pressures while the bag rests near the minimum
+        self._rest_count = 0
+        self._pressure = None           # latest pressure (cmH2O)
+        self._t_published = None
+        self._pending = False
+
+    def add_pressure(self, t, pressure):
+        """
+        @param t: the monotonic time (ns) of the sample
+        @param pressure: the pressure (cmH2O)
+        """
+        self._pressure = pressure
+        if self._pip is None or pressure > self._pip:
+            self._pip = pressure
+        if self._phase == self.EXP and self._t_min is not None:
+            self._rest_sum += pressure
+            self._rest_count += 1
+
+    def add_volume(self, t, volume):
+        """
+        @param t: the monotonic time (ns) of the sample
+        @param volume: the volume (mL) delivered
+        """
+        if self._phase == self.INSP:
+            if volume >= self._v_peak:
+                self._t_peak, self._v_peak = t, volume
+            elif volume < self._v_peak - self.end_volume:
+                self._phase = self.EXP
+                self._t_min, self._v_min = t, volume
+                self._v_rest = volume
+                self._rest_sum, self._rest_count = 0.0, 0
+        else:
+            if self._t_min is None or volume <= self._v_min:
+                # still falling, the rest before the next breath is ahead
+                if self._t_min is None or volume < self._v_rest - self.start_volume:
+                    self._v_rest = volume
+                    self._rest_sum, self._rest_count = 0.0, 0
+                # the last time at the minimum, the breath starts at the end of the rest
+                self._t_min, self._v_min = t, volume
+            elif volume > self._v_min + self.start_volume:
+                self._start_breath(self._t_min, self._v_min)
+                self._phase = self.INSP
+                self._t_peak, self._v_peak = t, volume
+
+        if self._pending:
+            self.publish(t)
+
+    def update(self, times, volumes, pressure_times, pressures):
+        """
+        add blocks of samples, the pressures are merged in time
+        order with the volumes.
+        @param times, volumes: the volume samples (ns, mL)
+        @param pressure_times, pressures: the pressure samples (ns, cmH2O)
+        """
+        j = 0
+        n = len(pressure_times)
+        for t, volume in zip(times, volumes):
+            while j < n and pressure_times[j] <= t:
+                self.add_pressure(pressure_times[j], pressures[j])
+                j += 1
+            self.add_volume(t, volume)
+        for k in range(j, n):
+            self.add_pressure(pressure_times[k], pressures[k])
+
+    def _start_breath(self, t, volume):
+        if self._t_start is not None and t > self._t_peak > self._t_start:
+            insp = self._t_peak - self._t_start
+            exp = t - self._t_peak
+            self.stats['volume'].add(self._v_peak - self._v_start)
+            self.stats['bpm'].add(60.0 * NS_PER_SEC / (t - self._t_start))
+            self.stats['ie'].add(exp / insp)
+            if self._pip is not None:
+                self.stats['pip'].add(self._pip)
+            if self._rest_count:
+                self.stats['peep'].add(self._rest_sum / self._rest_count)
+            self.breath_count += 1
+            self._pending = True
+
+        self._t_start, self._v_start = t, volume
+        self._pip = self._pressure
+        self._rest_sum, self._rest_count = 0.0, 0
+
+    def publish(self, t):
+        """
+        emit the sender's signal, unless it was emitted less than the
+        publish period ago; it is then emitted with a later sample.
+        @param t: the monotonic time (ns) now
+        """
+        if self._t_published is not None and t - self._t_published < self.publish_period_ns:
+            self._pending = True
+            return
+        self._pending = False
+        self._t_published = t
+        self.publish_count += 1
+        if self.sender is not None:
+            self.sender.update_measured_parameters_signal.emit()
+
+    def snapshot(self):
+        """
+        @return: a dict of the METRICS, the mean over the window of each,
+                 None before the first breath
+        """
+        return {name: self.stats[name].mean for name in METRICS}
@@ -0,0 +1,108 @@
+#
+# Overpressure trip class for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+from hal import pigpio_constants as pigpio
+from configs.ventilation_configs import MAX_PRESSURE
+from configs.sensor_configs import OVERPRESSURE_HYSTERESIS
+from sensors.pressure_calibration import load_calibration
+
+
+class OverpressureTrip:
+    """
+    Watches the ALERT/RDY pin of the pressure adc while its
+    comparator runs in traditional mode: ALERT goes low on the
+    first conversion above the high threshold and releases once a
+    conversion falls below the low threshold. The edge is handled
+    by a pigpio callback, no software polling is involved.
+
+    When ALERT/RDY signals conversion ready instead, the stream
+    passes each sample to check, which applies the same thresholds
+    on the sample's edge.
+
+    Set callback to a function taking the status, 1 when the
+    pressure is over the limit and 0 when it has cleared.
+    """
+
+    def __init__(self, pi, alert_pin, max_pressure=MAX_PRESSURE,
+                 hysteresis=OVERPRESSURE_HYSTERESIS, calibration=None):
+        """
+        @param pi: the pigpio pi the ALERT/RDY pin is read from
+        @param alert_pin: the gpio wired to ALERT/RDY
+        @param max_pressure: the trip pressure (cmH2O)
+        @param hysteresis: how far (cmH2O) under max_pressure the trip clears
+        @param calibration: the PressureCalibration of the sensor, the
+                            configured one if None
+        """
+        self.pi = pi
+        self.alert_pin = alert_pin
+        self.callback = None
+
+        self.max_pressure = max_pressure
+        self.hysteresis = hysteresis
+        self.high_threshold = 0
+        self.low_threshold = 0
+        self.calibrate(calibration if calibration is not None else load_calibration())
+
+        self.tripped = False
+        self.trip_count = 0
+        self.last_trip_tick = None
+        self._cb = None
+
+    def calibrate(self, calibration):
+        """
+        set the raw thresholds from a sensor calibration, takes
+        effect the next time the comparator is started
+        @param calibration: the PressureCalibration of the sensor
+        """
+        self.high_threshold = calibration.to_raw(self.max_pressure)
+        self.low_threshold = calibration.to_raw(self.max_pressure - self.hysteresis)
+
+    @property
+    def thresholds(self):
+        """
+        @return: the (high, low) raw adc thresholds for the comparator
+        """
+        return self.high_threshold, self.low_threshold
+
+    def start(self):
+        self.pi.set_mode(self.alert_pin, pigpio.INPUT)
+        self.pi.set_pull_up_down(self.alert_pin, pigpio.PUD_UP)
+        self._cb = self.pi.callback(self.alert_pin, pigpio.EITHER_EDGE, self._alert)
+
+    def cancel(self):
+        if self._cb is not None:
+            self._cb.cancel()
+            self._cb = None
+
+    def status(self):
+        return 1 if self.tripped else 0
+
+    def check(self, raw, tick):
+        """
+        compare a sample with the thresholds as the comparator does,
+        called by the stream on each conversion ready edge
+        @param raw: the raw adc value
+        @param tick: the pigpio tick of the sample
+        """
+        if self.tripped:
+            if raw < self.low_threshold:
+                self._set(False, tick)
+        elif raw > self.high_threshold:
+            self._set(True, tick)
+
+    def _alert(self, gpio, level, tick):
+        self._set(level == 0, tick)         # ALERT is active low
+
+    def _set(self, tripped, tick):
+        if tripped == self.tripped:
+            return
+        self.tripped = tripped
+        if tripped:
+            self.trip_count += 1
+            self.last_trip_tick = tick
+        if self.callback is not None:
+            self.callback(self.status())
@@ -1,24 +1,30 @@
 
-import RPi.GPIO as GPIO
 from time import sleep
 
 class PowerSwitch():
 
-    def __init__(self, PIN):
+    def __init__(self, PIN, gpio=None):
+        """
+        @param PIN: the switch gpio
+        @param gpio: the RPi.GPIO module or a stand-in, defaults to RPi.GPIO
+        """
+        if gpio is None:
+            import RPi.GPIO as gpio
+        self.gpio = gpio
         self.switch_pin = PIN
         self.callback = None
 
         # Broadcom GPIO #s, NOT straight pin numbers on board
-        GPIO.setmode(GPIO.BCM)
+        gpio.setmode(gpio.BCM)
 
-        GPIO.setup(PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        GPIO.add_event_detect(PIN,
-                              GPIO.RISING,
+        gpio.setup(PIN, gpio.IN, pull_up_down=gpio.PUD_UP)
+        gpio.add_event_detect(PIN,
+                              gpio.RISING,
                               callback=self.switch_callback,
                               bouncetime=100)
 
     def get_status(self):
-        return GPIO.input(self.switch_pin)
+        return self.gpio.input(self.switch_pin)
 
     def switch_callback(self, state):
         if self.callback is not None:
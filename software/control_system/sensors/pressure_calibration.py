@@ -0,0 +1,67 @@
+#
+# Pressure calibration class for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import numpy as np
+from configs.sensor_configs import PRESSURE_CALIBRATIONS, PRESSURE_SENSOR_ID
+
+CMH2O_PER_PSI = 70.307
+
+
+class PressureCalibration:
+    """
+    Linear conversion of raw adc counts to cmH2O,
+    pressure = (raw - offset) * gain. Scalars and whole
+    numpy blocks of samples are converted the same way.
+    """
+
+    def __init__(self, offset, gain):
+        """
+        @param offset: the raw adc value at zero pressure (counts)
+        @param gain: the pressure of one count (cmH2O/count)
+        """
+        self.offset = float(offset)
+        self.gain = float(gain)
+
+    def convert(self, raw, out=None):
+        """
+        @param raw: a raw adc value or an array of them
+        @param out: optional float64 array to write the result to
+        @return: the pressure (cmH2O), a float for a scalar input
+        """
+        if np.isscalar(raw):
+            return (raw - self.offset) * self.gain
+        pressure = np.subtract(raw, self.offset, out=out, dtype=np.float64)
+        pressure *= self.gain
+        return pressure
+
+    def to_raw(self, pressure):
+        """
+        @param pressure: a pressure (cmH2O)
+        @return: the nearest raw adc value
+        """
+        return int(round(pressure / self.gain + self.offset))
+
+    def tare(self, raw):
+        """
+        take the mean of samples at ambient pressure as the zero offset
+        @param raw: array of raw adc values
+        @return: the new offset (counts)
+        """
+        raw = np.asarray(raw)
+        if raw.size == 0:
+            raise ValueError("no samples to tare with")
+        self.offset = float(raw.mean())
+        return self.offset
+
+
+def load_calibration(device_id=PRESSURE_SENSOR_ID):
+    """
+    @param device_id: the key of the sensor in PRESSURE_CALIBRATIONS
+    @return: a PressureCalibration with the offset and gain of the device
+    """
+    offset, gain = PRESSURE_CALIBRATIONS[device_id]
+    return PressureCalibration(offset, gain)
@@ -2,49 +2,178 @@
 # Pressure Sensor Class
 # Implemented with an analog-digital converter communicating over I2C
 #
-import board
-import busio
-import adafruit_ads1x15.ads1115 as ADS
-from adafruit_ads1x15.analog_in import AnalogIn
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from time import sleep
-import matplotlib.pyplot as plt
 import numpy as np
 import logging
+from sensors.ads_1x15 import ADS1115
+from sensors.pressure_stream import PressureStream
+from sensors.pressure_calibration import load_calibration
+from configs.sensor_configs import *
+from configs.gpio_map import PRESSURE_ALERT_PIN
 
-plt_logger = logging.getLogger('matplotlib')
-plt_logger.setLevel(logging.CRITICAL)
+# full scale voltage of the ADS1115 for each gain
+ADS1115_FULL_SCALE = {
+    2/3: 6.144,
+    1:   4.096,
+    2:   2.048,
+    4:   1.024,
+    8:   0.512,
+    16:  0.256
+}
 
 
 class PressureSensor:
 
-    def __init__(self):
+    def __init__(self, streaming=PRESSURE_STREAMING, pi=None, overpressure_trip=None, i2c=None,
+                 clock=None):
+        """
+        @param streaming: convert continuously instead of single shot reads
+        @param pi: pigpio pi to take samples on the ALERT/RDY edge, None
+                   to wait a conversion period and poll the adc from a thread
+        @param overpressure_trip: OverpressureTrip of the samples, streaming is
+                   forced. It checks each sample on the conversion ready edge or
+                   watches the adc comparator, see OVERPRESSURE_TRIP_MODE
+        @param i2c: the I2C bus of the adc, None for the Pi's
+        @param clock: the clock of the streamed sample times, None for the system clock
+        """
 
-        print("NOT IMPLEMENTED")
-        # default i2c port set to 48
+        # default i2c address set to 48
         # default i2c communication on pins 3, 5 of pi
-        self.i2c = busio.I2C(board.SCL, board.SDA)
-        self.ads = ADS.ADS1115(self.i2c)
+        # single shot reads (the tare) wait on ALERT/RDY too
+        ready = pi is not None and PRESSURE_CONVERSION_READY
+        self.ads = ADS1115(address=PRESSURE_ADC_ADDRESS, i2c=i2c, pi=pi if ready else None,
+                           alert_pin=PRESSURE_ALERT_PIN if ready else None)
+        self.logger = logging.getLogger('pressure_sensor')
+        self.pi = pi
+        self.overpressure_trip = overpressure_trip
+        self.clock = clock
         self.raw_pressure = 0
         self.voltage = 0
 
+        self.stream = None
+        self.calibration = load_calibration(PRESSURE_SENSOR_ID)
+        if PRESSURE_AUTO_TARE:
+            self.tare()
+
+        if streaming or overpressure_trip is not None:
+            self.start_streaming()
+
+    def tare(self, samples=PRESSURE_TARE_SAMPLES):
+        """
+        zero the calibration offset from single shot reads at ambient
+        pressure. streaming is stopped for the reads and restarted
+        after, so the comparator is set to the new thresholds.
+        @param samples: the number of samples averaged
+        @return: the new offset (counts)
+        """
+        streaming = self.stream is not None
+        self.stop_streaming()
+        raw = np.fromiter((self.ads.read_adc_difference(PRESSURE_ADC_DIFFERENTIAL,
+                                                        gain=PRESSURE_ADC_GAIN,
+                                                        data_rate=PRESSURE_DATA_RATE)
+                           for _ in range(samples)), dtype=np.int32, count=samples)
+        offset = self.calibration.tare(raw)
+        if streaming:
+            self.start_streaming()
+        return offset
+
+    def start_streaming(self):
+        """
+        convert continuously at PRESSURE_DATA_RATE and read each
+        sample as it is ready. update_data then takes the latest
+        sample instead of waiting on a single shot conversion.
+        """
+        if self.stream is not None:
+            return
+        trip = self.overpressure_trip
+        # ALERT/RDY clocks the samples, unless the adc comparator drives it for the trip
+        ready = self.pi is not None and PRESSURE_CONVERSION_READY and \
+            (trip is None or OVERPRESSURE_TRIP_MODE == "ready")
+        comparator = trip is not None and not ready
+        if trip is not None:
+            trip.calibrate(self.calibration)
+        self.stream = PressureStream(self.ads,
+                                     differential=PRESSURE_ADC_DIFFERENTIAL,
+                                     gain=PRESSURE_ADC_GAIN,
+                                     data_rate=PRESSURE_DATA_RATE,
+                                     history_size=PRESSURE_HISTORY_SIZE,
+                                     pi=self.pi if ready else None,
+                                     alert_pin=PRESSURE_ALERT_PIN if ready else None,
+                                     comparator=trip.thresholds if comparator else None,
+                                     on_sample=trip.check if trip is not None and ready else None,
+                                     clock=self.clock)
+        self.logger.info("pressure samples %s, overpressure trip %s",
+                         "on the conversion ready edge" if ready else "polled",
+                         "off" if trip is None else "on each sample" if ready else "on the adc comparator")
+        self.stream.start()
+        if comparator:
+            trip.start()
+
+    def stop_streaming(self):
+        if self.overpressure_trip is not None:
+            self.overpressure_trip.cancel()
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream = None
+
     def update_data(self):
-        chan = AnalogIn(self.ads, ADS.P0, ADS.P1)
-        self.raw_pressure = chan.value
-        self.voltage = chan.voltage
+        if self.stream is not None:
+            sample = self.stream.latest()
+            if sample is None:
+                return
+            self.raw_pressure = sample[1]
+        else:
+            self.raw_pressure = self.ads.read_adc_difference(PRESSURE_ADC_DIFFERENTIAL,
+                                                             gain=PRESSURE_ADC_GAIN)
+        self.voltage = self.raw_pressure * ADS1115_FULL_SCALE[PRESSURE_ADC_GAIN] / 32768
+
+    def latest_raw(self):
+        """
+        @return: the newest streamed raw value, or the last read one when
+                 not streaming, without reading the adc
+        """
+        if self.stream is not None:
+            sample = self.stream.latest()
+            if sample is not None:
+                return sample[1]
+        return self.raw_pressure
 
     # Returns raw differential reading from pressure sensor
     # Pressure transducer hard wired to ADC analog pins 0, 1
     def get_raw_pressure(self):
-        return np.sqrt(np.square(self.raw_pressure))
+        return abs(self.raw_pressure)
     
     def get_voltage(self):
         return self.voltage
 
-    # TODO: Implement
+    # Returns the pressure (cmH2O) of the last reading
     def get_pressure(self):
-        # remove raw2data later
-        pressure = raw2data(self.raw_pressure)
-        return pressure
+        return self.calibration.convert(self.raw_pressure)
+
+    def get_pressure_history(self, n):
+        """
+        @param n: the number of samples wanted
+        @return: arrays of the monotonic times (ns) and pressures (cmH2O)
+                 of up to the n latest streamed samples, oldest first
+        """
+        if self.stream is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        times, raw = self.stream.buffer.last(n)
+        return np.asarray(times), self.calibration.convert(np.asarray(raw))
+
+    def get_pressure_since(self, cursor):
+        """
+        read the streamed samples taken since a previous call
+        @param cursor: the cursor returned by the previous call, 0 at first
+        @return: (times (ns), pressures (cmH2O), cursor) of the new samples
+        """
+        if self.stream is None:
+            return np.empty(0, dtype=np.int64), np.empty(0), cursor
+        times, raw, cursor = self.stream.buffer.since(cursor)
+        return np.asarray(times), self.calibration.convert(np.asarray(raw)), cursor
 
 # takes channel data from transducer and coverts to psi
 def raw2data(value):
@@ -58,24 +187,18 @@ def raw2data(value):
     return output
 
 def i2c_test():
-    i2c = busio.I2C(board.SCL, board.SDA)
-    ads = ADS.ADS1115(i2c)
+    ads = ADS1115(address=PRESSURE_ADC_ADDRESS)
 
     values = []
     ctr = 0
-    chan0 = AnalogIn(ads, ADS.P0, ADS.P1)
-    chan1 = AnalogIn(ads, ADS.P2, ADS.P3)
-#    chan2 = AnalogIn(ads, ADS.P2)
-#    chan3 = AnalogIn(ads, ADS.P3)
     while(ctr < 5):
         sleep(0.1)
-        pressure = raw2data(chan0.value)
+        value = ads.read_adc_difference(0, gain=1)      # channel 0 minus channel 1
+        pressure = raw2data(value)
         values.append(pressure)
         ctr += 1
-        print("ch0: ", pressure, chan0.voltage)
-#        print("ch1: ", chan1.value, chan1.voltage)
-#        print("ch2: ", chan2.value, chan2.voltage)
-#        print("ch3: ", chan3.value, chan3.voltage)
+        print("ch0: ", pressure, value * ADS1115_FULL_SCALE[1] / 32768)
+#        print("ch1: ", ads.read_adc_difference(3, gain=1))
         
     time = np.arange(ctr)
     # plt.plot(time, np.asarray(values))
@@ -110,6 +233,10 @@ if __name__ == "__main__":
         fd.write(line)
         fd.write('\n')
 
+    # only the plot needs matplotlib, keep it out of the ventilator startup
+    import matplotlib.pyplot as plt
+    logging.getLogger('matplotlib').setLevel(logging.CRITICAL)
+
     fig, (ax1, ax2, ax3) = plt.subplots(3)
     fig.suptitle('Raw, Conv Pressure Readings vs Time (0.01s)')
     ax1.plot(time, np.asarray(values_raw))
@@ -0,0 +1,159 @@
+#
+# Pressure stream class for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import threading
+from hal import pigpio_constants as pigpio
+from hal.clock import SystemClock
+from sensors.ring_buffer import SampleRingBuffer
+from sensors.rotary_encoder import TICK_WRAP
+
+
+class PressureStream:
+    """
+    Runs an ADS1x15 in continuous conversion mode and reads each
+    conversion into a timestamped ring buffer. Readers take the
+    latest sample or the history from the buffer and never wait
+    on the I2C bus.
+
+    Given a pigpio pi and the gpio wired to the ALERT/RDY pin, the
+    adc signals the end of each conversion on the pin and the
+    sample is read from the pigpio callback, then handed to
+    on_sample if set. Otherwise a background thread reads the adc
+    once per conversion period, optionally with the adc comparator
+    set to drive ALERT/RDY instead. On a simulated clock that
+    reader is a clock listener rather than a thread.
+    """
+
+    def __init__(self, adc, differential=0, gain=1, data_rate=860, history_size=4096,
+                 pi=None, alert_pin=None, comparator=None, on_sample=None, clock=None):
+        """
+        @param adc: the ADS1x15 to read
+        @param differential: the channel pair, see ADS1x15.start_adc_difference
+        @param gain: the adc gain
+        @param data_rate: the conversion rate (samples/s)
+        @param history_size: the number of samples kept
+        @param pi: the pigpio pi the ALERT/RDY pin is read from
+        @param alert_pin: the gpio wired to ALERT/RDY, None to poll
+        @param comparator: (high, low) raw thresholds for the adc comparator,
+                           only when polling as it uses the ALERT/RDY pin
+        @param on_sample: called with the (raw value, tick) of each sample
+                          read on the conversion ready edge
+        @param clock: the clock of the sample times, defaults to the system clock
+        """
+        self.adc = adc
+        self.differential = differential
+        self.gain = gain
+        self.data_rate = data_rate
+        self.clock = clock if clock is not None else SystemClock()
+
+        # (monotonic time (ns), raw adc value) of every sample
+        self.buffer = SampleRingBuffer(history_size, time_type='q', value_type='l')
+        self.overruns = 0           # sample periods missed by the reader thread
+
+        self.pi = pi
+        self.alert_pin = alert_pin
+        self.comparator = comparator
+        self.on_sample = on_sample
+        if comparator is not None and self.conversion_ready:
+            raise ValueError("the comparator and conversion ready both use ALERT/RDY")
+        self._ready_cb = None
+        self._last_tick = None
+
+        self._running = False
+        self._thread = None
+        self._elapsed_ns = 0        # simulated time since the last read
+
+    @property
+    def conversion_ready(self):
+        return self.pi is not None and self.alert_pin is not None
+
+    def start(self):
+        if self.conversion_ready:
+            self.pi.set_mode(self.alert_pin, pigpio.INPUT)
+            self.pi.set_pull_up_down(self.alert_pin, pigpio.PUD_UP)
+            self._last_tick = None
+            self._ready_cb = self.pi.callback(self.alert_pin, pigpio.FALLING_EDGE, self._ready)
+            self.adc.start_adc_difference_ready(self.differential, gain=self.gain,
+                                                data_rate=self.data_rate)
+            return
+
+        if self.comparator is not None:
+            high, low = self.comparator
+            value = self.adc.start_adc_difference_comparator(self.differential, high, low,
+                                                             gain=self.gain, data_rate=self.data_rate)
+        else:
+            value = self.adc.start_adc_difference(self.differential, gain=self.gain,
+                                                  data_rate=self.data_rate)
+        self.buffer.append(self.clock.monotonic_ns(), value)
+        self._running = True
+        if hasattr(self.clock, 'add_listener'):
+            self._elapsed_ns = 0
+            self.clock.add_listener(self._step)
+            return
+        self._thread = threading.Thread(target=self._run, name="pressure_stream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._ready_cb is not None:
+            self._ready_cb.cancel()
+            self._ready_cb = None
+        if self._running and self._thread is None:
+            self.clock.remove_listener(self._step)
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.adc.stop_adc()
+
+    def latest(self):
+        """
+        @return: the (time (ns), raw value) of the newest sample, or None
+        """
+        return self.buffer.latest()
+
+    def _ready(self, gpio, level, tick):
+        """
+        pigpio callback on the falling edge of ALERT/RDY, a
+        conversion has just finished.
+        """
+        value = self.adc.get_last_result()
+        self.buffer.append(self.clock.monotonic_ns(), value)
+        if self.on_sample is not None:
+            self.on_sample(value, tick)
+
+        if self._last_tick is not None:
+            period = 1000000 // self.data_rate
+            gap = (tick - self._last_tick) % TICK_WRAP
+            self.overruns += max(0, (gap + period // 2) // period - 1)
+        self._last_tick = tick
+
+    def _step(self, dt):
+        """
+        simulated clock listener, reads the adc every conversion period
+        of simulated time
+        @param dt: the time the clock moved (in seconds)
+        """
+        period = 1000000000 // self.data_rate
+        self._elapsed_ns += int(round(dt * 1e9))
+        while self._elapsed_ns >= period:
+            self._elapsed_ns -= period
+            self.buffer.append(self.clock.monotonic_ns(), self.adc.get_last_result())
+
+    def _run(self):
+        period = 1000000000 // self.data_rate
+        deadline = self.clock.monotonic_ns() + period
+        while self._running:
+            now = self.clock.monotonic_ns()
+            if now < deadline:
+                self.clock.sleep((deadline - now) / 1e9)
+            else:
+                self.overruns += (now - deadline) // period
+                deadline = now
+
+            value = self.adc.get_last_result()
+            self.buffer.append(self.clock.monotonic_ns(), value)
+            deadline += period
@@ -0,0 +1,96 @@
+#
+# Sample ring buffer class for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+from array import array
+
+
+class SampleRingBuffer:
+    """
+    Preallocated ring buffer of timestamped samples shared by one
+    writer thread and one reader thread without a lock.
+
+    The writer stores a sample in its slot and only then advances
+    `count`, so a reader never sees a slot that has not been written.
+    A reader that falls more than `size` samples behind loses the
+    oldest samples; reads check `count` again after copying and drop
+    any sample the writer may have overwritten in the meantime.
+    """
+
+    def __init__(self, size, time_type='d', value_type='d'):
+        """
+        @param size: the number of samples kept
+        @param time_type: array typecode of the timestamps
+        @param value_type: array typecode of the values
+        """
+        self.size = size
+        self.times = array(time_type, [0]) * size
+        self.values = array(value_type, [0]) * size
+        self.count = 0      # total number of samples written
+
+    def append(self, t, value):
+        """
+        store a sample, called from the writer thread only.
+        @param t: the timestamp of the sample
+        @param value: the value of the sample
+        """
+        i = self.count % self.size
+        self.times[i] = t
+        self.values[i] = value
+        self.count += 1
+
+    def latest(self):
+        """
+        @return: the (time, value) of the newest sample, or None if empty
+        """
+        count = self.count
+        if count == 0:
+            return None
+        i = (count - 1) % self.size
+        return self.times[i], self.values[i]
+
+    def last(self, n):
+        """
+        @param n: the number of samples wanted
+        @return: arrays of the times and values of up to the n newest
+                 samples, oldest first
+        """
+        end = self.count
+        return self._read(max(end - n, 0), end)
+
+    def since(self, cursor):
+        """
+        read the samples written since a previous read.
+        @param cursor: the count returned by the previous call, 0 at first
+        @return: (times, values, cursor) of the new samples
+        """
+        end = self.count
+        times, values = self._read(max(cursor, end - self.size), end)
+        return times, values, end
+
+    def _read(self, start, end):
+        if end - start > self.size:
+            start = end - self.size
+        i0 = start % self.size
+        i1 = end % self.size
+        if start == end:
+            times, values = self.times[:0], self.values[:0]
+        elif i0 < i1:
+            times, values = self.times[i0:i1], self.values[i0:i1]
+        else:
+            times = self.times[i0:] + self.times[:i1]
+            values = self.values[i0:] + self.values[:i1]
+
+        # drop samples overwritten while copying. A writer that moved
+        # may also be storing the next sample before advancing count.
+        count = self.count
+        overwritten = count - self.size - start
+        if count != end:
+            overwritten += 1
+        if overwritten > 0:
+            del times[:overwritten]
+            del values[:overwritten]
+        return times, values
@@ -1,16 +1,24 @@
-import pigpio
+from hal import pigpio_constants as pigpio
+from sensors.ring_buffer import SampleRingBuffer
+
+TICK_WRAP = 1 << 32     # pigpio ticks are unsigned 32 bit microseconds
 
 
 class RotaryEncoder:
     """Class to decode mechanical rotary encoder pulses."""
 
-    def __init__(self, pi, gpioA, gpioB):
+    def __init__(self, pi, gpioA, gpioB, history_size=1024):
 
         self.pi = pi
         self.gpioA = gpioA
         self.gpioB = gpioB
 
         self.encoder_value = 0
+
+        # (tick, position) of every count, written by the pigpio callback thread
+        self.history = SampleRingBuffer(history_size, time_type='L', value_type='l')
+        self.history_start = 0      # history count of the first count since the last reset
+        self.reset_count = 0        # number of position resets
         self.levA = 0
         self.levB = 0
 
@@ -53,20 +61,36 @@ class RotaryEncoder:
 
             if gpio == self.gpioA and level == 1:
                 if self.levB == 1:
-                    self.callback(1)
+                    self.callback(1, tick)
             elif gpio == self.gpioB and level == 1:
                 if self.levA == 1:
-                    self.callback(-1)
+                    self.callback(-1, tick)
 
     def cancel(self):
         self.cbA.cancel()
         self.cbB.cancel()
 
-    def callback(self, value):
+    def callback(self, value, tick=None):
         self.encoder_value += value
+        if tick is not None:
+            self.history.append(tick, self.encoder_value)
 
     def value(self):
         return self.encoder_value
 
     def reset_position(self):
+        """
+        zero the position. The counts before the reset are left out of
+        the history readers use, they are on the old zero.
+        """
         self.encoder_value = 0
+        self.history_start = self.history.count
+        self.reset_count += 1
+
+    def position_history(self, n):
+        """
+        @param n: the number of counts wanted
+        @return: arrays of the ticks (us) and positions of up to the
+                 n latest counts since the last reset, oldest first
+        """
+        return self.history.last(min(n, self.history.count - self.history_start))
@@ -0,0 +1,174 @@
+#
+# Sensor service class for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import logging
+import threading
+import numpy as np
+from configs.sensor_configs import WAVEFORM_SAMPLE_RATE, WAVEFORM_HISTORY_SIZE
+from configs.ventilation_configs import ENCODER_ONE_ROTATION, TV_PULLEY_CONVERT_FACTOR
+from configs.motor_configs import VELOCITY_WINDOW, VELOCITY_TRACKER_ALPHA, VELOCITY_TRACKER_BETA
+from hal.clock import SystemClock
+from sensors.ring_buffer import SampleRingBuffer
+from sensors.velocity_estimator import VelocityEstimator
+
+# encoder counts the arm moves per mL pushed out of the bag
+ENCODER_COUNTS_PER_ML = ENCODER_ONE_ROTATION * TV_PULLEY_CONVERT_FACTOR
+
+
+class SensorService:
+    """
+    The one owner of the sensor I2C bus. The pressure sensor streams
+    from its own reader (a thread, or the pigpio callback on ALERT/RDY)
+    into a ring buffer, and consumers such as the GUI and the
+    controller only read that buffer, they never touch the bus.
+
+    With an encoder, a sampler thread also records the flow and
+    volume pushed out of the bag. Every waveform is timestamped
+    with the monotonic_ns() of the clock, so they share one timebase
+    with the controller. On a simulated clock the sampler runs from
+    a clock listener instead, every sample period of simulated time.
+    """
+
+    WAVEFORMS = ('pressure', 'flow', 'volume')
+
+    def __init__(self, pressure_sensor, encoder=None, volume_zero=None,
+                 sample_rate=WAVEFORM_SAMPLE_RATE, history_size=WAVEFORM_HISTORY_SIZE,
+                 breath_analyzer=None, clock=None):
+        """
+        @param pressure_sensor: the PressureSensor, owned by the service
+        @param encoder: the RotaryEncoder of the arm, None for pressure only
+        @param volume_zero: function returning the encoder position where
+                            the bag is full (zero volume delivered)
+        @param sample_rate: the flow and volume sample rate (samples/s)
+        @param history_size: the number of flow and volume samples kept
+        @param breath_analyzer: BreathAnalyzer fed each volume sample and the
+                                pressures streamed since the previous one
+        @param clock: the clock of the sample times, defaults to the system clock
+        """
+        self.logger = logging.getLogger('sensor_service')
+        self.pressure_sensor = pressure_sensor
+        self.encoder = encoder
+        self.velocity_estimator = None
+        if encoder is not None:
+            self.velocity_estimator = VelocityEstimator(encoder, window=VELOCITY_WINDOW,
+                                                        alpha=VELOCITY_TRACKER_ALPHA,
+                                                        beta=VELOCITY_TRACKER_BETA)
+        self.volume_zero = volume_zero if volume_zero is not None else lambda: 0
+        self.sample_rate = sample_rate
+        self.clock = clock if clock is not None else SystemClock()
+
+        # flow (L/min) and volume (mL), written by the sampler thread only
+        self.flow = SampleRingBuffer(history_size, time_type='q', value_type='d')
+        self.volume = SampleRingBuffer(history_size, time_type='q', value_type='d')
+
+        self.breath_analyzer = breath_analyzer
+        self._pressure_cursor = 0
+
+        self._running = False
+        self._thread = None
+        self._elapsed_ns = 0        # simulated time since the last sample
+
+    def start(self):
+        self.pressure_sensor.start_streaming()
+        if self.encoder is not None and not self._running:
+            self._running = True
+            if hasattr(self.clock, 'add_listener'):
+                self._elapsed_ns = 0
+                self.clock.add_listener(self._step)
+            else:
+                self._thread = threading.Thread(target=self._run, name="sensor_service", daemon=True)
+                self._thread.start()
+        self.logger.info("Sensor service started")
+
+    def stop(self):
+        if self._running and self._thread is None:
+            self.clock.remove_listener(self._step)
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.pressure_sensor.stop_streaming()
+        self.logger.info("Sensor service stopped")
+
+    @property
+    def running(self):
+        return self.pressure_sensor.stream is not None
+
+    def latest_pressure(self):
+        """
+        @return: the (monotonic time (ns), pressure (cmH2O)) of the
+                 newest sample, or None before the first one
+        """
+        if self.pressure_sensor.stream is None:
+            return None
+        sample = self.pressure_sensor.stream.latest()
+        if sample is None:
+            return None
+        return sample[0], self.pressure_sensor.calibration.convert(sample[1])
+
+    def pressure_since(self, cursor):
+        """
+        @param cursor: the cursor returned by the previous call, 0 at first
+        @return: (times (ns), pressures (cmH2O), cursor) of the samples
+                 taken since the previous call
+        """
+        return self.pressure_sensor.get_pressure_since(cursor)
+
+    def waveform_since(self, name, cursor):
+        """
+        @param name: one of WAVEFORMS
+        @param cursor: the cursor returned by the previous call, 0 at first
+        @return: (times (ns), values, cursor) of the samples taken since
+                 the previous call
+        """
+        if name == 'pressure':
+            return self.pressure_since(cursor)
+        buffer = self.flow if name == 'flow' else self.volume
+        times, values, cursor = buffer.since(cursor)
+        return np.asarray(times), np.asarray(values), cursor
+
+    def sample_motion(self, now=None):
+        """
+        record one flow and volume sample from the encoder
+        @param now: the monotonic time (ns) of the sample
+        """
+        if now is None:
+            now = self.clock.monotonic_ns()
+        position = self.encoder.value()
+        # the arm moves to lower counts as it squeezes the bag
+        volume = max(self.volume_zero() - position, 0) / ENCODER_COUNTS_PER_ML
+        velocity = self.velocity_estimator.update(now / 1e9)
+        flow = -velocity / ENCODER_COUNTS_PER_ML * 60 / 1000
+        self.volume.append(now, volume)
+        self.flow.append(now, flow)
+
+        if self.breath_analyzer is not None:
+            times, pressures, self._pressure_cursor = self.pressure_since(self._pressure_cursor)
+            self.breath_analyzer.update((now,), (volume,), times, pressures)
+
+    def _step(self, dt):
+        """
+        simulated clock listener, samples every period of simulated time
+        @param dt: the time the clock moved (in seconds)
+        """
+        period = 1000000000 // self.sample_rate
+        self._elapsed_ns += int(round(dt * 1e9))
+        if self._elapsed_ns >= period:
+            self._elapsed_ns %= period
+            self.sample_motion()
+
+    def _run(self):
+        period = 1000000000 // self.sample_rate
+        deadline = self.clock.monotonic_ns()
+        while self._running:
+            now = self.clock.monotonic_ns()
+            if now < deadline:
+                self.clock.sleep((deadline - now) / 1e9)
+            else:
+                deadline = now      # late, start the schedule again from now
+            self.sample_motion()
+            deadline += period
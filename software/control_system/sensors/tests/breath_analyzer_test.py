@@ -0,0 +1,129 @@
+#
+# BreathAnalyzer test, on generated waveforms and on the simulated ventilator
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import random
+import numpy as np
+from sensors.breath_analyzer import BreathAnalyzer, RollingStats, NS_PER_SEC
+
+
+class CountingSender:
+    """
+    stand-in for UpdateMeasuredParametersSender, counts the emits
+    """
+
+    def __init__(self):
+        self.update_measured_parameters_signal = self
+        self.count = 0
+
+    def emit(self):
+        self.count += 1
+
+
+def breath_volume(t, volume=400.0, period=3.0, rise=0.9, hold=0.1, fall=0.8):
+    """
+    @return: the delivered volume (mL) at time t (s) of a breath, ramped
+             in, held, ramped out and resting until the next breath
+    """
+    t = t % period
+    if t < rise:
+        return volume * t / rise
+    if t < rise + hold:
+        return volume
+    if t < rise + hold + fall:
+        return volume * (1 - (t - rise - hold) / fall)
+    return 0.0
+
+
+def test_rolling_stats():
+    stats = RollingStats(8)
+    assert stats.mean is None and stats.variance is None
+    values = [random.uniform(300, 500) for _ in range(50)]
+    for i, value in enumerate(values):
+        stats.add(value)
+        window = values[max(i - 7, 0):i + 1]
+        assert abs(stats.mean - np.mean(window)) < 1e-9
+        assert abs(stats.variance - np.var(window)) < 1e-6
+    assert stats.latest == values[-1]
+
+
+def test_generated(seconds=30.0, peep=5.0, compliance=25.0):
+    sender = CountingSender()
+    analyzer = BreathAnalyzer(sender=sender, window=4, publish_period=5.0)
+    volume_times = np.arange(0, seconds, 0.01)
+    pressure_times = np.arange(0, seconds, 1 / 860)
+    volumes = [breath_volume(t) for t in volume_times]
+    pressures = [peep + breath_volume(t) / compliance for t in pressure_times]
+
+    # in blocks, as the sensor service reads them
+    for start in range(0, seconds_to_ns(seconds), NS_PER_SEC // 10):
+        v = (volume_times * NS_PER_SEC >= start) & (volume_times * NS_PER_SEC < start + NS_PER_SEC // 10)
+        p = (pressure_times * NS_PER_SEC >= start) & (pressure_times * NS_PER_SEC < start + NS_PER_SEC // 10)
+        analyzer.update((volume_times[v] * NS_PER_SEC).astype(np.int64), np.asarray(volumes)[v],
+                        (pressure_times[p] * NS_PER_SEC).astype(np.int64), np.asarray(pressures)[p])
+
+    measured = analyzer.snapshot()
+    print("generated: {}".format({k: round(v, 2) for k, v in measured.items()}))
+    assert analyzer.breath_count == int(seconds / 3) - 1, analyzer.breath_count
+    assert abs(measured['volume'] - 400) < 1, measured
+    assert abs(measured['bpm'] - 20) < 0.1, measured
+    assert abs(measured['ie'] - 2.0) < 0.05, measured        # 1 s insp with its hold, 2 s exp
+    assert abs(measured['pip'] - (peep + 400 / compliance)) < 0.1, measured
+    assert abs(measured['peep'] - peep) < 0.1, measured
+    assert analyzer.stats['bpm'].std < 0.1
+
+    # throttled to one emit per 5 s, the breaths end every 3 s
+    assert sender.count == analyzer.publish_count
+    assert 4 <= sender.count <= 6, sender.count
+
+
+def seconds_to_ns(seconds):
+    return int(seconds * NS_PER_SEC)
+
+
+def test_sim(seconds=15.0, volume=400, bpm=20):
+    from hal.sim import SimBackend
+    from hal.tests.sim_ventilator_test import build, home
+    from hal.plant import COUNTS_PER_ML
+    from configs.ventilation_configs import CONTROL_LOOP_PERIOD
+
+    hal = SimBackend(realtime=False)
+    controller = build(hal)
+    analyzer = BreathAnalyzer(window=3, publish_period=0)
+    home(controller)
+    controller.update_bpm(bpm)
+    controller.update_tidal_volume(volume)
+
+    # sample the arm and lung every 10 ms of simulated time, as the sensor service does
+    next_sample = [hal.clock.monotonic_ns()]
+    def sample(dt):
+        now = hal.clock.monotonic_ns()
+        if now >= next_sample[0]:
+            next_sample[0] += 10000000
+            delivered = max(controller.bag_contact_position() - controller.motor.encoder_position(), 0)
+            analyzer.update((now,), (delivered / COUNTS_PER_ML,), (now,), (hal.plant.pressure(),))
+    hal.clock.add_listener(sample)
+
+    controller.set_state(controller.START_STATE)
+    controller.run_fixed_rate(CONTROL_LOOP_PERIOD, duration=seconds)
+    controller.pressure_sensor.stop_streaming()
+
+    measured = analyzer.snapshot()
+    print("simulated: {}".format({k: round(v, 2) for k, v in measured.items()}))
+    assert analyzer.breath_count >= 3, analyzer.breath_count
+    assert abs(measured['bpm'] - bpm) < 0.5, measured
+    assert measured['volume'] > 0.5 * volume, measured
+    assert measured['pip'] > measured['peep'], measured
+
+
+if __name__ == "__main__":
+    test_rolling_stats()
+    test_generated()
+    test_sim()
+    print("breath analyzer tests passed")
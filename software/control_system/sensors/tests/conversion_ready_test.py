@@ -0,0 +1,112 @@
+#
+# ADS1115 conversion ready test, drives the ALERT/RDY pin from a simulated adc
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+import threading
+from time import perf_counter
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from fake_pi import FakePi
+from fake_ads1115 import FakeI2CDevice
+from sensors.ads_1x15 import ADS1115, ADS1x15_READY_TIMEOUT, ADS1x15_POINTER_CONFIG
+from sensors.pressure_stream import PressureStream
+
+ALERT_PIN = 27
+PERIOD = 1000000 // 860     # (us)
+
+
+def make_stream(history_size=64):
+    pi = FakePi()
+    device = FakeI2CDevice(pi, ALERT_PIN)
+    adc = ADS1115(i2c=device)
+    stream = PressureStream(adc, data_rate=860, history_size=history_size,
+                            pi=pi, alert_pin=ALERT_PIN)
+    return pi, device, stream
+
+
+def test_reads_on_ready_edge():
+    pi, device, stream = make_stream()
+    stream.start()
+    assert device.conversion_ready
+    assert device.reads == 0 and stream.latest() is None
+
+    for i in range(10):
+        device.convert(i - 5, tick=(i + 1) * PERIOD)
+    assert device.reads == 10, device.reads
+    assert list(stream.buffer.last(10)[1]) == list(range(-5, 5))
+    assert stream.latest()[1] == 4
+    assert stream.overruns == 0
+
+    stream.stop()
+    assert not device.conversion_ready
+    device.convert(100, tick=20 * PERIOD)
+    assert device.reads == 10 and stream.latest()[1] == 4
+
+
+def test_missed_edges():
+    pi, device, stream = make_stream()
+    stream.start()
+    device.convert(1, tick=PERIOD)
+    device.convert(2, tick=4 * PERIOD)      # two conversions never seen
+    assert stream.overruns == 2, stream.overruns
+    stream.stop()
+
+
+def test_single_shot_on_ready_edge():
+    pi = FakePi()
+    device = FakeI2CDevice(pi, ALERT_PIN, single_shot_value=-123)
+    adc = ADS1115(i2c=device, pi=pi, alert_pin=ALERT_PIN)
+    # the result is read on the edge, long before the 8 samples/s conversion period
+    t = perf_counter()
+    assert adc.read_adc_difference(0, data_rate=8) == -123
+    assert perf_counter() - t < 1.0 / 8 / 2
+    assert device.conversion_ready and adc.ready_timeouts == 0
+    assert not pi.callbacks
+
+
+def test_single_shot_timeout():
+    pi = FakePi()
+    device = FakeI2CDevice(pi, ALERT_PIN)       # never converts, no edge
+    adc = ADS1115(i2c=device, pi=pi, alert_pin=ALERT_PIN)
+    t = perf_counter()
+    assert adc.read_adc_difference(0, data_rate=860) == 0
+    assert perf_counter() - t >= 1.0 / 860 + ADS1x15_READY_TIMEOUT
+    assert adc.ready_timeouts == 1
+    assert not pi.callbacks
+
+
+def test_comparator_start_on_ready_edge():
+    pi = FakePi()
+    device = FakeI2CDevice(pi, ALERT_PIN)
+    adc = ADS1115(i2c=device, pi=pi, alert_pin=ALERT_PIN)
+    # the first continuous conversion finishes while the start waits on the edge
+    write = device.writeList
+    timers = []
+
+    def write_config(register, data):
+        write(register, data)
+        if register == ADS1x15_POINTER_CONFIG and not timers:
+            timers.append(threading.Timer(0.001, device.convert, (42, PERIOD)))
+            timers[0].start()
+    device.writeList = write_config
+    assert adc.start_adc_difference_comparator(0, 1000, 500, data_rate=8) == 42
+    timers[0].join()
+    assert adc.ready_timeouts == 0
+    # then ALERT/RDY belongs to the comparator
+    assert device.comparator_enabled and not device.conversion_ready
+    device.convert(2000, tick=2 * PERIOD)
+    assert device.alert
+
+
+if __name__ == "__main__":
+    test_reads_on_ready_edge()
+    test_missed_edges()
+    test_single_shot_on_ready_edge()
+    test_single_shot_timeout()
+    test_comparator_start_on_ready_edge()
+    print("conversion ready tests passed")
@@ -0,0 +1,87 @@
+#
+# Simulated ADS1115 I2C device for running adc code without a Raspberry Pi
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+from hal import pigpio_constants as pigpio
+from sensors.ads_1x15 import ADS1x15_POINTER_CONVERSION, ADS1x15_POINTER_CONFIG, \
+    ADS1x15_POINTER_LOW_THRESHOLD, ADS1x15_POINTER_HIGH_THRESHOLD, ADS1x15_CONFIG_COMP_QUE_DISABLE, \
+    ADS1x15_CONFIG_OS_SINGLE, ADS1x15_CONFIG_MODE_SINGLE
+
+
+class FakeI2CDevice:
+    """
+    Register level stand-in for an ADS1115 on the I2C bus. Conversions
+    are made by calling convert(); with the comparator set up for
+    conversion ready and a FakePi attached, each conversion pulses the
+    ALERT/RDY gpio low. Otherwise an enabled comparator drives the pin
+    as a traditional, active low, non-latching comparator. A single
+    shot conversion finishes with single_shot_value as soon as it is
+    started, unless that is None.
+    """
+
+    def __init__(self, pi=None, alert_pin=None, single_shot_value=None):
+        self.pi = pi
+        self.alert_pin = alert_pin
+        self.single_shot_value = single_shot_value
+        self.registers = {
+            ADS1x15_POINTER_CONVERSION: 0x0000,
+            ADS1x15_POINTER_CONFIG: 0x8583,
+            ADS1x15_POINTER_LOW_THRESHOLD: 0x8000,
+            ADS1x15_POINTER_HIGH_THRESHOLD: 0x7FFF
+        }
+        self.reads = 0      # conversion register reads
+        self.alert = False
+
+    def get_i2c_device(self, address, **kwargs):
+        return self
+
+    def writeList(self, register, data):
+        value = (data[0] << 8) | data[1]
+        self.registers[register] = value
+        if register == ADS1x15_POINTER_CONFIG and self.single_shot_value is not None and \
+                value & ADS1x15_CONFIG_MODE_SINGLE and value & ADS1x15_CONFIG_OS_SINGLE:
+            self.convert(self.single_shot_value, self.pi.tick if self.pi is not None else 0)
+
+    def readList(self, register, length):
+        if register == ADS1x15_POINTER_CONVERSION:
+            self.reads += 1
+        value = self.registers[register]
+        return bytearray([(value >> 8) & 0xFF, value & 0xFF])
+
+    @property
+    def conversion_ready(self):
+        return self.comparator_enabled and \
+            self.registers[ADS1x15_POINTER_HIGH_THRESHOLD] & 0x8000 and \
+            not self.registers[ADS1x15_POINTER_LOW_THRESHOLD] & 0x8000
+
+    @property
+    def comparator_enabled(self):
+        return (self.registers[ADS1x15_POINTER_CONFIG] & 0x0003) != ADS1x15_CONFIG_COMP_QUE_DISABLE
+
+    def _threshold(self, register):
+        value = self.registers[register]
+        return value - (1 << 16) if value & 0x8000 else value
+
+    def convert(self, value, tick):
+        """
+        finish a conversion
+        @param value: the signed 16 bit result
+        @param tick: the pigpio tick it finished at
+        """
+        self.registers[ADS1x15_POINTER_CONVERSION] = value & 0xFFFF
+        if self.pi is None or not self.comparator_enabled:
+            return
+        if self.conversion_ready:
+            self.pi.replay([(self.alert_pin, 0, tick), (self.alert_pin, 1, tick + 8)])
+            return
+        alert = self.alert
+        if value > self._threshold(ADS1x15_POINTER_HIGH_THRESHOLD):
+            alert = True
+        elif value < self._threshold(ADS1x15_POINTER_LOW_THRESHOLD):
+            alert = False
+        if alert != self.alert:
+            self.alert = alert
+            self.pi.replay([(self.alert_pin, 0 if alert else 1, tick)])
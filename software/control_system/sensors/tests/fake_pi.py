@@ -0,0 +1,90 @@
+#
+# pigpio stand-in for running sensor code without a Raspberry Pi
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+from hal import pigpio_constants as pigpio
+
+
+class FakeCallback:
+
+    def __init__(self, pi, gpio, edge, func):
+        self.pi = pi
+        self.gpio = gpio
+        self.edge = edge
+        self.func = func
+
+    def cancel(self):
+        if self in self.pi.callbacks:
+            self.pi.callbacks.remove(self)
+
+
+class FakePi:
+    """
+    Minimal pigpio.pi replacement that replays recorded
+    (gpio, level, tick) edges into the registered callbacks
+    on the calling thread.
+    """
+
+    def __init__(self):
+        self.callbacks = []
+        self.levels = {}
+        self.modes = {}
+        self.tick = 0
+
+    def set_mode(self, gpio, mode):
+        self.modes[gpio] = mode
+
+    def set_pull_up_down(self, gpio, pud):
+        pass
+
+    def read(self, gpio):
+        return self.levels.get(gpio, 0)
+
+    def get_current_tick(self):
+        return self.tick
+
+    def callback(self, gpio, edge=pigpio.RISING_EDGE, func=None):
+        cb = FakeCallback(self, gpio, edge, func)
+        self.callbacks.append(cb)
+        return cb
+
+    def replay(self, events):
+        """
+        @param events: iterable of (gpio, level, tick) edges
+        """
+        for gpio, level, tick in events:
+            self.tick = tick % (1 << 32)
+            self.levels[gpio] = level
+            for cb in list(self.callbacks):
+                if cb.gpio != gpio:
+                    continue
+                if cb.edge == pigpio.EITHER_EDGE or \
+                        (cb.edge == pigpio.RISING_EDGE and level == 1) or \
+                        (cb.edge == pigpio.FALLING_EDGE and level == 0):
+                    cb.func(gpio, level, self.tick)
+
+    def stop(self):
+        self.callbacks = []
+
+
+def quadrature_events(gpioA, gpioB, counts, period, start_tick=0):
+    """
+    edges of a quadrature encoder moving a number of counts at a
+    constant rate, in the order RotaryEncoder decodes them.
+    @param counts: the counts to move, negative to move backwards
+    @param period: the time of one count (in microseconds)
+    @param start_tick: the tick of the first edge
+    @return: a list of (gpio, level, tick) edges
+    """
+    first, second = (gpioB, gpioA) if counts >= 0 else (gpioA, gpioB)
+    quarter = period / 4
+    events = []
+    tick = start_tick
+    for _ in range(abs(counts)):
+        for gpio, level in ((first, 1), (second, 1), (first, 0), (second, 0)):
+            tick += quarter
+            events.append((gpio, level, int(tick)))
+    return events
@@ -0,0 +1,124 @@
+#
+# Overpressure trip test, drives the adc comparator of a simulated ADS1115
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from fake_pi import FakePi
+from fake_ads1115 import FakeI2CDevice
+from sensors.ads_1x15 import ADS1115
+from sensors.overpressure_trip import OverpressureTrip
+from sensors.pressure_calibration import CMH2O_PER_PSI, PressureCalibration
+from sensors.pressure_sensor import raw2data
+from sensors.pressure_stream import PressureStream
+
+ALERT_PIN = 27
+PERIOD = 1000000 // 860     # (us)
+
+
+def cmh2o(raw):
+    return raw2data(raw) * CMH2O_PER_PSI
+
+
+def test_thresholds():
+    trip = OverpressureTrip(FakePi(), ALERT_PIN, max_pressure=40.0, hysteresis=5.0)
+    high, low = trip.thresholds
+    assert abs(cmh2o(high) - 40.0) < 0.01, cmh2o(high)
+    assert abs(cmh2o(low) - 35.0) < 0.01, cmh2o(low)
+
+    # a tared sensor moves both thresholds with the offset
+    trip.calibrate(PressureCalibration(8291.5, 2 / 13107 * CMH2O_PER_PSI))
+    assert trip.thresholds == (high + 100, low + 100), trip.thresholds
+
+
+def test_trip_on_first_sample():
+    pi = FakePi()
+    device = FakeI2CDevice(pi, ALERT_PIN)
+    adc = ADS1115(i2c=device)
+    trip = OverpressureTrip(pi, ALERT_PIN, max_pressure=40.0, hysteresis=5.0)
+    statuses = []
+    trip.callback = statuses.append
+    high, low = trip.thresholds
+    adc.start_adc_difference_comparator(0, high, low, data_rate=860)
+    trip.start()
+
+    tick = PERIOD
+    for raw in (high - 200, high - 1, high):
+        device.convert(raw, tick)
+        tick += PERIOD
+    assert statuses == [] and not trip.tripped
+
+    # the first conversion over the limit trips, nothing is read or polled
+    reads = device.reads
+    device.convert(high + 1, tick)
+    assert statuses == [1] and trip.last_trip_tick == tick
+    assert device.reads == reads
+
+    # stays tripped inside the hysteresis band
+    device.convert(low + 1, tick + PERIOD)
+    assert statuses == [1] and trip.tripped
+    device.convert(low - 1, tick + 2 * PERIOD)
+    assert statuses == [1, 0] and not trip.tripped
+
+    trip.cancel()
+    device.convert(high + 100, tick + 3 * PERIOD)
+    assert statuses == [1, 0]
+
+
+def test_stream_with_comparator():
+    pi = FakePi()
+    device = FakeI2CDevice(pi, ALERT_PIN)
+    adc = ADS1115(i2c=device)
+    trip = OverpressureTrip(pi, ALERT_PIN)
+    try:
+        PressureStream(adc, pi=pi, alert_pin=ALERT_PIN, comparator=trip.thresholds)
+        assert False, "conversion ready and comparator must be exclusive"
+    except ValueError:
+        pass
+
+    stream = PressureStream(adc, comparator=trip.thresholds)
+    stream.start()
+    trip.start()
+    assert device.comparator_enabled and not device.conversion_ready
+    device.convert(trip.high_threshold + 1, PERIOD)
+    assert trip.tripped
+    stream.stop()
+    trip.cancel()
+
+
+def test_trip_on_ready_edge():
+    """
+    with ALERT/RDY clocking the samples the trip checks each one
+    """
+    pi = FakePi()
+    device = FakeI2CDevice(pi, ALERT_PIN)
+    adc = ADS1115(i2c=device)
+    trip = OverpressureTrip(pi, ALERT_PIN, max_pressure=40.0, hysteresis=5.0)
+    statuses = []
+    trip.callback = statuses.append
+    high, low = trip.thresholds
+    stream = PressureStream(adc, pi=pi, alert_pin=ALERT_PIN, on_sample=trip.check)
+    stream.start()
+    assert device.conversion_ready
+
+    tick = PERIOD
+    for raw in (high - 200, high, high + 1, low + 1, low - 1):
+        device.convert(raw, tick)
+        tick += PERIOD
+    assert statuses == [1, 0], statuses
+    assert trip.last_trip_tick == 3 * PERIOD
+    assert len(stream.buffer.last(10)[1]) == 5
+    stream.stop()
+
+
+if __name__ == "__main__":
+    test_thresholds()
+    test_trip_on_first_sample()
+    test_stream_with_comparator()
+    test_trip_on_ready_edge()
+    print("overpressure trip tests passed")
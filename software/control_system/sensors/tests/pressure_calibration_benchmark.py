@@ -0,0 +1,49 @@
+#
+# Benchmark of the pressure conversion, per sample raw2data against the
+# vectorized calibration, runs without the adc connected
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import timeit
+from array import array
+import numpy as np
+from sensors.pressure_sensor import raw2data
+from sensors.pressure_calibration import PressureCalibration, CMH2O_PER_PSI, load_calibration
+
+
+def per_sample(raw):
+    return [raw2data(value) * CMH2O_PER_PSI for value in raw]
+
+
+if __name__ == '__main__':
+    # ~4.8 s of samples at 860 samples/s, as the stream ring buffer holds them
+    rng = np.random.default_rng(0)
+    raw = array('l', rng.integers(1638, 14745, 4096).tolist())
+    block = np.asarray(raw)
+    calibration = load_calibration()
+    out = np.empty(len(raw))
+
+    # both paths must agree
+    assert np.allclose(per_sample(raw), calibration.convert(block))
+    assert abs(calibration.convert(raw[0]) - per_sample(raw[:1])[0]) < 1e-9
+
+    # tare on a block at a shifted zero
+    tared = PressureCalibration(calibration.offset, calibration.gain)
+    tared.tare(rng.normal(8200.0, 3.0, 256))
+    assert abs(tared.offset - 8200.0) < 1.0, tared.offset
+
+    runs = 200
+    tests = [
+        ("raw2data per sample", lambda: per_sample(raw)),
+        ("calibration, from array", lambda: calibration.convert(np.asarray(raw))),
+        ("calibration, into out", lambda: calibration.convert(block, out=out)),
+    ]
+    print("{} samples".format(len(raw)))
+    for name, test in tests:
+        t = min(timeit.repeat(test, number=runs, repeat=5)) / runs
+        print("{:<28} {:8.1f} us".format(name, t * 1e6))
@@ -0,0 +1,82 @@
+#
+# SampleRingBuffer test, reads with the writer a whole buffer ahead
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sensors.ring_buffer import SampleRingBuffer
+
+SIZE = 8
+
+
+class WritingArray:
+    """
+    an array whose first slice runs a write, like a writer thread
+    appending while the reader copies
+    """
+
+    def __init__(self, data, write):
+        self.data = data
+        self.write = write
+
+    def __getitem__(self, index):
+        write, self.write = self.write, None
+        if write is not None:
+            write()
+        return self.data[index]
+
+    def __setitem__(self, index, value):
+        self.data[index] = value
+
+
+def test_in_order():
+    buffer = SampleRingBuffer(SIZE)
+    cursor = 0
+    for n in range(3 * SIZE):
+        buffer.append(n, 10 * n)
+        if n % 3 == 2:
+            times, values, cursor = buffer.since(cursor)
+            assert list(times) == [n - 2, n - 1, n], (n, list(times))
+            assert list(values) == [10 * t for t in times]
+    assert buffer.latest() == (3 * SIZE - 1, 10 * (3 * SIZE - 1))
+    assert list(buffer.last(2)[0]) == [3 * SIZE - 2, 3 * SIZE - 1]
+
+
+def test_whole_buffer_behind():
+    buffer = SampleRingBuffer(SIZE)
+    for n in range(SIZE):
+        buffer.append(n, 10 * n)
+
+    # no writer: the whole buffer is read
+    times, values = buffer.last(SIZE)
+    assert list(times) == list(range(SIZE)), list(times)
+
+    # the writer appends sample SIZE over sample 0 while the reader copies,
+    # and may be storing sample SIZE + 1 over sample 1
+    def write():
+        buffer.append(SIZE, -1)
+        buffer.times[1] = buffer.values[1] = -2
+    buffer.times = WritingArray(buffer.times, write)
+    times, values, cursor = buffer.since(0)
+    assert list(times) == list(range(2, SIZE)), list(times)
+    assert -1 not in values and -2 not in values
+    assert cursor == SIZE
+
+
+def test_more_than_a_buffer_behind():
+    buffer = SampleRingBuffer(SIZE)
+    for n in range(3 * SIZE):
+        buffer.append(n, 10 * n)
+    times, values, cursor = buffer.since(0)
+    assert list(times) == list(range(2 * SIZE, 3 * SIZE)), list(times)
+
+
+if __name__ == '__main__':
+    test_in_order()
+    test_whole_buffer_behind()
+    test_more_than_a_buffer_behind()
+    print("passed")
@@ -0,0 +1,61 @@
+#
+# RotaryEncoder test, replays recorded edges through a fake pigpio
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from fake_pi import FakePi, quadrature_events
+from sensors.rotary_encoder import RotaryEncoder
+
+GPIO_A = 16
+GPIO_B = 18
+
+
+def test_position_and_history():
+    pi = FakePi()
+    encoder = RotaryEncoder(pi, GPIO_A, GPIO_B, history_size=64)
+    pi.replay(quadrature_events(GPIO_A, GPIO_B, 100, period=1000))
+    assert encoder.value() == 100, encoder.value()
+
+    ticks, positions = encoder.position_history(10)
+    assert list(positions) == list(range(91, 101)), positions
+    assert ticks[-1] - ticks[0] == 9 * 1000
+
+    pi.replay(quadrature_events(GPIO_A, GPIO_B, -30, period=1000, start_tick=pi.tick))
+    assert encoder.value() == 70, encoder.value()
+
+
+def test_reset_position():
+    pi = FakePi()
+    encoder = RotaryEncoder(pi, GPIO_A, GPIO_B, history_size=64)
+    pi.replay(quadrature_events(GPIO_A, GPIO_B, -200, period=1000))
+    encoder.reset_position()
+    assert encoder.value() == 0 and encoder.reset_count == 1
+    assert len(encoder.position_history(10)[0]) == 0
+
+    # only the counts on the new zero are in the history
+    pi.replay(quadrature_events(GPIO_A, GPIO_B, 5, period=1000, start_tick=pi.tick))
+    ticks, positions = encoder.position_history(10)
+    assert list(positions) == [1, 2, 3, 4, 5], positions
+
+
+def test_reader_never_sees_overwritten_samples():
+    pi = FakePi()
+    encoder = RotaryEncoder(pi, GPIO_A, GPIO_B, history_size=16)
+    cursor = 0
+    pi.replay(quadrature_events(GPIO_A, GPIO_B, 40, period=100))
+    ticks, positions, cursor = encoder.history.since(cursor)
+    assert list(positions) == list(range(25, 41)), positions
+    assert cursor == 40
+
+
+if __name__ == '__main__':
+    test_position_and_history()
+    test_reset_position()
+    test_reader_never_sees_overwritten_samples()
+    print("passed")
@@ -0,0 +1,42 @@
+#
+# SensorService waveform test, replays encoder edges through a fake pigpio
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from fake_pi import FakePi, quadrature_events
+from sensors.rotary_encoder import RotaryEncoder
+from sensors.sensor_service import SensorService, ENCODER_COUNTS_PER_ML
+
+GPIO_A = 16
+GPIO_B = 18
+
+
+def test_flow_and_volume():
+    pi = FakePi()
+    encoder = RotaryEncoder(pi, GPIO_A, GPIO_B)
+    service = SensorService(None, encoder, volume_zero=lambda: 100)
+    pi.replay(quadrature_events(GPIO_A, GPIO_B, 100, period=1000))
+
+    # squeeze 480 counts (500 mL) in 1.2 s
+    pi.replay(quadrature_events(GPIO_A, GPIO_B, -480, period=2500, start_tick=pi.tick))
+    service.sample_motion(now=1000)
+
+    times, volume, cursor = service.waveform_since('volume', 0)
+    assert list(times) == [1000]
+    assert abs(volume[0] - 480 / ENCODER_COUNTS_PER_ML) < 1e-9, volume
+    times, flow, _ = service.waveform_since('flow', 0)
+    assert abs(flow[0] - 25.0) < 0.1, flow          # 400 counts/s = 416.7 mL/s = 25 L/min
+
+    # nothing new since the cursor
+    assert len(service.waveform_since('volume', cursor)[0]) == 0
+
+
+if __name__ == "__main__":
+    test_flow_and_volume()
+    print("sensor service tests passed")
@@ -0,0 +1,83 @@
+#
+# VelocityEstimator test, replays recorded edges through a fake pigpio
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from fake_pi import FakePi, quadrature_events
+from sensors.rotary_encoder import RotaryEncoder
+from sensors.velocity_estimator import VelocityEstimator
+
+GPIO_A = 16
+GPIO_B = 18
+
+
+def run(estimator, pi, counts, period, t):
+    """replay counts one control tick (1 ms) at a time, return the estimates"""
+    estimates = []
+    events = quadrature_events(GPIO_A, GPIO_B, counts, period, start_tick=pi.tick)
+    while events:
+        t += 0.001
+        tick = int(t * 1e6)
+        due = [e for e in events if e[2] <= tick]
+        events = events[len(due):]
+        pi.replay(due)
+        estimates.append(estimator.update(now=t))
+    return estimates, t
+
+
+def test_constant_rate():
+    for alpha, beta in ((None, None), (0.5, 0.1)):
+        pi = FakePi()
+        estimator = VelocityEstimator(RotaryEncoder(pi, GPIO_A, GPIO_B), window=4, alpha=alpha, beta=beta)
+        estimates, t = run(estimator, pi, 400, period=2500, t=0.0)   # 400 counts/s
+        assert abs(estimates[-1] - 400) < 400 * 0.05, (alpha, estimates[-1])
+
+
+def test_decays_when_stopped():
+    pi = FakePi()
+    estimator = VelocityEstimator(RotaryEncoder(pi, GPIO_A, GPIO_B))
+    estimates, t = run(estimator, pi, -200, period=1000, t=0.0)
+    assert abs(estimates[-1] + 1000) < 50, estimates[-1]
+    assert estimator.update(now=t + 0.1) >= -10
+    assert estimator.update(now=t + 2.0) == 0.0
+
+
+def test_tick_wrap():
+    pi = FakePi()
+    estimator = VelocityEstimator(RotaryEncoder(pi, GPIO_A, GPIO_B), window=8)
+    # 500 counts/s, starting just before the tick counter wraps
+    pi.replay(quadrature_events(GPIO_A, GPIO_B, 50, period=2000, start_tick=(1 << 32) - 40000))
+    assert abs(estimator.update(now=1.0) - 500) < 1, estimator.velocity
+
+
+def test_reset_position():
+    """
+    the homing jump of the position is not a velocity
+    """
+    for alpha, beta in ((None, None), (0.5, 0.1)):
+        pi = FakePi()
+        encoder = RotaryEncoder(pi, GPIO_A, GPIO_B)
+        estimator = VelocityEstimator(encoder, window=4, alpha=alpha, beta=beta)
+        estimates, t = run(estimator, pi, 400, period=2500, t=0.0)
+        assert abs(estimates[-1] - 400) < 20, (alpha, estimates[-1])
+
+        # zeroed 10000 counts away from the last position, then moving on at 400 counts/s
+        encoder.encoder_value = 10000
+        encoder.reset_position()
+        estimates, t = run(estimator, pi, 40, period=2500, t=t)
+        assert max(abs(v) for v in estimates) < 500, (alpha, max(estimates, key=abs))
+        assert abs(estimates[-1] - 400) < 40, (alpha, estimates[-1])
+
+
+if __name__ == '__main__':
+    test_constant_rate()
+    test_decays_when_stopped()
+    test_tick_wrap()
+    test_reset_position()
+    print("passed")
@@ -0,0 +1,147 @@
+#
+# Encoder velocity estimator class for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import time
+from sensors.rotary_encoder import TICK_WRAP
+
+
+class AlphaBetaTracker:
+    """
+    Alpha-beta filter tracking position and velocity from
+    timestamped position measurements.
+    """
+
+    def __init__(self, alpha, beta):
+        """
+        @param alpha: the position correction gain (0, 1]
+        @param beta: the velocity correction gain (0, 2), beta <= alpha
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.position = None
+        self.velocity = 0.0
+        self._t = None
+
+    def update(self, position, t):
+        """
+        @param position: the measured position
+        @param t: the time of the measurement (in seconds)
+        @return: the tracked velocity
+        """
+        if self._t is None:
+            self.position = position
+            self._t = t
+            return self.velocity
+
+        dt = t - self._t
+        if dt <= 0:
+            return self.velocity
+
+        predicted = self.position + self.velocity * dt
+        residual = position - predicted
+        self.position = predicted + self.alpha * residual
+        self.velocity += self.beta * residual / dt
+        self._t = t
+        return self.velocity
+
+    def reset(self):
+        self.position = None
+        self.velocity = 0.0
+        self._t = None
+
+
+class VelocityEstimator:
+    """
+    Estimates the velocity of a RotaryEncoder from the pigpio ticks
+    of its counts instead of differencing quantized positions at the
+    control loop rate.
+
+    The estimate is the counts over the time spanned by the last
+    `window` edges, or the output of an alpha-beta tracker fed with
+    each edge. Once no edge has arrived for longer than the window
+    spanned, the arm cannot be moving faster than one count over the
+    time since the last edge, which brings the estimate to zero when
+    the arm stops. A reset of the encoder position restarts the
+    estimate from the counts after it.
+    """
+
+    def __init__(self, encoder, window=4, alpha=None, beta=None):
+        """
+        @param encoder: the RotaryEncoder to track
+        @param window: the number of counts the edge estimate spans
+        @param alpha: alpha-beta tracker position gain, None for no tracker
+        @param beta: alpha-beta tracker velocity gain
+        """
+        self.encoder = encoder
+        self.window = window
+        self.tracker = AlphaBetaTracker(alpha, beta) if alpha is not None else None
+        self.velocity = 0.0         # latest estimate (counts/s)
+
+        self._cursor = 0            # encoder history count at the last update
+        self._span = 0.0            # time (s) spanned by the last window of edges
+        self._last_edge_seen = 0.0  # monotonic time (s) the newest edge was first seen
+        self._last_tick = None      # tick of the last edge fed to the tracker
+        self._tracker_time = 0.0    # unwrapped time (s) of that edge
+        self._reset_count = encoder.reset_count
+
+    def update(self, now=None):
+        """
+        update the estimate, called once per control loop tick.
+        @param now: the monotonic time (in seconds), defaults to now
+        @return: the velocity (counts/s)
+        """
+        if now is None:
+            now = time.monotonic()
+        if self.encoder.reset_count != self._reset_count:
+            self.reset()
+        history = self.encoder.history
+
+        if history.count != self._cursor:
+            self._last_edge_seen = now
+            if self.tracker is not None:
+                ticks, positions, self._cursor = history.since(self._cursor)
+                for tick, position in zip(ticks, positions):
+                    if self._last_tick is not None:
+                        self._tracker_time += ((tick - self._last_tick) % TICK_WRAP) / 1e6
+                    self._last_tick = tick
+                    self.tracker.update(position, self._tracker_time)
+            else:
+                self._cursor = history.count
+
+            ticks, positions = self.encoder.position_history(self.window + 1)
+            if len(ticks) < 2:
+                return self.velocity
+            dt = (ticks[-1] - ticks[0]) % TICK_WRAP
+            if dt == 0:
+                return self.velocity
+            self._span = dt / 1e6
+
+            if self.tracker is not None:
+                self.velocity = self.tracker.velocity
+            else:
+                self.velocity = (positions[-1] - positions[0]) / self._span
+
+        # no edge for longer than the window spanned: bound by one count
+        idle = now - self._last_edge_seen
+        if idle > self._span and self.velocity != 0.0:
+            bound = 1.0 / idle
+            if abs(self.velocity) > bound:
+                self.velocity = bound if self.velocity > 0 else -bound
+            if bound < 1.0:
+                self.velocity = 0.0
+
+        return self.velocity
+
+    def reset(self):
+        self.velocity = 0.0
+        self._reset_count = self.encoder.reset_count
+        self._cursor = self.encoder.history_start
+        self._span = 0.0
+        self._last_tick = None
+        self._tracker_time = 0.0
+        if self.tracker is not None:
+            self.tracker.reset()
@@ -10,6 +10,7 @@ git clone https://github.com/VentCU/bbwtb.git
 sudo apt-get update
 sudo pip3 install --upgrade pip
 sudo pip3 install Adafruit-Blinka
+sudo pip3 install Adafruit-GPIO
 sudo apt install realvnc-vnc-server realvnc-vnc-viewer                  
 sudo pip3 install adafruit-circuitpython-ads1x15        
 sudo pip3 install adafruit-circuitpython-busdevice      
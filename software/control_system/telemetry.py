@@ -0,0 +1,205 @@
+#
+# binary telemetry recorder for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+# A trace file is a header followed by a ring of fixed size records:
+#
+#   header (TRACE_HEADER_SIZE bytes)
+#     magic, version, record size, records in the file, records written,
+#     pressure calibration (offset, gain), json list of the state names
+#   records (RECORD, TRACE_RECORD_SIZE bytes each)
+#     time (ns), state, encoder, tic position, commanded velocity, raw pressure
+#
+# Once more records have been written than the file holds the oldest are
+# overwritten; read_telemetry returns the records in order either way.
+#
+
+import json
+import mmap
+import struct
+import threading
+import numpy as np
+from configs.telemetry_configs import *
+
+TRACE_MAGIC = b'VCUTRACE'
+TRACE_VERSION = 1
+TRACE_HEADER_SIZE = 1024
+
+HEADER = struct.Struct('<8sHHIQdd')
+HEADER_COUNT_OFFSET = 16            # offset of the records written in the header
+COUNT = struct.Struct('<Q')
+RECORD = struct.Struct('<q5i4x')
+TRACE_RECORD_SIZE = RECORD.size
+
+# numpy view of RECORD
+RECORD_DTYPE = np.dtype([('time', '<i8'), ('state', '<i4'), ('encoder', '<i4'),
+                         ('tic_position', '<i4'), ('velocity', '<i4'), ('pressure_raw', '<i4'),
+                         ('pad', 'V4')])
+
+
+class TelemetryRecorder:
+    """
+    Records one fixed size binary record per control loop tick into a
+    preallocated ring in memory, written by the control thread only
+    with struct.pack_into. A flusher thread copies the new records to
+    the memory mapped trace file every flush period, so a tick costs
+    a pack instead of string formatting and file I/O.
+
+    The ring must hold the records of a few flush periods: if the
+    flusher falls more than `capacity` records behind, the oldest
+    records are dropped and counted in `dropped`.
+    """
+
+    def __init__(self, path, capacity=TELEMETRY_BUFFER_RECORDS,
+                 file_records=TELEMETRY_FILE_RECORDS,
+                 flush_period=TELEMETRY_FLUSH_PERIOD,
+                 state_names=(), pressure_calibration=None):
+        """
+        @param path: the trace file, created or truncated
+        @param capacity: the records kept in memory
+        @param file_records: the records kept in the file
+        @param flush_period: the time between flushes (in seconds)
+        @param state_names: the names of the state numbers, written at start
+        @param pressure_calibration: PressureCalibration of the raw pressures
+        """
+        self.path = path
+        self.capacity = capacity
+        self.file_records = file_records
+        self.flush_period = flush_period
+        self.state_names = list(state_names)
+        self.pressure_calibration = pressure_calibration
+
+        self.buffer = bytearray(capacity * TRACE_RECORD_SIZE)
+        self.count = 0          # records written, by the control thread
+        self.flushed = 0        # records copied to the file, by the flusher
+        self.dropped = 0        # records overwritten before they were flushed
+
+        self._file = None
+        self._map = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+
+    def start(self):
+        """
+        create the trace file and start the flusher thread
+        """
+        if self._thread is not None:
+            return
+        self._file = open(self.path, 'w+b')
+        self._file.truncate(TRACE_HEADER_SIZE + self.file_records * TRACE_RECORD_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._write_header()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        flush the remaining records and close the trace file
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+        self._map = None
+        self._file = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def record(self, t_ns, state, encoder, tic_position, velocity, pressure_raw):
+        """
+        store one record, called from the control thread only.
+        @param t_ns: the monotonic time (in nanoseconds)
+        @param state: the number of the state, an index in state_names
+        @param encoder: the encoder position (counts)
+        @param tic_position: the tic position (microsteps)
+        @param velocity: the commanded velocity (microsteps/10000s)
+        @param pressure_raw: the latest raw pressure (adc counts)
+        """
+        count = self.count
+        RECORD.pack_into(self.buffer, (count % self.capacity) * TRACE_RECORD_SIZE,
+                         t_ns, state, encoder, tic_position, velocity, pressure_raw)
+        self.count = count + 1
+
+    def flush(self):
+        """
+        copy the records written since the last flush to the file
+        """
+        with self._flush_lock:
+            if self._map is None:
+                return
+            count = self.count
+            start = self.flushed
+            if count - start > self.capacity:
+                self.dropped += count - self.capacity - start
+                start = count - self.capacity
+
+            view = memoryview(self.buffer)
+            i = start
+            while i < count:
+                src = i % self.capacity
+                dst = i % self.file_records
+                n = min(count - i, self.capacity - src, self.file_records - dst)
+                offset = TRACE_HEADER_SIZE + dst * TRACE_RECORD_SIZE
+                self._map[offset:offset + n * TRACE_RECORD_SIZE] = \
+                    view[src * TRACE_RECORD_SIZE:(src + n) * TRACE_RECORD_SIZE]
+                i += n
+
+            self.flushed = count
+            COUNT.pack_into(self._map, HEADER_COUNT_OFFSET, count)
+
+    def _write_header(self):
+        offset, gain = (0.0, 1.0)
+        if self.pressure_calibration is not None:
+            offset, gain = self.pressure_calibration.offset, self.pressure_calibration.gain
+        HEADER.pack_into(self._map, 0, TRACE_MAGIC, TRACE_VERSION, TRACE_RECORD_SIZE,
+                         self.file_records, 0, offset, gain)
+        names = json.dumps(self.state_names).encode()
+        start = HEADER.size + 4
+        if start + len(names) > TRACE_HEADER_SIZE:
+            raise ValueError("Too many state names for the trace header")
+        struct.pack_into('<I', self._map, HEADER.size, len(names))
+        self._map[start:start + len(names)] = names
+
+    def _run(self):
+        while not self._stop.wait(self.flush_period):
+            self.flush()
+
+
+def read_telemetry(path):
+    """
+    @param path: a trace file
+    @return: (records, info): a numpy structured array of RECORD_DTYPE in
+             the order recorded, and a dict of the header with the
+             state_names and the pressure calibration offset and gain
+    """
+    with open(path, 'rb') as f:
+        header = f.read(TRACE_HEADER_SIZE)
+        magic, version, size, file_records, count, offset, gain = HEADER.unpack_from(header)
+        if magic != TRACE_MAGIC or size != TRACE_RECORD_SIZE:
+            raise ValueError("Not a version {} trace file: {}".format(TRACE_VERSION, path))
+        length, = struct.unpack_from('<I', header, HEADER.size)
+        names = json.loads(header[HEADER.size + 4:HEADER.size + 4 + length].decode())
+        records = np.fromfile(f, dtype=RECORD_DTYPE, count=min(count, file_records))
+
+    if count > file_records:
+        records = np.roll(records, -(count % file_records))
+    info = {
+        'version': version,
+        'count': count,
+        'state_names': names,
+        'pressure_offset': offset,
+        'pressure_gain': gain,
+    }
+    return records, info
@@ -0,0 +1,142 @@
+#
+# closed loop pid simulator for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from hal.sim import SimBackend
+from hal.clock import SimClock
+from hal.plant import VentilatorPlant, ArmModel
+from actuators.motor import Motor
+from sensors.rotary_encoder import RotaryEncoder
+from configs.gpio_map import ENCODER_A_PLUS_PIN, ENCODER_B_PLUS_PIN
+from configs.hal_configs import SIM_PLANT_DT, SIM_CONTACT_POSITION
+from configs.motor_configs import PID_P_GAIN, PID_I_GAIN, PID_D_GAIN, PID_TIME_SCALE_FACTOR
+from configs.ventilation_configs import CONTROL_LOOP_PERIOD
+
+# columns of the result tables
+RESULT_COLUMNS = ('P', 'I', 'D', 'scale_factor', 'dist', 'dur',
+                  'rise_time', 'overshoot', 'time_to_target', 'ttt_error', 'final_error')
+
+
+def simulate_move(P=PID_P_GAIN, I=PID_I_GAIN, D=PID_D_GAIN,
+                  scale_factor=PID_TIME_SCALE_FACTOR, dist=250, dur=1.0,
+                  dt=CONTROL_LOOP_PERIOD, plant_dt=SIM_PLANT_DT, settle=0.25, timeout=None):
+    """
+    run one move of the Motor's pid loop on the simulated plant, the
+    way the controller moves: from the bag contact position dist
+    counts into the bag, with the velocity constant of
+    move_to_encoder_pose_with_dur for the given time scale factor.
+    @param P, I, D: the pid gains
+    @param scale_factor: the pid time scale factor
+    @param dist: the distance to move (in counts), negative to move out of the bag
+    @param dur: the duration the move should take (in seconds)
+    @param dt: the control loop period (in seconds)
+    @param plant_dt: the plant integration step (in seconds)
+    @param settle: how long to keep the loop running once on target (in seconds)
+    @param timeout: the longest simulated move (in seconds), defaults to 4 * dur + 1
+    @return: a dict of the RESULT_COLUMNS, times in seconds and distances in
+             counts, time_to_target is None if the target was never reached
+    """
+    if timeout is None:
+        timeout = 4 * dur + 1
+
+    hal = SimBackend(plant=VentilatorPlant(arm=ArmModel(position=SIM_CONTACT_POSITION)),
+                     clock=SimClock(step=plant_dt))
+    encoder = RotaryEncoder(hal.pi, ENCODER_B_PLUS_PIN, ENCODER_A_PLUS_PIN)
+    motor = Motor(encoder, tic_device=hal.tic_device(), async_io=False, clock=hal.clock)
+    motor.pid.setKp(P)
+    motor.pid.setKi(I)
+    motor.pid.setKd(D)
+
+    # same bounds as move_to_encoder_pose_with_dur
+    vel_const = min(max(scale_factor * abs(dist) / dur, 0.01), 10)
+    target = -dist
+    direction = 1 if target > 0 else -1
+
+    t_start = hal.clock.monotonic()
+    t_rise_start = t_rise_end = t_target = None
+    peak = 0
+    t = 0.0
+    while t < timeout:
+        result, _ = motor.move_to_encoder_pose(target, vel_const=vel_const)
+        t = hal.clock.monotonic() - t_start
+
+        travelled = encoder.value() * direction
+        peak = max(peak, travelled)
+        if t_rise_start is None and travelled >= 0.1 * abs(dist):
+            t_rise_start = t
+        if t_rise_end is None and travelled >= 0.9 * abs(dist):
+            t_rise_end = t
+        if t_target is None and result:
+            t_target = t
+        if t_target is not None and t - t_target >= settle:
+            break
+
+        hal.clock.sleep(dt)
+
+    motor.stop()
+    return {
+        'P': P, 'I': I, 'D': D, 'scale_factor': scale_factor, 'dist': dist, 'dur': dur,
+        'rise_time': None if t_rise_end is None else t_rise_end - t_rise_start,
+        'overshoot': max(peak - abs(dist), 0),
+        'time_to_target': t_target,
+        'ttt_error': None if t_target is None else t_target - dur,
+        'final_error': target - encoder.value(),
+    }
+
+
+def _simulate_move(kwargs):
+    return simulate_move(**kwargs)
+
+
+def sweep(P=(PID_P_GAIN,), I=(PID_I_GAIN,), D=(PID_D_GAIN,),
+          scale_factor=(PID_TIME_SCALE_FACTOR,), dist=(250,), dur=(1.0,),
+          processes=None, **kwargs):
+    """
+    simulate every combination of the parameters, in parallel across
+    a process pool.
+    @param P, I, D, scale_factor, dist, dur: sequences of the simulate_move parameters
+    @param processes: the number of worker processes, None for one per core, 0 to run serially
+    @param kwargs: passed to every simulate_move
+    @return: the results of simulate_move, in the order of the combinations
+    """
+    runs = [dict(kwargs, P=p, I=i, D=d, scale_factor=s, dist=x, dur=t)
+            for p, i, d, s, x, t in itertools.product(P, I, D, scale_factor, dist, dur)]
+    return run_all(runs, processes)
+
+
+def run_all(runs, processes=None):
+    """
+    @param runs: dicts of simulate_move parameters
+    @param processes: the number of worker processes, None for one per core, 0 to run serially
+    @return: the results of simulate_move, in the order of the runs
+    """
+    if processes == 0:
+        return [_simulate_move(run) for run in runs]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(_simulate_move, runs, chunksize=max(len(runs) // 64, 1)))
+
+
+def format_table(results, columns=RESULT_COLUMNS):
+    """
+    @param results: the dicts returned by simulate_move
+    @param columns: the columns to show
+    @return: the results as a fixed width text table
+    """
+    def cell(value):
+        if value is None:
+            return "-"
+        if isinstance(value, float):
+            return "{:.6g}".format(value)
+        return str(value)
+
+    rows = [[cell(result[c]) for c in columns] for result in results]
+    widths = [max([len(c)] + [len(row[i]) for row in rows]) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.rjust(w) for c, w in zip(columns, widths)),
+             "  ".join("-" * w for w in widths)]
+    lines += ["  ".join(v.rjust(w) for v, w in zip(row, widths)) for row in rows]
+    return "\n".join(lines)
@@ -0,0 +1,59 @@
+#
+# PID gain and time scale factor sweep on the simulated plant
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+# e.g. python3 tuning/pid_sweep.py --P 800000 1070000 1400000 \
+#          --scale-factor 0.005 0.00725 0.01 --dist 100 250 500 --dur 0.8 1.5
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import csv
+from time import perf_counter
+from tuning.pid_simulator import sweep, format_table, RESULT_COLUMNS
+from configs.hal_configs import SIM_PLANT_DT
+from configs.motor_configs import PID_P_GAIN, PID_I_GAIN, PID_D_GAIN, PID_TIME_SCALE_FACTOR
+from configs.ventilation_configs import CONTROL_LOOP_PERIOD
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sweep pid gains and time scale factors "
+                                                 "over simulated arm moves")
+    parser.add_argument("--P", type=float, nargs="+", default=[PID_P_GAIN])
+    parser.add_argument("--I", type=float, nargs="+", default=[PID_I_GAIN])
+    parser.add_argument("--D", type=float, nargs="+", default=[PID_D_GAIN])
+    parser.add_argument("--scale-factor", type=float, nargs="+", default=[PID_TIME_SCALE_FACTOR])
+    parser.add_argument("--dist", type=int, nargs="+", default=[250], help="move distances (counts)")
+    parser.add_argument("--dur", type=float, nargs="+", default=[1.0], help="move durations (s)")
+    parser.add_argument("--dt", type=float, default=CONTROL_LOOP_PERIOD, help="control loop period (s)")
+    parser.add_argument("--plant-dt", type=float, default=SIM_PLANT_DT, help="plant integration step (s)")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes, 0 to run serially")
+    parser.add_argument("--sort", choices=RESULT_COLUMNS, default=None, help="sort the table by a column")
+    parser.add_argument("--csv", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    results = sweep(P=args.P, I=args.I, D=args.D, scale_factor=args.scale_factor,
+                    dist=args.dist, dur=args.dur, processes=args.processes,
+                    dt=args.dt, plant_dt=args.plant_dt)
+    elapsed = perf_counter() - start
+
+    if args.sort is not None:
+        # unreached targets last
+        results.sort(key=lambda r: (r[args.sort] is None, r[args.sort] or 0))
+    print(format_table(results))
+    print("{} moves in {:.2f} s".format(len(results), elapsed))
+
+    if args.csv is not None:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#
+# PID time scale factor calibration for
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+# Refits PID_SCALE_FACTOR_COEFFICIENTS, the scale factor Motor.get_scale_factor
+# returns for a move distance, from (distance, duration, scale factor, achieved
+# time) samples. Samples are csv files with the dist, dur, scale_factor and
+# time_to_target columns of tuning/pid_sweep.py, from the simulator or from
+# moves logged on the machine, or are collected on the simulated plant.
+#
+# e.g. python3 tuning/scale_factor_calibration.py --simulate --iterations 3 --write
+#      python3 tuning/scale_factor_calibration.py --samples moves.csv --write
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import csv
+import re
+import numpy as np
+from actuators.motor import polyval
+from tuning.pid_simulator import run_all, format_table
+from configs.motor_configs import PID_SCALE_FACTOR_COEFFICIENTS
+
+MOTOR_CONFIGS = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'configs', 'motor_configs.py'))
+
+DISTANCES = (100, 150, 200, 250, 300, 350, 400, 450, 500, 550, 650)
+DURATIONS = (0.8, 1.2, 1.6)
+
+
+def collect(coefficients, distances=DISTANCES, durations=DURATIONS, processes=None, **kwargs):
+    """
+    simulate moves with the scale factor of the coefficients
+    @param coefficients: the scale factor polynomial, highest degree first
+    @param kwargs: passed to simulate_move
+    @return: the samples, results of simulate_move
+    """
+    runs = [dict(kwargs, scale_factor=polyval(coefficients, dist), dist=dist, dur=dur)
+            for dist in distances for dur in durations]
+    return run_all(runs, processes)
+
+
+def load_samples(path):
+    """
+    @param path: a csv file with dist, dur, scale_factor and time_to_target columns
+    @return: the samples as dicts
+    """
+    samples = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            ttt = row['time_to_target']
+            samples.append({
+                'dist': abs(float(row['dist'])),
+                'dur': float(row['dur']),
+                'scale_factor': float(row['scale_factor']),
+                'time_to_target': float(ttt) if ttt not in ('', 'None') else None,
+            })
+    return samples
+
+
+def fit(samples, degree=4):
+    """
+    fit the scale factor polynomial. The pid velocity is proportional
+    to the scale factor, so a move that took time_to_target instead of
+    dur needed scale_factor * time_to_target / dur.
+    @param samples: dicts with dist, dur, scale_factor and time_to_target
+    @param degree: the degree of the polynomial
+    @return: the coefficients, highest degree first
+    """
+    reached = [s for s in samples if s['time_to_target'] is not None]
+    dist = np.array([abs(s['dist']) for s in reached], dtype=float)
+    if len(np.unique(dist)) <= degree:
+        raise ValueError("{} distances cannot fit a degree {} polynomial".format(
+            len(np.unique(dist)), degree))
+    needed = np.array([s['scale_factor'] * s['time_to_target'] / s['dur'] for s in reached])
+    return [float(c) for c in np.polyfit(dist, needed, degree)]
+
+
+def timing_error(samples):
+    """
+    @return: the rms relative error of the achieved times, unreached moves excluded
+    """
+    errors = [(s['time_to_target'] - s['dur']) / s['dur'] for s in samples if s['time_to_target'] is not None]
+    return float(np.sqrt(np.mean(np.square(errors)))) if errors else float('nan')
+
+
+def store(coefficients, path=MOTOR_CONFIGS):
+    """
+    write the coefficients to PID_SCALE_FACTOR_COEFFICIENTS in the config
+    """
+    with open(path) as f:
+        config = f.read()
+    line = "PID_SCALE_FACTOR_COEFFICIENTS = [{}]".format(", ".join("{:.8e}".format(c) for c in coefficients))
+    config, count = re.subn(r"^PID_SCALE_FACTOR_COEFFICIENTS = \[.*\]$", line, config, flags=re.M)
+    if count != 1:
+        raise ValueError("PID_SCALE_FACTOR_COEFFICIENTS not found in " + path)
+    with open(path, 'w') as f:
+        f.write(config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="refit the pid time scale factor polynomial")
+    parser.add_argument("--samples", nargs="+", default=[], help="csv files of measured moves")
+    parser.add_argument("--simulate", action="store_true", help="collect samples on the simulated plant")
+    parser.add_argument("--iterations", type=int, default=1, help="simulated collect and refit rounds")
+    parser.add_argument("--distances", type=int, nargs="+", default=DISTANCES)
+    parser.add_argument("--durations", type=float, nargs="+", default=DURATIONS)
+    parser.add_argument("--degree", type=int, default=4)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes, 0 to run serially")
+    parser.add_argument("--save-samples", default=None, help="write the simulated samples to this csv")
+    parser.add_argument("--write", action="store_true", help="store the fit in configs/motor_configs.py")
+    args = parser.parse_args()
+
+    if not args.samples and not args.simulate:
+        parser.error("give --samples or --simulate")
+
+    coefficients = list(PID_SCALE_FACTOR_COEFFICIENTS)
+    measured = [s for path in args.samples for s in load_samples(path)]
+    if measured:
+        print("measured: {} samples, rms timing error {:.1%}".format(len(measured), timing_error(measured)))
+        coefficients = fit(measured, args.degree)
+
+    simulated = []
+    for i in range(args.iterations if args.simulate else 0):
+        simulated = collect(coefficients, args.distances, args.durations, args.processes)
+        print("round {}: rms timing error {:.1%}".format(i + 1, timing_error(simulated)))
+        coefficients = fit(measured + simulated, args.degree)
+
+    if simulated:
+        check = collect(coefficients, args.distances, args.durations, args.processes)
+        print(format_table(check, ('dist', 'dur', 'scale_factor', 'time_to_target', 'ttt_error')))
+        print("refit: rms timing error {:.1%}".format(timing_error(check)))
+        if args.save_samples is not None:
+            with open(args.save_samples, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(simulated[0]))
+                writer.writeheader()
+                writer.writerows(simulated)
+
+    print("PID_SCALE_FACTOR_COEFFICIENTS = {}".format(coefficients))
+    if args.write:
+        store(coefficients)
+        print("stored in " + MOTOR_CONFIGS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#
+# PID simulator test, single moves and a parallel sweep on the simulated plant
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from time import perf_counter
+from tuning.pid_simulator import simulate_move, sweep, format_table
+
+
+def test_move_reaches_target():
+    for dist in (250, -250):
+        result = simulate_move(dist=dist, dur=1.0)
+        assert result['time_to_target'] is not None, result
+        assert result['final_error'] == 0, result
+        assert 0 < result['rise_time'] < result['time_to_target'], result
+
+
+def test_scale_factor_sets_speed():
+    slow, fast = sweep(scale_factor=(0.004, 0.01), processes=0)
+    assert fast['time_to_target'] < slow['time_to_target'], (slow, fast)
+
+
+def test_parallel_sweep_matches_serial():
+    grid = dict(P=(800000, 1070000), scale_factor=(0.005, 0.00725), dist=(100, 500))
+
+    start = perf_counter()
+    serial = sweep(processes=0, **grid)
+    t_serial = perf_counter() - start
+
+    start = perf_counter()
+    parallel = sweep(**grid)
+    t_parallel = perf_counter() - start
+
+    assert parallel == serial
+    print(format_table(parallel))
+    print("{} moves: serial {:.2f} s, process pool {:.2f} s".format(len(serial), t_serial, t_parallel))
+
+
+if __name__ == "__main__":
+    test_move_reaches_target()
+    test_scale_factor_sets_speed()
+    test_parallel_sweep_matches_serial()
+    print("pid simulator tests passed")
@@ -0,0 +1,74 @@
+#
+# Scale factor calibration test, fit, storage and evaluation of the polynomial
+# VentCU - An open source ventilator
+#
+# (c) VentCU, 2020. All Rights Reserved.
+#
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import tempfile
+from timeit import timeit
+from hal.sim import SimBackend
+from actuators.motor import Motor, polyval
+from sensors.rotary_encoder import RotaryEncoder
+from tuning.scale_factor_calibration import fit, store
+from configs.motor_configs import PID_SCALE_FACTOR_COEFFICIENTS, PID_SCALE_FACTOR_TABLE_SIZE
+
+
+def pow_loop(coefficients, x):
+    # the original evaluation of get_scale_factor
+    degree = len(coefficients) - 1
+    value = 0
+    for c in coefficients:
+        value += c * pow(x, degree)
+        degree -= 1
+    return value
+
+
+def test_lookup_matches_polynomial():
+    hal = SimBackend(realtime=False)
+    motor = Motor(RotaryEncoder(hal.pi, 16, 18), tic_device=hal.tic_device(), async_io=False, clock=hal.clock)
+    for x in (0, 1, 100, 250, 333, PID_SCALE_FACTOR_TABLE_SIZE - 1, PID_SCALE_FACTOR_TABLE_SIZE, 1500, 250.5):
+        expected = pow_loop(PID_SCALE_FACTOR_COEFFICIENTS, x)
+        assert abs(motor.get_scale_factor(x) - expected) <= 1e-12 * max(1, abs(expected)), x
+
+    n = 100000
+    t_pow = timeit(lambda: pow_loop(PID_SCALE_FACTOR_COEFFICIENTS, 250), number=n) / n
+    t_lookup = timeit(lambda: motor.get_scale_factor(250), number=n) / n
+    print("get_scale_factor: pow loop {:.2f} us, lookup {:.2f} us".format(t_pow * 1e6, t_lookup * 1e6))
+
+
+def test_fit_recovers_scale_factor():
+    # a motor whose moves take exactly as long as a reference polynomial asks
+    reference = [2e-10, -3e-7, 1.5e-4, -3e-2, 2.5]
+    reference = [c * 0.01 for c in reference]
+    samples = []
+    for dist in (100, 200, 300, 400, 500, 600):
+        for dur in (0.8, 1.6):
+            used = 0.006
+            samples.append({'dist': dist, 'dur': dur, 'scale_factor': used,
+                            'time_to_target': dur * polyval(reference, dist) / used})
+    coefficients = fit(samples, degree=4)
+    for dist in (100, 350, 600):
+        assert abs(polyval(coefficients, dist) - polyval(reference, dist)) < 1e-9, dist
+
+
+def test_store_rewrites_config():
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as f:
+        f.write("A = 1\nPID_SCALE_FACTOR_COEFFICIENTS = [1, 2]\nB = 2\n")
+    store([1.5e-3, -2.0], f.name)
+    with open(f.name) as f2:
+        namespace = {}
+        exec(f2.read(), namespace)
+    os.remove(f.name)
+    assert namespace['PID_SCALE_FACTOR_COEFFICIENTS'] == [1.5e-3, -2.0]
+    assert namespace['A'] == 1 and namespace['B'] == 2
+
+
+if __name__ == "__main__":
+    test_lookup_matches_polynomial()
+    test_fit_recovers_scale_factor()
+    test_store_rewrites_config()
+    print("scale factor calibration tests passed")
@@ -11,6 +11,7 @@ import threading
 
 from alarms.alarm_handler import AlarmHandler
 from alarms.alarms import *
+from gui.update_bus import UpdateBus
 
 from PyQt5 import QtCore
 from PyQt5.QtGui import *
@@ -56,6 +57,10 @@ class UIControllerInterface:
         self.controller = ventilator_controller
 
         self.threadpool = QThreadPool()
+
+        # controller signals are coalesced and delivered on the gui thread at UI_UPDATE_RATE
+        self.bus = UpdateBus()
+        self._label_text = {}               # text last set on each label
         self.alarm_handler = AlarmHandler(self.ui, self.controller)
         threading.excepthook = self.except_alarm_hook
 
@@ -69,9 +74,11 @@ class UIControllerInterface:
 
     def interface_elements(self):
 
+        # the posters run on the emitting thread, no event is queued per emit
         self.controller.state_change_sender.state_change_signal.connect(
-            lambda: self.state_change()
+            self.bus.poster('state'), QtCore.Qt.DirectConnection
         )
+        self.bus.subscribe('state', self.state_change)
 
         self.controller.shutdown_sender.shutdown_signal.connect(
             lambda: self.try_controller_method( self.controller.set_state, parameters=self.controller.OFF_STATE )
@@ -80,15 +87,18 @@ class UIControllerInterface:
         """
         alarm window elements
         """
+        # every alarm is delivered as it is raised, not on the bus tick
         self.controller.alarm_sender.alarm_signal.connect(
-            self.except_alarm_hook
-        )
-        self.ui.stack.alarm_condition.rehome_button.clicked.connect(
-            lambda: self.try_controller_method( self.controller.set_state, parameters=self.controller.HOMING_STATE )
-        )
-        self.ui.stack.alarm_condition.dismiss_alarm_button.clicked.connect(
-            self.dismiss_alarm_handler 
+            self.except_alarm_hook, QtCore.Qt.QueuedConnection
         )
+        def alarm_condition_elements(alarm_condition):
+            alarm_condition.rehome_button.clicked.connect(
+                lambda: self.try_controller_method( self.controller.set_state, parameters=self.controller.HOMING_STATE )
+            )
+            alarm_condition.dismiss_alarm_button.clicked.connect(
+                self.dismiss_alarm_handler
+            )
+        self.ui.stack.on_build('alarm_condition', alarm_condition_elements)
         
         """
         start_homing window elements
@@ -100,11 +110,13 @@ class UIControllerInterface:
         """
         confirm_homing window elements
         """
-        self.ui.stack.confirm_homing.rehome_button.clicked.connect(
-            lambda: self.try_controller_method( self.controller.set_state, parameters=self.controller.HOMING_STATE )
-        )
+        def confirm_homing_elements(confirm_homing):
+            confirm_homing.rehome_button.clicked.connect(
+                lambda: self.try_controller_method( self.controller.set_state, parameters=self.controller.HOMING_STATE )
+            )
 
-        self.update_label(self.ui.stack.confirm_homing.bag_size_label, self.controller.bag_size)     # TODO: format text as inches
+            self.update_label(confirm_homing.bag_size_label, self.controller.bag_size)     # TODO: format text as inches
+        self.ui.stack.on_build('confirm_homing', confirm_homing_elements)
 
         """
         edit_parameters window elements
@@ -115,15 +127,18 @@ class UIControllerInterface:
             else:
                 self.ui.stack.edit_parameters.back_button.show()
 
-        self.ui.stack.confirm_homing.confirm_button.clicked.connect(update_edit_parameters_elements)
+        def confirm_homing_confirm(confirm_homing):
+            confirm_homing.confirm_button.clicked.connect(update_edit_parameters_elements)
+        self.ui.stack.on_build('confirm_homing', confirm_homing_confirm)
         self.ui.stack.main_window.edit_parameters_button.clicked.connect(update_edit_parameters_elements)
 
         self.update_label(self.ui.stack.edit_parameters.TV_label, self.controller.volume)
         self.update_label(self.ui.stack.edit_parameters.BPM_label, self.controller.bpm)
         self.update_label(self.ui.stack.edit_parameters.IE_label, self.controller.ie)
         self.controller.measured_parameters_sender.update_measured_parameters_signal.connect(
-            self.update_measured_parameters 
+            self.bus.poster('measured'), QtCore.Qt.DirectConnection
         )
+        self.bus.subscribe('measured', self.update_measured_parameters)
         
         # TODO: redefine logical values for increasing and decreasing
         self.ui.stack.edit_parameters.tidal_increase_button.clicked.connect(
@@ -205,10 +220,18 @@ class UIControllerInterface:
             self.ventilate_thread_spawned = True
             
     # updates measured parameters at a constant frequency, unlike "update_parameters(self)" which is on button signal
-    def update_measured_parameters(self):
-        self.update_label(self.ui.stack.main_window.measure_TV_label, int(self.controller.measure_volume))
-        self.update_label(self.ui.stack.main_window.measure_BPM_label, round(self.controller.measure_bpm))
-        self.update_label(self.ui.stack.main_window.measure_IE_label, self.controller.measure_ie["ie_ratio"])
+    def update_measured_parameters(self, _=None):
+        measured = self.controller.snapshot()['measured']
+        main_window = self.ui.stack.main_window
+        self.update_label(main_window.measure_TV_label, self.format_measured(measured['volume']))
+        self.update_label(main_window.measure_BPM_label, self.format_measured(measured['bpm']))
+        self.update_label(main_window.measure_IE_label, self.format_measured(measured['ie'], "1:{:.1f}"))
+        self.update_label(main_window.measure_PIP_label, self.format_measured(measured['pip']))
+        self.update_label(main_window.measure_PEEP_label, self.format_measured(measured['peep']))
+
+    @staticmethod
+    def format_measured(value, form="{:.0f}"):
+        return "-" if value is None else form.format(value)
      
     # dismissed alarms require different widget redirection depending on state 
     def dismiss_alarm_handler(self):
@@ -219,26 +242,32 @@ class UIControllerInterface:
           self.ui.stack.QtStack.setCurrentWidget(self.ui.stack.main_window)
           
     def update_label(self, label, value):
-        label.setText( str(value) )
+        # setText repaints even for the same text, skip it
+        text = str(value)
+        if self._label_text.get(label) != text:
+            self._label_text[label] = text
+            label.setText(text)
 
     def new_thread(self, name, target_method):
         worker = Worker(target_method)
         self.threadpool.start(worker)
         # print("New thread spawned: " + name)
-        self.logger.info(f"New thread spawned: {name}")
+        self.logger.info("New thread spawned: %s", name)
 
 
     def start_homing(self):
         self.ui.stack.QtStack.setCurrentWidget(self.ui.stack.homing)
         self.new_thread("homing_thread", self.controller.start_homing)
 
-    def state_change(self):
+    def state_change(self, _=None):
+        state = self.controller.snapshot()['state']
+
         # start homing if state changes to homing state
-        if self.controller.current_state is self.controller.HOMING_STATE:
+        if state is self.controller.HOMING_STATE:
             self.start_homing()
 
         # switch window if homing successfuly completes
-        if self.controller.current_state is self.controller.HOMING_VERIF_STATE:
+        if state is self.controller.HOMING_VERIF_STATE:
             self.ui.stack.QtStack.setCurrentWidget(self.ui.stack.confirm_homing)
 
     def try_controller_method(self, method, state_to_set=None, parameters=None):
@@ -0,0 +1,109 @@
+#
+# per call latency of a log call on the control thread, with other
+# threads logging at the same time, for LoggerInit's synchronous
+# handlers and its queue listener
+#
+# python3 -m unit_tests.logging_benchmark
+#
+
+import os
+import sys
+import logging
+import tempfile
+import threading
+from time import perf_counter_ns, sleep
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from logger import LoggerInit, DeferredQueueHandler
+
+
+def load(stop, name):
+    """
+    log as fast as possible, like a burst of callbacks
+    """
+    logger = logging.getLogger(name)
+    i = 0
+    while not stop.is_set():
+        logger.info("encoder: %s, motor controller: %s", i, -i)
+        i += 1
+        sleep(0)
+
+
+def measure(async_logging, rotation=None, calls=20000, threads=3):
+    """
+    @return: the per call latencies (ns) of the control thread
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as console:
+        log = LoggerInit("benchmark", directory=directory, async_logging=async_logging,
+                         rotation=rotation, stream=console)
+        stop = threading.Event()
+        workers = [threading.Thread(target=load, args=(stop, "callback {}".format(i)))
+                   for i in range(threads)]
+        for worker in workers:
+            worker.start()
+
+        logger = logging.getLogger('ventilator_controller')
+        latencies = np.empty(calls, dtype=np.int64)
+        for i in range(calls):
+            t = perf_counter_ns()
+            logger.info("Lower target reached (insp end actual: %s) encoder: %s, motor controller: %s",
+                        i, -i, i * 50)
+            latencies[i] = perf_counter_ns() - t
+
+        stop.set()
+        for worker in workers:
+            worker.join()
+        log.stop()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in log.handlers:
+            handler.close()
+
+        # nothing lost by the listener
+        with open(log.path) as f:
+            lines = sum(1 for line in f if "Lower target reached" in line)
+        assert lines == calls, (lines, calls)
+    return latencies
+
+
+def check_mutable_args():
+    """
+    a mutable argument changed right after the call is logged as it was
+    at the call, immutable ones are left for the listener to format
+    """
+    handler = DeferredQueueHandler(None)
+    record = logging.LogRecord("test", logging.INFO, __file__, 0, "tar %s at %s", (-300, 1.5), None)
+    assert handler.prepare(record).args == (-300, 1.5)
+
+    root = logging.getLogger()
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as console:
+        log = LoggerInit("benchmark", directory=directory, async_logging=True, stream=console)
+        targets = [-300, -120]
+        for i in range(1000):
+            logging.getLogger('ventilator_controller').info("targets: %s", targets)
+            targets[0] -= 1
+        log.stop()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in log.handlers:
+            handler.close()
+
+        with open(log.path) as f:
+            logged = [line.split("targets: ")[1].strip() for line in f if "targets: " in line]
+    assert logged == ["[{}, -120]".format(-300 - i) for i in range(1000)], logged[:3]
+
+
+if __name__ == "__main__":
+    check_mutable_args()
+    print("{:<18} {:>10} {:>10} {:>10} {:>10}".format("handlers", "mean (us)", "p50", "p99", "max"))
+    for label, async_logging, rotation in (("sync", False, None), ("async", True, None),
+                                           ("async, size", True, "size")):
+        latencies = measure(async_logging, rotation) / 1000
+        print("{:<18} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.0f}".format(
+            label, latencies.mean(), np.percentile(latencies, 50),
+            np.percentile(latencies, 99), latencies.max()))
@@ -6,7 +6,6 @@
 # (c) VentCU, 2020. All Rights Reserved.
 #
 
-import matplotlib.pyplot as plt
 from time import sleep
 from actuators.motor import Motor
 import pigpio
@@ -85,6 +84,7 @@ if __name__ == "__main__":
 
 accel = np.append(np.diff(vel_arr) / np.diff(x), np.array([0]))
 
+import matplotlib.pyplot as plt
 fig, axs = plt.subplots(4)
 fig.suptitle('plots')
 axs[0].plot(x, vel_arr)
@@ -0,0 +1,74 @@
+#
+# startup time benchmark, from Ventilator.__init__
+# to the first frame on screen
+#
+# python3 -m unit_tests.startup_benchmark         the full ventilator on the sim backend
+# python3 -m unit_tests.startup_benchmark --real  the full ventilator, needs the hardware
+# python3 -m unit_tests.startup_benchmark --ui    the ui only, with loadUi against the compiled cache
+#
+
+import os
+import sys
+from time import perf_counter
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'gui')))
+
+from PyQt5 import QtCore, QtWidgets, uic
+
+
+def first_frame(app, t0, results):
+    """
+    run the event loop until the shown window has been painted
+    @return: the time (s) from t0 to the first frame
+    """
+    def done():
+        results['first frame'] = perf_counter() - t0
+        app.quit()
+    QtCore.QTimer.singleShot(0, done)
+    app.exec_()
+    return results['first frame']
+
+
+def compare_ui_loading():
+    from gui import ui_cache
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    print("{:<22} {:>10} {:>10}".format("window", "loadUi", "compiled"))
+    for name in ('start', 'start_homing', 'homing', 'confirm_homing', 'edit_parameters',
+                 'confirm_parameters', 'main_window', 'alarm_condition'):
+        ui_cache.compile_ui(name)
+        ui_cache.load_ui(name, QtWidgets.QMainWindow())        # import the module once
+
+        t = perf_counter()
+        uic.loadUi(ui_cache.ui_path(name), QtWidgets.QMainWindow())
+        parsed = perf_counter() - t
+
+        t = perf_counter()
+        ui_cache.load_ui(name, QtWidgets.QMainWindow())
+        compiled = perf_counter() - t
+        print("{:<22} {:>8.1f}ms {:>8.1f}ms".format(name, parsed * 1e3, compiled * 1e3))
+
+
+if __name__ == "__main__":
+    results = {}
+    t0 = perf_counter()
+    if '--ui' in sys.argv:
+        from gui.ui import UI
+        ui = UI()
+        app = ui.app
+        results['UI()'] = perf_counter() - t0
+    else:
+        from ventilator import Ventilator
+        ventilator = Ventilator("real" if '--real' in sys.argv else "sim")
+        app = ventilator.ui.app
+        results['Ventilator()'] = perf_counter() - t0
+
+    first_frame(app, t0, results)
+    for phase, t in results.items():
+        print("{:<22} {:8.1f}ms".format(phase, t * 1e3))
+    if '--ui' not in sys.argv:
+        ventilator.sensor_service.stop()
+        ventilator.hal.close()
+
+    if '--ui' in sys.argv:
+        print()
+        compare_ui_loading()
@@ -0,0 +1,96 @@
+#
+# startup profiler for ventilator.py
+#
+# python3 -m unit_tests.startup_profile             import times only, runs without the hardware
+# python3 -m unit_tests.startup_profile --phases    also build the Ventilator and time its startup phases
+#
+# import times come from python -X importtime in a fresh interpreter,
+# so nothing imported by this script is counted
+#
+
+import os
+import re
+import subprocess
+import sys
+from time import perf_counter
+
+CONTROL_SYSTEM = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(CONTROL_SYSTEM)
+
+_IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_times(module='ventilator'):
+    """
+    @param module: the module to import
+    @return: list of (package, self (us), cumulative (us), depth) in
+             import order, and the stderr lines that are not timings
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                          cwd=CONTROL_SYSTEM, stderr=subprocess.PIPE, universal_newlines=True)
+    rows, other = [], []
+    for line in proc.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, package = match.groups()
+            rows.append((package, int(own), int(cumulative), (len(indent) - 1) // 2))
+        elif not line.startswith('import time:'):
+            other.append(line)
+    return rows, other
+
+
+def report_imports(rows, module='ventilator', top=15):
+    # a module is listed after everything it imports, at a lower depth
+    end = next((i for i, r in enumerate(rows) if r[0] == module and r[3] == 0), len(rows) - 1)
+    start = end
+    while start > 0 and rows[start - 1][3] > 0:
+        start -= 1
+    rows = rows[start:end + 1]
+    print("importing {}: {:.0f} ms, {} modules".format(module, rows[-1][2] / 1e3, len(rows)))
+
+    # the modules imported directly, with everything they pull in
+    print("\n{:<40} {:>12}".format("imported by " + module, "cumulative"))
+    direct = [r for r in rows if r[3] == 1]
+    for package, _, cumulative, _ in sorted(direct, key=lambda r: -r[2])[:top]:
+        print("{:<40} {:>10.1f}ms".format(package, cumulative / 1e3))
+
+    # time by top level package, eg. all of matplotlib
+    packages = {}
+    for package, own, _, _ in rows:
+        root = package.split('.')[0]
+        packages[root] = packages.get(root, 0) + own
+    print("\n{:<40} {:>12}".format("top level package", "self"))
+    for root, own in sorted(packages.items(), key=lambda p: -p[1])[:top]:
+        print("{:<40} {:>10.1f}ms".format(root, own / 1e3))
+
+
+def report_phases():
+    from PyQt5 import QtCore
+    from ventilator import Ventilator
+
+    t0 = perf_counter()
+    ventilator = Ventilator()
+    t_init = perf_counter() - t0
+
+    def first_frame():
+        print("\n{:<40} {:>10.1f}ms".format("first frame", (perf_counter() - t0) * 1e3))
+        ventilator.ui.app.quit()
+
+    print("\n{:<40} {:>12}".format("Ventilator() phase", "wall clock"))
+    for phase, t in ventilator.startup_phases:
+        print("{:<40} {:>10.1f}ms".format(phase, t * 1e3))
+    print("{:<40} {:>10.1f}ms".format("Ventilator()", t_init * 1e3))
+
+    QtCore.QTimer.singleShot(0, first_frame)
+    ventilator.ui.app.exec_()
+    ventilator.controller.stop_ventilation()
+    ventilator.sensor_service.stop()
+
+
+if __name__ == "__main__":
+    rows, other = import_times()
+    if other:
+        print("\n".join(other[-5:]), file=sys.stderr)
+    report_imports(rows)
+    if '--phases' in sys.argv:
+        report_phases()
@@ -0,0 +1,112 @@
+#
+# telemetry recorder test and per tick cost benchmark
+#
+# python3 -m unit_tests.telemetry_test
+#
+
+import os
+import sys
+import logging
+import tempfile
+from time import perf_counter, sleep
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from telemetry import TelemetryRecorder, read_telemetry, TRACE_RECORD_SIZE
+
+
+def record(recorder, n, start=0):
+    for i in range(start, start + n):
+        recorder.record(i * 2000000, i % 10, -i, i * 50, 1000 - i, 8000 + i)
+
+
+def test_round_trip():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "round_trip.trace")
+        recorder = TelemetryRecorder(path, capacity=64, file_records=1000, flush_period=0.005,
+                                     state_names=["A", "B"])
+        recorder.start()
+        for start in range(0, 300, 30):  # more than the ring, across flushes of the thread
+            record(recorder, 30, start)
+            sleep(0.02)
+        recorder.stop()
+        assert recorder.dropped == 0
+
+        records, info = read_telemetry(path)
+        assert info['state_names'] == ["A", "B"]
+        assert info['count'] == 300
+        assert os.path.getsize(path) == 1024 + 1000 * TRACE_RECORD_SIZE
+        i = np.arange(300)
+        assert np.array_equal(records['time'], i * 2000000)
+        assert np.array_equal(records['state'], i % 10)
+        assert np.array_equal(records['encoder'], -i)
+        assert np.array_equal(records['tic_position'], i * 50)
+        assert np.array_equal(records['velocity'], 1000 - i)
+        assert np.array_equal(records['pressure_raw'], 8000 + i)
+
+
+def test_file_wraps():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "wraps.trace")
+        recorder = TelemetryRecorder(path, capacity=128, file_records=100, flush_period=60)
+        recorder.start()
+        for start in range(0, 250, 50):
+            record(recorder, 50, start)
+            recorder.flush()
+        recorder.stop()
+
+        # the file keeps the newest 100 records, in order
+        records, info = read_telemetry(path)
+        assert info['count'] == 250
+        assert np.array_equal(records['time'], np.arange(150, 250) * 2000000)
+        assert recorder.dropped == 0
+
+
+def test_dropped():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "dropped.trace")
+        recorder = TelemetryRecorder(path, capacity=32, file_records=1000, flush_period=60)
+        recorder.start()
+        record(recorder, 100)           # nothing flushed, the ring only holds the newest 32
+        recorder.stop()
+
+        records, info = read_telemetry(path)
+        assert recorder.dropped == 68
+        assert np.array_equal(records['time'][68:], np.arange(68, 100) * 2000000)
+
+
+def benchmark(directory, n=100000):
+    """
+    per tick cost of a binary record against the string logging it replaces
+    """
+    recorder = TelemetryRecorder(os.path.join(directory, "benchmark.trace"))
+    recorder.start()
+    t = perf_counter()
+    record(recorder, n)
+    t_record = (perf_counter() - t) / n
+    recorder.stop()
+
+    logger = logging.getLogger('telemetry_benchmark')
+    logger.propagate = False
+    handler = logging.FileHandler(os.path.join(directory, "benchmark.log"))
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    t = perf_counter()
+    for i in range(n // 10):
+        logger.info("{} encoder: {}, motor controller: {}, velocity: {}, pressure: {}".format(
+            i, -i, i * 50, 1000 - i, 8000 + i))
+    t_log = (perf_counter() - t) / (n // 10)
+    handler.close()
+
+    print("telemetry record: {:.2f} us, log line: {:.2f} us".format(t_record * 1e6, t_log * 1e6))
+    return t_record, t_log
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_file_wraps()
+    test_dropped()
+    with tempfile.TemporaryDirectory() as directory:
+        benchmark(directory)
+    print("all tests passed")
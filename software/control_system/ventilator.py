@@ -5,57 +5,137 @@
 # (c) VentCU, 2020. All Rights Reserved.
 #
 
+from time import perf_counter
+_t_import = perf_counter()
+
 import signal
 import sys
-import pigpio
+import logging
 
 from logger import LoggerInit
+from telemetry import TelemetryRecorder
+from hal import get_backend
 from actuators.motor import Motor
+from actuators.buzzer import Buzzer
 from sensors.rotary_encoder import RotaryEncoder
 from sensors.limit_switch import LimitSwitch
 from sensors.power_switch import PowerSwitch
 from sensors.pressure_sensor import PressureSensor
+from sensors.overpressure_trip import OverpressureTrip
+from sensors.sensor_service import SensorService
+from sensors.breath_analyzer import BreathAnalyzer
 from configs.gpio_map import *
+from configs.hal_configs import HAL_BACKEND
+from configs.telemetry_configs import TELEMETRY_ENABLED, TELEMETRY_DIR
 # from sensors.flow_sensor import FlowSensor
 
 from ventilator_controller import VentilatorController
 from gui.ui import UI
 from ui_controller_interface import UIControllerInterface
 
+IMPORT_TIME = perf_counter() - _t_import       # time (s) spent importing the modules above
+
 
 class Ventilator:
 
-    def __init__(self):
+    def __init__(self, hal_backend=HAL_BACKEND):
+        """
+        @param hal_backend: "real" for the hardware, "sim" for the simulated ventilator
+        """
+
+        # wall clock startup phases, (phase, duration (s))
+        self._t_phase = perf_counter()
+        self.startup_phases = [("imports", IMPORT_TIME)]
 
         # start logger
-        logger = LoggerInit("ventilator")
+        self.logger_init = LoggerInit("ventilator")
+        self.mark_phase("logger")
+
+        # hardware backend, the devices are built on its pi, gpio, i2c and tic
+        self.hal = get_backend(hal_backend)
+        self.mark_phase("hal " + self.hal.name)
 
         # instantiate sensors
-        self.encoder = RotaryEncoder(pigpio.pi(), ENCODER_B_PLUS_PIN, ENCODER_A_PLUS_PIN)
-        self.contact_switch = LimitSwitch(CONTACT_SWITCH_PIN)
-        self.absolute_switch = LimitSwitch(ABSOLUTE_SWITCH_PIN)
-        self.power_switch = PowerSwitch(POWER_SWITCH_PIN)
-        # self.pressure_sensor = PressureSensor()
+        self.pi = self.hal.pi
+        self.encoder = RotaryEncoder(self.pi, ENCODER_B_PLUS_PIN, ENCODER_A_PLUS_PIN)
+        self.contact_switch = LimitSwitch(CONTACT_SWITCH_PIN, gpio=self.hal.gpio)
+        self.absolute_switch = LimitSwitch(ABSOLUTE_SWITCH_PIN, gpio=self.hal.gpio)
+        self.power_switch = PowerSwitch(POWER_SWITCH_PIN, gpio=self.hal.gpio)
+        self.overpressure_trip = OverpressureTrip(self.pi, PRESSURE_ALERT_PIN)
+        self.pressure_sensor = PressureSensor(pi=self.pi, overpressure_trip=self.overpressure_trip,
+                                              i2c=self.hal.i2c, clock=self.hal.clock)
         # self.flow_sensor = FlowSensor(FLOW_SENSOR_PIN)
+        self.mark_phase("sensors")
 
         # instantiate actuators
-        self.motor = Motor(self.encoder)
+        self.motor = Motor(self.encoder,
+                           tic_device=self.hal.tic_device(),
+                           async_io=self.hal.tic_async_io,
+                           clock=self.hal.clock)
+        self.buzzers = (Buzzer(BUZZER_PIN_1, gpio=self.hal.gpio),
+                        Buzzer(BUZZER_PIN_2, gpio=self.hal.gpio))
+        self.mark_phase("actuators")
+
+        # binary trace of the control loop, named after the log
+        self.telemetry = None
+        if TELEMETRY_ENABLED:
+            self.telemetry = TelemetryRecorder("{}/{}.trace".format(TELEMETRY_DIR, self.logger_init.filename))
+
+        # measured parameters, from the volume and pressure of the sensor service
+        self.breath_analyzer = BreathAnalyzer()
 
         # instantiate controller
         self.controller = VentilatorController(self.motor,
-                                               None,
+                                               self.pressure_sensor,
                                                self.absolute_switch,
                                                self.contact_switch,
-                                               self.power_switch)
+                                               self.power_switch,
+                                               overpressure_trip=self.overpressure_trip,
+                                               buzzers=self.buzzers,
+                                               clock=self.hal.clock,
+                                               telemetry=self.telemetry,
+                                               breath_analyzer=self.breath_analyzer)
+        if self.telemetry is not None:
+            self.telemetry.start()
+        self.mark_phase("controller")
+
+        # the sensor service owns the i2c bus, the controller and ui read from it
+        self.sensor_service = SensorService(self.pressure_sensor, self.encoder,
+                                            volume_zero=self.controller.bag_contact_position,
+                                            breath_analyzer=self.breath_analyzer,
+                                            clock=self.hal.clock)
+        self.sensor_service.start()
+        self.mark_phase("sensor service")
 
         # instantiate ui
-        self.ui = UI()
+        self.ui = UI(self.sensor_service)
+        self.mark_phase("ui")
 
         self.ui_controller_interface = UIControllerInterface(self.ui, self.controller)
+        self.mark_phase("ui controller interface")
+
+        logging.getLogger('ventilator.py').info("Startup took {:.3f} s: ".format(
+            sum(t for _, t in self.startup_phases)) + ", ".join(
+            "{} {:.3f}".format(phase, t) for phase, t in self.startup_phases))
+
+    def mark_phase(self, phase):
+        """
+        record the end of a startup phase, it started at the
+        end of the previous one
+        @param phase: the name of the phase
+        """
+        now = perf_counter()
+        self.startup_phases.append((phase, now - self._t_phase))
+        self._t_phase = now
       
     def at_exit(self, sig, frame):
         print("Exiting program...")
         self.controller.stop_ventilation()
+        self.sensor_service.stop()
+        if self.telemetry is not None:
+            self.telemetry.stop()
+        self.hal.close()
+        self.logger_init.stop()
         # self.spirometer.stop() # stop data collection
         # self.spirometer.close()# disconnect from go direct device
         sys.exit(0)
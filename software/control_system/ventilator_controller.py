@@ -7,31 +7,24 @@
 #          neil.nie@columbia.edu
 #
 
-from time import sleep
-from datetime import datetime as time
-import datetime
+from datetime import datetime
 import logging
 from configs.ventilation_configs import *
 from alarms.alarms import *
 from threading import Lock
 from PyQt5.QtCore import pyqtSignal
 from PyQt5 import QtCore
-import sys
-sys.path.append('/home/pi/Workspace/bbwtb/software/control_system/actuators')
-from buzzer import Buzzer
-sys.path.append('/home/pi/Workspace/bbwtb/software/control_system/sensors')
-from pressure_sensor import PressureSensor
+from actuators.buzzer import Buzzer
+from actuators.motion_profile import MotionProfile
+from configs.motor_configs import MOTION_PROFILE, MOTION_PROFILE_RATE, MOTION_PROFILE_ACCEL_FRACTION
+from hal.clock import SystemClock
 
 
-def add_secs(tm, secs):
-    full_date = datetime.datetime(tm.year, tm.month, tm.day, tm.hour, tm.minute, tm.second, tm.microsecond)
-    full_date = full_date + datetime.timedelta(seconds=secs)
-    return full_date
-
-def subtract_secs(tm, secs):
-    full_date = datetime.datetime(tm.year, tm.month, tm.day, tm.hour, tm.minute, tm.second, tm.microsecond)
-    full_date = full_date - datetime.timedelta(seconds=secs)
-    return full_date
+# all cycle timing is kept in integer nanoseconds of clock.monotonic_ns()
+NS_PER_SEC = 1000000000
+INSP_HOLD_NS = int(INSP_HOLD_DUR * NS_PER_SEC)
+MAX_EXP_NS = int(MAX_EXP_DUR * NS_PER_SEC)
+MIN_EXP_PAUSE_NS = int(MIN_EXP_PAUSE * NS_PER_SEC)
 
 class State:
     def __init__(self, name):
@@ -58,9 +51,15 @@ class VentilatorController:
     alarm_sender = AlarmSender() 
 
     def __init__(self, motor, pressure_sensor,
-                         upper_switch, lower_switch, power_switch ):
-        self.buzzer_1 = Buzzer(25)
-        self.buzzer_2 = Buzzer(8)
+                         upper_switch, lower_switch, power_switch,
+                         overpressure_trip=None, buzzers=None, clock=None, telemetry=None,
+                         breath_analyzer=None):
+        if buzzers is None:
+            buzzers = (Buzzer(25), Buzzer(8))
+        self.buzzer_1, self.buzzer_2 = buzzers
+
+        # time of the control loop, a simulated clock runs it faster than real time
+        self.clock = clock if clock is not None else SystemClock()
 
         # self.pressure_sensor = PressureSensor()
 
@@ -81,22 +80,44 @@ class VentilatorController:
         self.PAUSE_STATE = State("PAUSE_STATE")
         self.OFF_STATE = State("OFF_STATE")
         self.DEBUG_STATE = State("DEBUG_STATE")
+        self.states = [self.START_STATE, self.HOMING_STATE, self.HOMING_VERIF_STATE,
+                       self.INSP_STATE, self.INSP_PAUSE_STATE, self.EXP_STATE,
+                       self.EXP_PAUSE_STATE, self.PAUSE_STATE, self.OFF_STATE, self.DEBUG_STATE]
+        self._state_ids = {state: i for i, state in enumerate(self.states)}
+        self._breath_states = (self.INSP_STATE, self.INSP_PAUSE_STATE, self.EXP_STATE, self.EXP_PAUSE_STATE)
 
         self.current_state = self.OFF_STATE
         self._entering_state = False
         self._state_lock = Lock()
-        self._t_state_timer = 0                 # absolute time (s) at start of current state
+        self._t_state_timer = 0                 # monotonic time (ns) at start of current state
+
+        # wall clock mapping of the monotonic timebase, only used for logging
+        self._wall_ref_ns = self.clock.time_ns()
+        self._monotonic_ref_ns = self.clock.monotonic_ns()
 
         # cycle parameters
+        now = self.clock.monotonic_ns()
         self.cycle_count = 0
-        self._t_cycle_start = time.now()        # absolute time (s) at start of cycle
-        self._t_insp_end = time.now()           # calculated time (s) at end of insp
-        self._t_insp_pause_end = time.now()     # calculated time (s) at end of insp pause
-        self._t_exp_end = time.now()            # calculated time (s) at end of exp
-        self._t_exp_pause_end = time.now()      # calculated time (s) at end of exp pause
-        self._t_period = time.now()             # calculated time (s) at end of cycle
-        self._t_period_actual = time.now()      # absolute time (s) at end of cycle
-        self._t_loop_start = time.now()         # absolute time (s) at start of control loop
+        self._t_cycle_start = now               # monotonic time (ns) at start of cycle
+        self._t_insp_end = now                  # calculated time (ns) at end of insp
+        self._t_insp_pause_end = now            # calculated time (ns) at end of insp pause
+        self._t_exp_end = now                   # calculated time (ns) at end of exp
+        self._t_exp_pause_end = now             # calculated time (ns) at end of exp pause
+        self._t_period = 0                      # calculated duration (ns) of the cycle
+        self._t_period_actual = 0               # measured duration (ns) of the last cycle
+        self._t_loop_start = now                # monotonic time (ns) at start of control loop
+        self._insp_dur = 0.0                    # calculated duration (s) of insp
+        self._exp_dur = 0.0                     # calculated duration (s) of exp
+        self.motion_profile = MOTION_PROFILE    # shape of the strokes, None for pid moves
+        self._insp_profile = None               # MotionProfile of the insp stroke, None for pid moves
+        self._exp_profile = None                # MotionProfile of the exp stroke, None for pid moves
+
+        # control loop timing statistics
+        self.loop_tick_count = 0                # number of ticks run by the fixed rate loop
+        self.loop_overrun_count = 0             # number of ticks that finished past their deadline
+        self.loop_skipped_ticks = 0             # number of ticks dropped to realign with the schedule
+        self.loop_last_overrun = 0              # lateness (ns) of the most recent overrun tick
+        self.loop_max_overrun = 0               # worst lateness (ns) seen since the loop started
 
         # ventilation parameters
         self.volume = 400
@@ -117,6 +138,18 @@ class VentilatorController:
         self.upper_switch.callback = self.limit_switch_callback
         self.power_switch.callback = self.power_switch_callback
 
+        # binary trace of every tick, the states are recorded by their index in self.states
+        self.telemetry = telemetry
+        if self.telemetry is not None:
+            self.telemetry.state_names = [state.name for state in self.states]
+            if pressure_sensor is not None:
+                self.telemetry.pressure_calibration = pressure_sensor.calibration
+
+        # hardware overpressure trip, raises the alarm from the adc ALERT edge
+        self.overpressure_trip = overpressure_trip
+        if self.overpressure_trip is not None:
+            self.overpressure_trip.callback = self.overpressure_callback
+
         # motion get_variables
         self.bag_clear_pos = 0
 
@@ -128,9 +161,13 @@ class VentilatorController:
         self.motor_current_target = 0
         self.motor_prev_target = 0
 
+        # measured parameters from the breath analyzer, from the cycle timing without it
+        self.breath_analyzer = breath_analyzer
+        if self.breath_analyzer is not None:
+            self.breath_analyzer.sender = self.measured_parameters_sender
         self.measure_volume = 0
         self.measure_bpm    = 0
-        self.measure_ie     = {"insp_time":time.now(),"exp_time":time.now(),"last_exp_pause_end":time.now(),"ie_ratio":""}
+        self.measure_ie     = {"insp_time":0.0,"exp_time":0.0,"last_exp_pause_end":now,"ie_ratio":""}
         
         # TODO: clean up class variables
         # =========================================
@@ -150,36 +187,64 @@ class VentilatorController:
         Calling set_state in a unsafe way is not defined.
         """
 
-        self.logger.info("State change: " + self.current_state.name)
+        self.logger.info("State change: %s", self.current_state.name)
 
         with self._state_lock:
             self._entering_state = True
             self.current_state = state
-            self._t_state_timer = time.now()
+            self._t_state_timer = self.clock.monotonic_ns()
 
-        self.logger.info(" --> " + self.current_state.name)
+        self.logger.info(" --> %s", self.current_state.name)
 
         self.state_change_sender.state_change_signal.emit()
 
 
+    def wall_time(self, t_ns):
+        """
+        map a time of the monotonic timebase to wall clock
+        time, for logging only.
+        @param t_ns: the monotonic time (in nanoseconds)
+        @return: the corresponding datetime
+        """
+        return datetime.fromtimestamp((self._wall_ref_ns + t_ns - self._monotonic_ref_ns) / NS_PER_SEC)
+
     # calculate time parameters of ventilation
     def calculate_wave_form(self, tidal_volume, ie_ratio, bpm):
 
-        self._t_period = 60.0 / bpm  # seconds per breath
-        _t_period_end = add_secs(self._t_cycle_start, self._t_period)
+        self._t_period = int(60 * NS_PER_SEC / bpm)  # nanoseconds per breath
+        _t_period_end = self._t_cycle_start + self._t_period
+        _t_insp_total = int(self._t_period / (1 + ie_ratio))
 
-        self._t_insp_pause_end = add_secs(self._t_cycle_start, self._t_period / (1 + ie_ratio))  # TODO: understand this
-        self._t_insp_end = add_secs(self._t_cycle_start, (self._t_period / (1 + ie_ratio) - INSP_HOLD_DUR)) # self._t_cycle_start + self._t_insp_pause_end -   # TODO: understand this
-        self._t_exp_end = min(add_secs(self._t_insp_pause_end, MAX_EXP_DUR),  # TODO: understand this
-                              subtract_secs(_t_period_end, MIN_EXP_PAUSE))
+        self._t_insp_pause_end = self._t_cycle_start + _t_insp_total  # TODO: understand this
+        self._t_insp_end = self._t_insp_pause_end - INSP_HOLD_NS # self._t_cycle_start + self._t_insp_pause_end -   # TODO: understand this
+        self._t_exp_end = min(self._t_insp_pause_end + MAX_EXP_NS,  # TODO: understand this
+                              _t_period_end - MIN_EXP_PAUSE_NS)
 
-        self._t_exp_pause_end = _t_period_end # add_secs(self._t_exp_end, MIN_EXP_PAUSE)
+        self._t_exp_pause_end = _t_period_end # self._t_exp_end + MIN_EXP_PAUSE_NS
 
-        self.logger.info("start:          " + str(time.now()))
-        self.logger.info("insp end:       " + str(self._t_insp_end))
-        self.logger.info("insp pause end: " + str(self._t_insp_pause_end))
-        self.logger.info("exp end:        " + str(self._t_exp_end))
-        self.logger.info("exp pause end:  " + str(self._t_exp_pause_end))
+        # durations handed to the motor every tick
+        self._insp_dur = (self._t_insp_end - self._t_cycle_start) / NS_PER_SEC
+        self._exp_dur = (self._t_exp_end - self._t_insp_pause_end) / NS_PER_SEC
+
+        # strokes of the breath, looked up every tick instead of recomputed. Targets
+        # changed during the breath are followed from the next one.
+        if self.motion_profile is None:
+            self._insp_profile = self._exp_profile = None
+        else:
+            self._insp_profile = MotionProfile(self.motor_upper_target, self.motor_lower_target,
+                                               self._insp_dur, shape=self.motion_profile,
+                                               rate=MOTION_PROFILE_RATE,
+                                               accel_fraction=MOTION_PROFILE_ACCEL_FRACTION)
+            self._exp_profile = MotionProfile(self.motor_lower_target, self.motor_upper_target,
+                                              self._exp_dur, shape=self.motion_profile,
+                                              rate=MOTION_PROFILE_RATE,
+                                              accel_fraction=MOTION_PROFILE_ACCEL_FRACTION)
+
+        self.logger.info("start:          %s", self.wall_time(self._t_cycle_start))
+        self.logger.info("insp end:       %s", self.wall_time(self._t_insp_end))
+        self.logger.info("insp pause end: %s", self.wall_time(self._t_insp_pause_end))
+        self.logger.info("exp end:        %s", self.wall_time(self._t_exp_end))
+        self.logger.info("exp pause end:  %s", self.wall_time(self._t_exp_pause_end))
         
         # TODO: use tidal volume parameter
         # TODO: convert self.volume to encoder position
@@ -199,8 +264,54 @@ class VentilatorController:
 
         self.set_state(self.START_STATE)
         # self.pressure_sensor = PressureSensor()
+        if CONTROL_LOOP_PERIOD > 0:
+            self.run_fixed_rate(CONTROL_LOOP_PERIOD)
+        else:
+            while True:
+                self.ventilate()
+
+    def run_fixed_rate(self, period, max_catch_up=CONTROL_LOOP_MAX_CATCH_UP, duration=None):
+        """
+        run the finite state machine once per period using
+        monotonic deadlines. A tick that finishes late is
+        counted as an overrun; the following ticks run back to
+        back until the schedule is met again, unless the loop
+        is more than max_catch_up periods behind, in which case
+        the missed ticks are skipped and the schedule restarts
+        from the current time.
+        @param period: the loop period (in seconds)
+        @param max_catch_up: the number of late periods to catch up on
+        @param duration: return after this long (in seconds), None to run forever
+        """
+        period = int(period * NS_PER_SEC)
+        deadline = self.clock.monotonic_ns() + period
+        end = None if duration is None else deadline - period + int(duration * NS_PER_SEC)
+
         while True:
             self.ventilate()
+            self.loop_tick_count += 1
+
+            now = self.clock.monotonic_ns()
+            if end is not None and now >= end:
+                return
+            if now < deadline:
+                self.clock.sleep((deadline - now) / NS_PER_SEC)
+                deadline += period
+                continue
+
+            # the tick overran its deadline
+            lateness = now - deadline
+            self.loop_overrun_count += 1
+            self.loop_last_overrun = lateness
+            if lateness > self.loop_max_overrun:
+                self.loop_max_overrun = lateness
+
+            missed = lateness // period
+            if missed > max_catch_up:
+                self.loop_skipped_ticks += missed
+                deadline = now + period
+            else:
+                deadline += period
 
     def stop_ventilation(self):
         self.logger.info("about to stop the motor")
@@ -219,9 +330,13 @@ class VentilatorController:
     '''
     def ventilate(self):
 
-        self._t_loop_start = time.now()
-        self.buzzer_1.disable_buzzer()
-        self.buzzer_2.disable_buzzer()
+        self._t_loop_start = now = self.clock.monotonic_ns()
+        if self.overpressure_trip is None or not self.overpressure_trip.tripped:
+            self.buzzer_1.disable_buzzer()
+            self.buzzer_2.disable_buzzer()
+        elif self.current_state in self._breath_states:
+            # a tick that raced the trip callback moved on to the next phase
+            self.set_state(self.PAUSE_STATE)
         # main finite state machine
         '''
         self.pressure_sensor.update_data()
@@ -256,34 +371,39 @@ class VentilatorController:
         elif self.current_state is self.INSP_STATE:
             if self._entering_state:
                 self._entering_state = False
-                self._t_period_actual = time.now() - self._t_cycle_start
-                self.measure_bpm = 60.0 / self._t_period_actual.total_seconds()
-                self.logger.info("freq: " + str(1.0 / self._t_period_actual.total_seconds()))
-                self.logger.info("cur tar" + str(self.motor_current_target))
-                self.logger.info("prev tar" + str(self.motor_prev_target))
-                self.logger.info("lower: " + str(self.motor_lower_target))
-                self.logger.info("upper: " + str(self.motor_upper_target))
-                self._t_cycle_start = time.now()
+                self._t_period_actual = now - self._t_cycle_start
+                self.measure_bpm = 60.0 * NS_PER_SEC / self._t_period_actual
+                self.logger.info("freq: %s", NS_PER_SEC / self._t_period_actual)
+                self.logger.info("cur tar%s", self.motor_current_target)
+                self.logger.info("prev tar%s", self.motor_prev_target)
+                self.logger.info("lower: %s", self.motor_lower_target)
+                self.logger.info("upper: %s", self.motor_upper_target)
+                self._t_cycle_start = now
                 self.calculate_wave_form(tidal_volume=self.volume,
                                          ie_ratio=self.ie,
                                          bpm=self.bpm)
                 self.cycle_count += 1
 
-            # TODO: change/update this method
-            result, _ = self.motor.move_to_encoder_pose_with_dur(
+            insp_end = self.motor_lower_target
+            if self._insp_profile is not None:
+                insp_end = self._insp_profile.end
+                result, _ = self.motor.follow_profile(self._insp_profile,
+                                                      (now - self._t_cycle_start) / NS_PER_SEC)
+            else:
+                result, _ = self.motor.move_to_encoder_pose_with_dur(
                                         pose=self.motor_current_target,
                                         dist=abs(self.motor_current_target
                                                     -self.motor_prev_target),
-                                        dur=(self._t_insp_end-self._t_cycle_start).total_seconds()
+                                        dur=self._insp_dur
                                         )
 
-            if self.motor.encoder_position() == self.motor_lower_target and result is True:
-                self.log_motor_position("Lower target reached (insp end actual: " + str(time.now()) + ")")
+            if self.motor.encoder_position() == insp_end and result is True:
+                self.log_motor_position("Lower target reached (insp end actual: %s)", self.wall_time(now))
                 self._set_motor_target(self.motor_upper_target)
                 self.set_state(self.INSP_PAUSE_STATE)
             # TODO: commenting out for now because time is a construct
             # USER_CHECK_ALARM -- machine can keep running but user should check machine
-            # if time.now() > self._t_insp_end:
+            # if now > self._t_insp_end:
             #    self.buzzer_1.enable_buzzer()
             #    self.buzzer_2.enable_buzzer()
             #    raise SYSTEM_ALARM("Inspiration exceeds time limit")
@@ -295,30 +415,35 @@ class VentilatorController:
 
             self.motor.stop()
 
-            if time.now() > self._t_insp_pause_end:
+            if now > self._t_insp_pause_end:
                 self.set_state(self.EXP_STATE)
-                self.measure_ie["insp_time"] = self._t_insp_pause_end - self.measure_ie["last_exp_pause_end"] # end insp - start  # but doesn't work on the first first cycle
+                self.measure_ie["insp_time"] = (self._t_insp_pause_end - self.measure_ie["last_exp_pause_end"]) / NS_PER_SEC # end insp - start  # but doesn't work on the first first cycle
 
         # == EXP_STATE == #
         elif self.current_state is self.EXP_STATE:
             if self._entering_state:
                 self._entering_state = False
 
-            # TODO: change/update this method
-            result, _ = self.motor.move_to_encoder_pose_with_dur(
+            exp_end = self.motor_upper_target
+            if self._exp_profile is not None:
+                exp_end = self._exp_profile.end
+                result, _ = self.motor.follow_profile(self._exp_profile,
+                                                      (now - self._t_insp_pause_end) / NS_PER_SEC)
+            else:
+                result, _ = self.motor.move_to_encoder_pose_with_dur(
                                         pose=self.motor_current_target,
                                         dist=abs(self.motor_current_target
                                                     -self.motor_prev_target),
-                                        dur=(self._t_exp_end-self._t_insp_pause_end).total_seconds()
+                                        dur=self._exp_dur
                                         )
 
-            if self.motor.encoder_position() == self.motor_upper_target and result is True:
-                self.log_motor_position("Upper target reached (exp end actual: " + str(time.now()) + ")")
+            if self.motor.encoder_position() == exp_end and result is True:
+                self.log_motor_position("Upper target reached (exp end actual: %s)", self.wall_time(now))
                 self._set_motor_target(self.motor_lower_target)
                 self.set_state(self.EXP_PAUSE_STATE)
             # TODO: commenting out for now because time is a construct
             # USER_CHECK_ALARM -- machine can keep running but user should check machine
-            # if time.now() > self._t_exp_end:
+            # if now > self._t_exp_end:
             #    self.buzzer_1.enable_buzzer()
             #    self.buzzer_2.enable_buzzer()
             #    raise SYSTEM_ALARM("Expiration exceeds time limit")
@@ -330,16 +455,17 @@ class VentilatorController:
 
             self.motor.stop()
             # update_measured_parameters()
-            if time.now() > self._t_exp_pause_end:
+            if now > self._t_exp_pause_end:
                 self.set_state(self.INSP_STATE)
                 # self.set_state(self.HOMING_VERIF_STATE)
                 self.measure_ie["last_exp_pause_end"] = self._t_exp_pause_end
-                self.measure_ie["exp_time"] = self._t_exp_pause_end - self._t_insp_pause_end  # end insp - start
-                # self.measure_ie["ie_ratio"] = f"{int(self.measure_ie['insp_time'].total_seconds())}/{int(self.measure_ie['exp_time'].total_seconds())}"
+                self.measure_ie["exp_time"] = (self._t_exp_pause_end - self._t_insp_pause_end) / NS_PER_SEC  # end insp - start
+                # self.measure_ie["ie_ratio"] = f"{int(self.measure_ie['insp_time'])}/{int(self.measure_ie['exp_time'])}"
                 
-                self.measure_ie["ie_ratio"] = round(self.measure_ie['exp_time'].total_seconds() / 
-                                              self.measure_ie['insp_time'].total_seconds())
-                self.measured_parameters_sender.update_measured_parameters_signal.emit()
+                self.measure_ie["ie_ratio"] = round(self.measure_ie['exp_time'] / 
+                                              self.measure_ie['insp_time'])
+                if self.breath_analyzer is None:
+                    self.measured_parameters_sender.update_measured_parameters_signal.emit()
             
         # == PAUSE_STATE == #
         elif self.current_state is self.PAUSE_STATE: # TODO: define off behavior
@@ -357,9 +483,20 @@ class VentilatorController:
         if self.current_state is self.DEBUG_STATE:  # TODO: define debug behavior
             self.motor.stop()
 
-        # TODO: add delay to loop if there is extra time
-
+        if self.telemetry is not None:
+            self.record_telemetry(now)
 
+    def record_telemetry(self, now):
+        """
+        add the state of this tick to the binary trace
+        @param now: the monotonic time (ns) of the tick
+        """
+        self.telemetry.record(now,
+                              self._state_ids[self.current_state],
+                              self.motor.encoder_position(),
+                              self.motor.cached_motor_position(),
+                              self.motor.commanded_velocity,
+                              self.pressure_sensor.latest_raw() if self.pressure_sensor is not None else 0)
 
     def start_homing(self):
         self.buzzer_1.disable_buzzer()
@@ -409,7 +546,7 @@ class VentilatorController:
                 self.motor.encoder.reset_position()
                 self._homing_dir = -1
                 self.log_motor_position("Homing upper bound reached")
-                sleep(0.25)
+                self.clock.sleep(0.25)
 
             # moving downward, upper bound set
             else:
@@ -436,7 +573,7 @@ class VentilatorController:
 
             self.log_motor_position("Homing lower bound reached")
             self.logger.info("=== Homing Finished ===")
-            sleep(0.25)
+            self.clock.sleep(0.25)
 
         # no contact with any switch
         elif not self.upper_switch.contacted() and not self.lower_switch.contacted():
@@ -450,6 +587,13 @@ class VentilatorController:
             self.alarm_sender.alarm_signal.emit(
                 HOMING_ALARM("Both contact switches are pressed"))
 
+    def bag_contact_position(self):
+        """
+        @return: the encoder position where the arm contacts the
+                 ambu bag, 0 until it has been found
+        """
+        return self._pose_at_contact if self._pose_at_contact is not None else 0
+
     def contact_switch_callback(self, status):
         """
         This method is called when the contact
@@ -472,6 +616,25 @@ class VentilatorController:
         #             raise SYSTEM_ALARM("Limit switch tripped")
         pass
 
+    def overpressure_callback(self, status):
+        """
+        This method is called from the pigpio callback thread
+        when the pressure adc comparator trips or clears
+        @param status: 1 when over MAX_PRESSURE, 0 once cleared
+        """
+        if status == 1:
+            self.buzzer_1.enable_buzzer()
+            self.buzzer_2.enable_buzzer()
+            self.logger.warning("Over pressure trip at %s", self.wall_time(self.clock.monotonic_ns()))
+            # stop the stroke here, the alarm only reaches the gui later
+            if self.current_state is not self.PAUSE_STATE and self.current_state is not self.OFF_STATE:
+                self.set_state(self.PAUSE_STATE)
+            self.motor.stop()
+            self.alarm_sender.alarm_signal.emit(
+                OVER_PRESSURE_ALARM("OVER PRESSURE, pressure above {} cmH2O".format(MAX_PRESSURE)))
+        else:
+            self.logger.info("Over pressure trip cleared")
+
     def power_switch_callback(self, status):
         """
         This method is called when the power switch is flipped
@@ -496,26 +659,55 @@ class VentilatorController:
         """
         return self.bpm * VELOCITY_FACTOR
 
-    def log_motor_position(self, message=""):
+    def snapshot(self):
+        """
+        @return: a dict of the state, the set parameters, the measured
+                 parameters and the current alarms, read together
+        """
+        with self._state_lock:
+            state = self.current_state
+        return {'state': state,
+                'volume': self.volume,
+                'bpm': self.bpm,
+                'ie': self.ie,
+                'measured': self.measured_parameters(),
+                'alarms': list(self.current_alarms)}
+
+    def measured_parameters(self):
+        """
+        @return: a dict of the measured volume (mL), bpm, ie (exp time
+                 per insp time), pip and peep (cmH2O), None if unknown
+        """
+        if self.breath_analyzer is not None:
+            return self.breath_analyzer.snapshot()
+        insp = self.measure_ie["insp_time"]
+        return {'volume': self.measure_volume,
+                'bpm': self.measure_bpm,
+                'ie': self.measure_ie["exp_time"] / insp if insp > 0 else None,
+                'pip': None,
+                'peep': None}
+
+    def log_motor_position(self, message="", *args):
         """
         log the motor position with a custom
         message if needed.
         @param message: a custom message to
-        be logged
+        be logged, %-style
+        @param args: the arguments of the message,
+        formatted by the log handler
         """
-        self.logger.info("{} encoder: {}, motor controller: {}".format(message,
-                                                            self.motor.encoder_position(),
-                                                            self.motor.motor_position()))
+        self.logger.info(message + " encoder: %s, motor controller: %s", *args,
+                         self.motor.encoder_position(), self.motor.motor_position())
 
     # TODO: raise errors for values outside defined bounds
 
     def update_bpm(self, value):
         self.bpm = value
-        self.logger.info('BPM set to: ' + str(value))
+        self.logger.info('BPM set to: %s', value)
 
     def update_ie(self, value):
         self.ie = value
-        self.logger.info('IE set to: ' + str(value))
+        self.logger.info('IE set to: %s', value)
 
     def update_tidal_volume(self, value):
         if( TIDAL_VOLUME_MAX < value ): # TODO signal in gui that the value is illegal
@@ -540,8 +732,8 @@ class VentilatorController:
             self.motor_current_target = self.motor_upper_target
             self._set_motor_target(self.motor_lower_target)
 
-        self.logger.info("lower target: "+ str(self.motor_lower_target))
-        self.logger.info("upper target: "+ str(self.motor_upper_target))
-        self.logger.info('TV set to: ' + str(value))
+        self.logger.info("lower target: %s", self.motor_lower_target)
+        self.logger.info("upper target: %s", self.motor_upper_target)
+        self.logger.info('TV set to: %s', value)
 
     # TODO: write alarm functions -> sound buzzer, etc.